@@ -1,11 +1,16 @@
-from sys import version_info
+from sys import argv, version_info
 from logging import getLogger, INFO, warn
 
 if version_info < (3, 11):
     warn("You're using an old version of Python. Please upgrade to Python 3.11 or newer.")
 
-from src.gui.app import MorphoHistoryApp
-
 getLogger().setLevel(INFO)
 
-MorphoHistoryApp().run()
+if argv[1:2] == ['tune']:
+    # headless tuning, no Kivy needed
+    from src.tuning import main
+    main(argv[2:])
+else:
+    from src.gui.app import MorphoHistoryApp
+
+    MorphoHistoryApp().run()
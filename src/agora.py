@@ -1,49 +1,59 @@
 """An evolving virtual community of speakers influencing each other stochastically."""
 
-from copy import deepcopy
-from dataclasses import dataclass, field
-from itertools import product
+from dataclasses import dataclass, field, replace
 from json import dumps, load
-from logging import debug, info, warning
+from logging import debug, getLogger, info, warning, DEBUG
 from typing import Callable, Optional, Self
 
+import numpy as np
+
 from .demos import DemoArguments, DEMO_FACTORIES, DEFAULT_DEMO_ARGUMENTS
-from .paradigm import CellIndex, NounParadigm
-from .rng import RAND
+from .history import HistoryItem, HistoryLog
+from .lexicon import Lexicon
+from .paradigm import Paradigm
+from .population import DecayHorizon, Population, PopulationSnapshot, SpeakerCriterion
+from .sampling import ConditionalPairSampler, PairSampler, inv_dist_sq_constant, inv_dist_sq_euclidean, inv_dist_sq_manhattan
 from .settings import SETTINGS
 from .speaker import Speaker, PairPick
 
 
-def _inv_dist_sq_constant(_: PairPick) -> float:
-    return 1
-
-def _inv_dist_sq_manhattan(pair: PairPick) -> float:
-    speaker = pair['speaker']
-    hearer = pair['hearer']
-    dist_sq = (abs(speaker.pos[0] - hearer.pos[0]) + abs(speaker.pos[1] - hearer.pos[1])) ** 2
-    return 1 / dist_sq
+def speakers_biased(population: Population, rows: int | np.ndarray) -> bool | np.ndarray:
+    """Which of the given speakers are sufficiently biased (broadcasters do not count)."""
+    assert SETTINGS.bias_threshold >= 0.5
+    bias_enough = abs(population.principal_biases(rows) - 0.5) > SETTINGS.bias_threshold - 0.5
+    return population.is_broadcaster[rows] | bias_enough
+
+def speakers_biased_and_experienced(population: Population, rows: int | np.ndarray) -> bool | np.ndarray:
+    """Which of the given speakers are sufficiently biased and experienced (broadcasters do not count)."""
+    assert SETTINGS.bias_threshold >= 0.5
+    bias_enough = abs(population.principal_biases(rows) - 0.5) > SETTINGS.bias_threshold - 0.5
+    experience_enough = population.experience[rows] > SETTINGS.experience_threshold
+    return population.is_broadcaster[rows] | (bias_enough & experience_enough)
+
+def speakers_biased_decay_horizon(population: Population, rows: int | np.ndarray) -> float | np.ndarray:
+    """How many more steps of passive decay the given speakers can take before speakers_biased might change its mind."""
+    margin = SETTINGS.bias_threshold - 0.5
+    lean = abs(population.principal_biases(rows) - 0.5)
+    # a step of decay moves no bias, and so no principal bias, by more than 0.02; keep a step to spare for rounding
+    steps = np.floor(abs(lean - margin) / 0.02) - 1
+    # decay moves every bias away from 0.5, so whoever leans the same way in every cell never leans any less
+    bias_a = population.bias_a[rows]
+    weighted = population.lexicon.weights > 0
+    one_way = ((bias_a >= 0.5) | ~weighted).all(axis=-1) | ((bias_a <= 0.5) | ~weighted).all(axis=-1)
+    never = population.is_broadcaster[rows] | ((lean > margin) & one_way)
+    return np.where(never, np.inf, np.maximum(steps, 0))
+
+def speakers_biased_and_experienced_decay_horizon(population: Population, rows: int | np.ndarray) -> float | np.ndarray:
+    """How many more steps of passive decay the given speakers can take before speakers_biased_and_experienced
+    might change its mind. Decay leaves experience alone, so the inexperienced have to wait for a conversation."""
+    experience_enough = population.experience[rows] > SETTINGS.experience_threshold
+    return np.where(experience_enough, speakers_biased_decay_horizon(population, rows), np.inf)
 
-def _inv_dist_sq_euclidean(pair: PairPick) -> float:
-    speaker = pair['speaker']
-    hearer = pair['hearer']
-    dist_sq = (speaker.pos[0] - hearer.pos[0]) ** 2 + (speaker.pos[1] - hearer.pos[1]) ** 2
-    return 1 / dist_sq
 
 class Agora:
     """A collection of simulated speakers influencing each other."""
 
-    @dataclass(frozen=True)
-    class HistoryItem:
-        """A single entry in the list of interactions that constitute the Agora's past history.
-        Basically stores a pick and which cell and form was used in the interaction."""
-        speaker: int
-        hearer: int
-        cell: CellIndex
-        form_a: bool
-
-        def to_dict(self):
-            """Returns own state for JSON serialization."""
-            return self.__dict__
+    HistoryItem = HistoryItem
 
     @dataclass
     class State:
@@ -55,49 +65,59 @@ class Agora:
             """Returns own state for JSON serialization."""
             return self.__dict__
 
+    @dataclass(frozen=True)
+    class Snapshot:
+        """A frozen copy of the state of an Agora to return to later."""
+        population: PopulationSnapshot
+        sim_iteration_total: int = 0
+
+    # interactions drawn ahead at a time by simulate_batch
+    DRAW_AHEAD = 4096
+
+    # per speaker versions of stopping criteria, see register_stability_criterion
+    speaker_criteria: dict[Callable, SpeakerCriterion] = {}
+    decay_horizons: dict[Callable, DecayHorizon] = {}
+
     def __init__(self) -> None:
         self.state: Agora.State = self.State()
-        self.starting_state: Optional[Agora.State] = None
-        self.history: list[Agora.HistoryItem] = []
+        self.starting_state: Optional[Agora.Snapshot] = None
+        self.history = HistoryLog()
+        self.population: Optional[Population] = None
         self.clear_caches()
         self.sim_iteration: int = 0
         self.sim_cancelled = False
         self.graphics_on = False
-        self.speaker_pairs: Optional[list[PairPick]] = None
-        self.cum_weights: Optional[list[float]] = None
+        self.pair_sampler: Optional[PairSampler | ConditionalPairSampler] = None
         self.pick: Optional[PairPick] = None
         self.pick_queue: list[PairPick] = []
         self.identical_warned_already = False
         self.rw_warned_already = False
 
     def to_dict(self):
-        """Returns own state for JSON serialization."""
-        my_dict = { 'state' : self.state,
+        """Returns own state for JSON serialization.
+        The forms are stored once in the shared Lexicon, speakers only store their biases."""
+        my_dict = { 'lexicon' : self.bind_population().lexicon,
+                    'state' : self.state,
                     'history' : self.history }
         return my_dict
 
     def save_starting_state(self) -> None:
         """Stash a snapshot of the current state of the Agora."""
-        # TODO: consider freezing with 'gelidum'
-        self.starting_state = self.State()
-        # N.B. paradigms are deep copied by Speaker.fromspeaker
-        self.starting_state.speakers = [Speaker.fromspeaker(s) for s in self.state.speakers]
-        self.starting_state.sim_iteration_total = self.state.sim_iteration_total
+        # N.B. only the population's arrays are copied, into read-only buffers
+        self.starting_state = self.Snapshot(self.bind_population().snapshot(), self.state.sim_iteration_total)
 
     def reset(self) -> None:
         """Restore earlier speaker snapshot."""
         assert self.starting_state
+        snapshot = self.starting_state.population
         self.clear_speakers()
-        self.load_speakers(self.starting_state.speakers)
+        self.load_speakers([Speaker.fromsnapshot(snapshot, i) for i in range(len(snapshot))])
         self.state.sim_iteration_total = self.starting_state.sim_iteration_total
 
     def quick_reset(self) -> None:
-        """Keep speakers but reset their biases and experience."""
+        """Keep speakers but reset their biases and experience (speakers are paired on their identifier 'n')."""
         assert self.starting_state
-        # FIXME: pair speakers based on their identifier 'n', not their raw index
-        for i in range(len(self.state.speakers)):
-            self.state.speakers[i].para = deepcopy(self.starting_state.speakers[i].para)
-            self.state.speakers[i].experience = self.starting_state.speakers[i].experience
+        self.bind_population().restore(self.starting_state.population)
         # keep valuable caches (pick_queue still needs to be cleared though)
         self.pick_queue = []
         self.state.sim_iteration_total = self.starting_state.sim_iteration_total
@@ -105,13 +125,41 @@ class Agora:
     def clear_caches(self) -> None:
         """Invalidate cache variables."""
         # variables for expensive calculations
-        self.speaker_pairs = None
-        self.cum_weights = None
+        self.population = None
+        self.pair_sampler = None
         self.pick_queue = []
 
     def clear_dist_cache(self) -> None:
         """Invalidate weights cache used for picking pairs."""
-        self.cum_weights = None
+        self.pair_sampler = None
+        if self.population is not None:
+            self.population.update_positions()
+
+    def bind_population(self) -> Population:
+        """Gather the speakers' state in a single shared Population unless already done."""
+        if self.population is None:
+            self.population = Population.fromspeakers(self.state.speakers)
+        return self.population
+
+    def bind_pair_sampler(self) -> PairSampler | ConditionalPairSampler:
+        """Prepare the distance weighted pair picking machinery unless already done."""
+        if self.pair_sampler is None:
+            if SETTINGS.sim_distance_metric == SETTINGS.DistanceMetric.CONSTANT:
+                inv_dist_sq = inv_dist_sq_constant
+            elif SETTINGS.sim_distance_metric == SETTINGS.DistanceMetric.MANHATTAN:
+                inv_dist_sq = inv_dist_sq_manhattan
+            elif SETTINGS.sim_distance_metric == SETTINGS.DistanceMetric.EUCLIDEAN:
+                inv_dist_sq = inv_dist_sq_euclidean
+            else:
+                assert False
+            population = self.bind_population()
+            if SETTINGS.sim_pair_sampling == SETTINGS.PairSampling.TABLE:
+                self.pair_sampler = PairSampler(population, inv_dist_sq)
+            elif SETTINGS.sim_pair_sampling == SETTINGS.PairSampling.CONDITIONAL:
+                self.pair_sampler = ConditionalPairSampler(population, inv_dist_sq)
+            else:
+                assert False
+        return self.pair_sampler
 
     def clear_speakers(self) -> None:
         """Remove all speakers from the Agora."""
@@ -138,10 +186,12 @@ class Agora:
         """Restore an Agora state previously written to file."""
         with open(filepath, 'r', encoding='utf-8') as stream:
             loaded_dict = load(stream)
+        # files without a lexicon have a whole paradigm in each speaker
+        lexicon = Lexicon.from_dict(loaded_dict['lexicon']) if 'lexicon' in loaded_dict else None
         try:
-            speakers = [Speaker.from_dict(s) for s in loaded_dict['state']['speakers']]
+            speakers = [Speaker.from_dict(s, lexicon) for s in loaded_dict['state']['speakers']]
             sim_iteration_total = loaded_dict['state']['sim_iteration_total']
-            self.history = loaded_dict['history']
+            self.history = HistoryLog.from_dict(loaded_dict['history'])
         except KeyError:
             # old file format had no history in it
             speakers = [Speaker.from_dict(s) for s in loaded_dict['speakers']]
@@ -150,12 +200,12 @@ class Agora:
         self.load_speakers(speakers)
         self.state.sim_iteration_total = sim_iteration_total
         self.save_starting_state()
-        SETTINGS.paradigm = deepcopy(self.state.speakers[0].para)
+        SETTINGS.paradigm = self.state.speakers[0].para.copy()
 
     def load_speakers(self, speakers: list[Speaker]) -> None:
         """Replace current speaker community with a copy of the argument."""
         assert not self.state.speakers
-        assert not self.speaker_pairs
+        assert not self.pair_sampler
         self.state.speakers = [Speaker.fromspeaker(s) for s in speakers]
         assert self.state.speakers
         assert not all(s.is_broadcaster for s in self.state.speakers)
@@ -165,15 +215,17 @@ class Agora:
         self.state.speakers.append(Speaker.fromspeaker(speaker))
         self.clear_caches()
 
-    def set_paradigm(self, para: NounParadigm) -> None:
-        """Update the exact forms and prominence values in all cells of all
-        speakers' (redundantly stored) paradigms based on the values in para."""
-        for speaker in self.state.speakers:
-            for num in range(0, 2):
-                for case in range(0, 14):
-                    speaker.para.para[num][case].form_a = para.para[num][case].form_a
-                    speaker.para.para[num][case].form_b = para.para[num][case].form_b
-                    speaker.para.para[num][case].prominence = para.para[num][case].prominence
+    def set_paradigm(self, para: Paradigm) -> None:
+        """Update the exact forms and prominence values in all cells of the
+        Lexicon shared by all speakers based on the values in para.
+        Switching between noun and verb paradigms starts everyone out with neutral biases."""
+        self.bind_population().set_forms(para)
+
+    def set_lexemes(self, paras: list[Paradigm], frequency: Optional[list[float]]=None) -> None:
+        """Let every speaker track several lexemes at once, one per paradigm in paras, picked for each
+        interaction according to their relative corpus frequency (uniformly by default). Speakers keep
+        their biases in the lexemes they already had and start out new ones with those of the first."""
+        self.bind_population().set_lexicon(Lexicon.fromparadigms(paras, frequency))
 
     def set_starting_experience(self, experience: Optional[int]=None) -> None:
         """Set the experience value of each speaker in the saved snapshot,
@@ -182,135 +234,268 @@ class Agora:
         # FIXME: defining a default argument value for experience failed for some reason
         if experience is None:
             experience = SETTINGS.starting_experience
-        for speaker in self.starting_state.speakers:
-            speaker.experience = experience
+        self.starting_state = replace(self.starting_state,
+                                      population=self.starting_state.population.with_experience(experience))
         if 0 == self.state.sim_iteration_total:
             for speaker in self.state.speakers:
                 speaker.experience = experience
 
     def passive_decay(self) -> None:
         """Make all speakers on the sidelines gradually forget their underrepresented forms."""
-        for speaker in self.state.speakers:
-            current_picks = []
-            if self.pick:
-                current_picks += [self.pick['speaker'].n, self.pick['hearer'].n]
-            for pick in self.pick_queue:
-                current_picks += [pick['speaker'].n, pick['hearer'].n]
-            if speaker.n not in current_picks:
-                speaker.passive_decay()
+        current_picks = [self.pick] if self.pick else []
+        current_picks += self.pick_queue
+        busy_rows = [pick[role].row for pick in current_picks for role in ('speaker', 'hearer')]
+        self.bind_population().passive_decay_all_but(busy_rows)
 
     def dominant_form(self) -> Optional[str]:
-        if all(s.principal_bias() > 0.5 for s in self.state.speakers):
+        principal_biases = self.bind_population().principal_biases()
+        if (principal_biases > 0.5).all():
             return 'A'
-        if all(s.principal_bias() < 0.5 for s in self.state.speakers):
+        if (principal_biases < 0.5).all():
             return 'B'
         return None
 
     def uniform_balance(self) -> bool:
         """Detect a situation where no speaker is strongly biased either way."""
-        return all(1 - SETTINGS.bias_threshold < s.principal_bias() < SETTINGS.bias_threshold
-                   for s in self.state.speakers)
+        principal_biases = self.bind_population().principal_biases()
+        return bool(((1 - SETTINGS.bias_threshold < principal_biases) &
+                     (principal_biases < SETTINGS.bias_threshold)).all())
+
+    def dominant_forms_by_lexeme(self) -> list[Optional[str]]:
+        """The form every speaker leans towards in each lexeme, if there is one."""
+        lexeme_biases = self.bind_population().lexeme_principal_biases()
+        all_a = (lexeme_biases > 0.5).all(axis=0)
+        all_b = (lexeme_biases < 0.5).all(axis=0)
+        return ['A' if a else 'B' if b else None for a, b in zip(all_a, all_b)]
+
+    def uniform_balances_by_lexeme(self) -> np.ndarray:
+        """Detect the lexemes where no speaker is strongly biased either way."""
+        lexeme_biases = self.bind_population().lexeme_principal_biases()
+        return ((1 - SETTINGS.bias_threshold < lexeme_biases) &
+                (lexeme_biases < SETTINGS.bias_threshold)).all(axis=0)
+
+    def lexemes_biased(self) -> np.ndarray:
+        """Which lexemes every speaker is sufficiently biased in (broadcasters do not count)."""
+        assert SETTINGS.bias_threshold >= 0.5
+        population = self.bind_population()
+        bias_enough = abs(population.lexeme_principal_biases() - 0.5) > SETTINGS.bias_threshold - 0.5
+        return (population.is_broadcaster[:, np.newaxis] | bias_enough).all(axis=0)
 
     def uniform_paradigms_only(self, strong=False) -> bool:
         """Detect a situation where all speakers' paradigms are uniformly tilted
         towards either the A or the B forms (may vary across speakers though)."""
         return all(s.uniform_paradigm(strong) for s in self.state.speakers)
 
-    def simulate(self, *_) -> None: # TODO: use threading to perform independent picks in parallel
-        """Perform one iteration: pick two individuals to talk to each other
-        and update the hearer's state based on the speaker's."""
-        assert self.state and self.state.speakers
-        debug("Agora: Iterating simulation...")
+    def check_settings_sanity(self) -> None:
+        """Warn the user (once) about suspicious combinations of simulation settings."""
         if not self.identical_warned_already and SETTINGS.sim_single_cell:
-            main_cell = SETTINGS.paradigm[CellIndex()]
+            main_cell = SETTINGS.paradigm.cells[0]
             if not main_cell.alternates():
                 warning("Agora: Single cell contains identical word forms. This probably isn't what you want.")
                 self.identical_warned_already = True
         if not self.rw_warned_already and SETTINGS.sim_single_cell and SETTINGS.LearningModel.HARMONIC != SETTINGS.sim_learning_model:
             warning("Agora: Running Rescorla-Wagner model with a single paradigm cell.")
             self.rw_warned_already = True
-        if self.pick_queue:
-            # either the second half of a mutual exchange, or a broadcaster's picks
-            self.pick = self.pick_queue.pop(0)
-        else:
-            if not self.speaker_pairs:
-                self.speaker_pairs = list(PairPick(speaker=s, hearer=h) for (s, h) in product(self.state.speakers, self.state.speakers) if s != h)
-            if not self.cum_weights:
-                if SETTINGS.sim_distance_metric == SETTINGS.DistanceMetric.CONSTANT:
-                    inv_dist_sq = _inv_dist_sq_constant
-                elif SETTINGS.sim_distance_metric == SETTINGS.DistanceMetric.MANHATTAN:
-                    inv_dist_sq = _inv_dist_sq_manhattan
-                elif SETTINGS.sim_distance_metric == SETTINGS.DistanceMetric.EUCLIDEAN:
-                    inv_dist_sq = _inv_dist_sq_euclidean
-                else:
-                    assert False
-                self.cum_weights = [0]
-                for pair in self.speaker_pairs:
-                    self.cum_weights.append(inv_dist_sq(pair) + self.cum_weights[-1])
-                self.cum_weights.pop(0)
-            while True:
-                self.pick = RAND.choices(self.speaker_pairs, cum_weights=self.cum_weights)[0]
-                if not self.pick['hearer'].is_broadcaster:
+
+    def simulate(self, *_) -> None: # TODO: use threading to perform independent picks in parallel
+        """Perform one iteration: pick two individuals to talk to each other
+        and update the hearer's state based on the speaker's."""
+        self.simulate_batch(1)
+
+    def simulate_batch(self, k: int, stop: Optional[Callable[[], bool]]=None) -> int:
+        """Perform up to k iterations in a tight loop, with the same odds as calling simulate k times.
+        The pairs, the cells and the random numbers that choose the forms are drawn ahead in bulk,
+        leaving only the learning itself to be done one interaction at a time (except with passive decay,
+        which costs a pass over everyone after every interaction anyway). Being drawn in bulk, the random
+        numbers are used in a different order than by simulate, so the outcome is not the very same.
+        If given, stop is checked before each iteration and ends the batch early once it holds.
+        Returns the number of iterations actually performed."""
+        assert self.state and self.state.speakers
+        debug("Agora: Iterating simulation...")
+        self.check_settings_sanity()
+        population = self.bind_population()
+        population.choose_learning_model()
+        self.history.set_paradigm_class(population.lexicon.paradigm_class)
+        if SETTINGS.sim_passive_decay:
+            return self.simulate_one_by_one(k, stop)
+        state = self.state
+        talk = population.talk_drawn
+        debug_on = getLogger().isEnabledFor(DEBUG)
+        performed = 0
+        while performed < k:
+            count = min(self.DRAW_AHEAD, k - performed)
+            speaker_rows, hearer_rows, follow_ups = self.draw_picks(count)
+            cells, chances = population.draw_utterances(count)
+            form_a_used = []
+            for speaker_row, hearer_row, cell_id, chance in zip(speaker_rows, hearer_rows, cells.tolist(), chances.tolist()):
+                if stop is not None and stop():
                     break
-            if self.pick['speaker'].is_broadcaster:
-                s = self.pick['speaker']
-                self.pick_queue = [ PairPick(speaker=s, hearer=h) for h in self.state.speakers if h != s ]
+                if debug_on:
+                    debug("Agora: %d picked to talk to %d" % (population.ids[speaker_row], population.ids[hearer_row]))
+                form_a_used.append(talk(speaker_row, hearer_row, cell_id, chance))
+                state.sim_iteration_total += 1
+            done = len(form_a_used)
+            performed += done
+            if done:
+                self.history.append_many(population.ids[speaker_rows[:done]], population.ids[hearer_rows[:done]],
+                                         cells[:done], np.array(form_a_used))
+                speakers = population.speakers
+                self.pick = PairPick(speaker=speakers[speaker_rows[done - 1]], hearer=speakers[hearer_rows[done - 1]])
+            if done < count:
+                # the rest of an exchange already under way is still to come, anything after it is dropped
+                rest = done
+                while rest < count and follow_ups[rest]:
+                    rest += 1
+                pending = [PairPick(speaker=population.speakers[speaker_row], hearer=population.speakers[hearer_row])
+                           for speaker_row, hearer_row in zip(speaker_rows[done:rest], hearer_rows[done:rest])]
+                self.pick_queue = pending + (self.pick_queue if rest == count else [])
+                break
+        return performed
+
+    def draw_picks(self, count: int) -> tuple[list[int], list[int], list[bool]]:
+        """The speaker and hearer rows of the next count interactions: those queued up first, then freshly drawn pairs.
+        A broadcaster talks to everyone else in turn and with mutual influence the hearer answers back;
+        whatever of such an exchange does not fit in is queued up for later. The last list tells
+        which interactions merely follow up on the one before them."""
+        speakers = self.state.speakers
+        queued = self.pick_queue[:count]
+        del self.pick_queue[:count]
+        speaker_rows = [pick['speaker'].row for pick in queued]
+        hearer_rows = [pick['hearer'].row for pick in queued]
+        follow_ups = [True] * len(queued)
+        if len(speaker_rows) == count:
+            return speaker_rows, hearer_rows, follow_ups
+        population = self.bind_population()
+        drawn_speakers, drawn_hearers = self.bind_pair_sampler().pick_many(count - len(speaker_rows))
+        influence_mutual = SETTINGS.sim_influence_mutual
+        if not influence_mutual and not population.is_broadcaster.any():
+            speaker_rows += drawn_speakers.tolist()
+            hearer_rows += drawn_hearers.tolist()
+            follow_ups += [False] * len(drawn_speakers)
+            return speaker_rows, hearer_rows, follow_ups
+        everyone = list(range(len(population)))
+        is_broadcaster = population.is_broadcaster.tolist()
+        for speaker_row, hearer_row in zip(drawn_speakers.tolist(), drawn_hearers.tolist()):
+            if len(speaker_rows) >= count:
+                break
+            if is_broadcaster[speaker_row]:
+                hearers = everyone[:speaker_row] + everyone[speaker_row + 1:]
+                speaker_rows += [speaker_row] * len(hearers)
+                hearer_rows += hearers
+            elif influence_mutual:
+                speaker_rows += [speaker_row, hearer_row]
+                hearer_rows += [hearer_row, speaker_row]
+            else:
+                speaker_rows.append(speaker_row)
+                hearer_rows.append(hearer_row)
+            follow_ups += [False] + [True] * (len(speaker_rows) - len(follow_ups) - 1)
+        self.pick_queue += [PairPick(speaker=speakers[speaker_row], hearer=speakers[hearer_row])
+                            for speaker_row, hearer_row in zip(speaker_rows[count:], hearer_rows[count:])]
+        return speaker_rows[:count], hearer_rows[:count], follow_ups[:count]
+
+    def simulate_one_by_one(self, k: int, stop: Optional[Callable[[], bool]]=None) -> int:
+        """simulate_batch with each pair, cell and form drawn only when its turn comes."""
+        population = self.bind_population()
+        speakers = population.speakers
+        pair_sampler = self.bind_pair_sampler()
+        history = self.history
+        influence_mutual = SETTINGS.sim_influence_mutual
+        passive_decay = self.passive_decay if SETTINGS.sim_passive_decay else None
+        debug_on = getLogger().isEnabledFor(DEBUG)
+        for iteration in range(k):
+            if stop is not None and stop():
+                return iteration
+            if self.pick_queue:
+                # either the second half of a mutual exchange, or a broadcaster's picks
                 self.pick = self.pick_queue.pop(0)
-            elif SETTINGS.sim_influence_mutual:
-                reverse_pick = PairPick(speaker=self.pick['hearer'], hearer=self.pick['speaker'])
-                self.pick_queue.append(reverse_pick)
-        debug("Agora: %d picked to talk to %d" % (self.pick['speaker'].n, self.pick['hearer'].n))
-        cell, form_a_used = self.pick['speaker'].talk(self.pick)
-        self.history.append(self.HistoryItem(self.pick['speaker'].n,
-                                             self.pick['hearer'].n,
-                                             cell,
-                                             form_a_used))
-        if SETTINGS.sim_passive_decay:
-            self.passive_decay()
-        self.state.sim_iteration_total += 1
+            else:
+                speaker_row, hearer_row = pair_sampler.pick()
+                self.pick = PairPick(speaker=speakers[speaker_row], hearer=speakers[hearer_row])
+                if population.is_broadcaster[speaker_row]:
+                    s = self.pick['speaker']
+                    self.pick_queue = [ PairPick(speaker=s, hearer=h) for h in self.state.speakers if h != s ]
+                    self.pick = self.pick_queue.pop(0)
+                elif influence_mutual:
+                    reverse_pick = PairPick(speaker=self.pick['hearer'], hearer=self.pick['speaker'])
+                    self.pick_queue.append(reverse_pick)
+            speaker = self.pick['speaker']
+            hearer = self.pick['hearer']
+            if debug_on:
+                debug("Agora: %d picked to talk to %d" % (speaker.n, hearer.n))
+            cell_id, form_a_used = population.talk(speaker.row, hearer.row)
+            history.append(speaker.n, hearer.n, cell_id, form_a_used)
+            if passive_decay is not None:
+                passive_decay()
+            self.state.sim_iteration_total += 1
+        return k
 
     def all_biased(self) -> bool:
         """Criterion to stop the simulation: every speaker is sufficiently biased."""
-        assert SETTINGS.bias_threshold >= 0.5
-        def stable(speaker):
-            if speaker.is_broadcaster:
-                return True
-            bias_enough = abs(speaker.principal_bias() - 0.5) > SETTINGS.bias_threshold - 0.5
-            return bias_enough
-        return all(stable(s) for s in self.state.speakers)
+        population = self.bind_population()
+        return bool(speakers_biased(population, np.arange(len(population))).all())
 
     def all_biased_and_experienced(self) -> bool:
         """Criterion to stop the simulation: every speaker is sufficiently biased and experienced."""
-        assert SETTINGS.bias_threshold >= 0.5
-        def stable(speaker):
-            if speaker.is_broadcaster:
-                return True
-            bias_enough = abs(speaker.principal_bias() - 0.5) > SETTINGS.bias_threshold - 0.5
-            experience_enough = speaker.experience > SETTINGS.experience_threshold
-            return bias_enough and experience_enough
-        return all(stable(s) for s in self.state.speakers)
+        population = self.bind_population()
+        return bool(speakers_biased_and_experienced(population, np.arange(len(population))).all())
+
+    @classmethod
+    def register_stability_criterion(cls, is_stable: Callable[[Self], bool], is_speaker_stable: SpeakerCriterion,
+                                     decay_horizon: Optional[DecayHorizon]=None) -> None:
+        """Declare that a stopping criterion holds exactly when each speaker is stable by themselves.
+        simulate_till_stable can then keep track of it incrementally instead of checking
+        the whole Agora before every single interaction. A DecayHorizon lets lazy passive decay
+        leave the speakers it cannot tip over alone in the meantime."""
+        cls.speaker_criteria[is_stable] = is_speaker_stable
+        if decay_horizon is not None:
+            cls.decay_horizons[is_stable] = decay_horizon
+        else:
+            cls.decay_horizons.pop(is_stable, None)
 
     def simulate_till_stable(self, batch_size: Optional[int]=None,
                              is_stable: Optional[Callable[[Self], bool]]=all_biased_and_experienced) -> bool:
         """Keep running the simulation until the stability condition is reached."""
         max_iteration = SETTINGS.sim_max_iteration
+        criterion = getattr(is_stable, '__func__', is_stable)
+        population = self.bind_population()
+        population.track_stability(self.speaker_criteria.get(criterion), self.decay_horizons.get(criterion))
+        is_speaker_stable = population.is_speaker_stable
         if self.sim_iteration == 0:
             info("Agora: Simulation until stable started.")
-        until = self.sim_iteration + batch_size + 1 if batch_size else max_iteration + 1
-        for self.sim_iteration in range(self.sim_iteration + 1, until):
-            if self.sim_cancelled:
-                info("Agora: Simulation until stable cancelled.")
-                self.sim_cancelled = False
-                self.sim_iteration = 0
-                return False
-            if is_stable and is_stable(self):
-                info("Agora: Simulation until stable finished (stability reached after %d iterations)." % self.sim_iteration)
-                self.sim_iteration = 0
-                return False
-            self.simulate()
-            # Make sure we stop eventually no matter what
-            if max_iteration <= self.sim_iteration:
-                info("Agora: Simulation until stable finished (max iteration reached).")
-                self.sim_iteration = 0
-                return False
+        # a cancel takes effect before the very next interaction, not just between batches
+        def cancelled() -> bool:
+            return self.sim_cancelled
+        def cancelled_or_everyone_stable() -> bool:
+            return self.sim_cancelled or 0 == population.num_unstable
+        def cancelled_or_stable() -> bool:
+            return self.sim_cancelled or is_stable(self)
+        if not is_stable:
+            stop = cancelled
+        elif is_speaker_stable:
+            stop = cancelled_or_everyone_stable
+        else:
+            stop = cancelled_or_stable
+        count = max_iteration - self.sim_iteration
+        if batch_size:
+            count = min(count, batch_size)
+        performed = self.simulate_batch(count, stop)
+        self.sim_iteration += performed
+        if self.sim_cancelled:
+            info("Agora: Simulation until stable cancelled.")
+            self.sim_cancelled = False
+            self.sim_iteration = 0
+            return False
+        if performed < count:
+            info("Agora: Simulation until stable finished (stability reached after %d iterations)." % (self.sim_iteration + 1))
+            self.sim_iteration = 0
+            return False
+        # Make sure we stop eventually no matter what
+        if max_iteration <= self.sim_iteration:
+            info("Agora: Simulation until stable finished (max iteration reached).")
+            self.sim_iteration = 0
+            return False
         return True
+
+Agora.register_stability_criterion(Agora.all_biased, speakers_biased, speakers_biased_decay_horizon)
+Agora.register_stability_criterion(Agora.all_biased_and_experienced, speakers_biased_and_experienced,
+                                   speakers_biased_and_experienced_decay_horizon)
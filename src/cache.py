@@ -0,0 +1,87 @@
+"""An on-disk store of simulation outcomes, so that overlapping tunings only simulate what is new."""
+
+from dataclasses import astuple
+from hashlib import sha256
+from json import dumps, loads
+from logging import warning
+from os import makedirs
+from os.path import isfile, join
+from typing import Optional
+
+from .demos import DemoArguments
+from .lexicon import Lexicon
+from .settings import SETTINGS
+
+# the end result of a simulation run: the dominant form (if any) and whether it ended in a uniform balance
+Outcome = tuple[Optional[str], bool]
+
+# settings that only affect how simulations are shown, logged or split into batches, never their outcome
+# (the demo is part of a setup's key anyway); any other setting, including ones added later, counts
+_DISPLAY_SETTINGS = frozenset({
+    'gui_language', 'agora_size', 'color_a', 'color_b', 'color_broadcaster', 'color_arrow_tip',
+    'arrow_width', 'draw_arrow', 'grid_color', 'grid_resolution', 'speakerdot_size',
+    'popup_size_load', 'popup_size_fail', 'popup_size_progress', 'startup_demo', 'current_demo',
+    'sim_batch_size', 'sim_history_mode', 'sim_history_every', 'sim_history_capacity'
+})
+
+def settings_fingerprint() -> dict:
+    """The current settings that can make a difference to the outcome of a simulation run."""
+    fingerprint = { name: value for name, value in vars(SETTINGS).items() if name not in _DISPLAY_SETTINGS }
+    fingerprint['paradigm'] = Lexicon.fromparadigm(SETTINGS.paradigm).to_dict()
+    return fingerprint
+
+class ResultCache:
+    """Outcomes of seeded simulation runs, stored in a directory with one file per parameter setup.
+    A setup's file is named after a hash of the demo, its arguments and the current settings
+    (see settings_fingerprint) and lists the seed and outcome of each run performed so far."""
+
+    # to be increased whenever a change to the simulation makes earlier outcomes obsolete
+    VERSION = 2
+
+    def __init__(self, directory: str='tuning_cache') -> None:
+        self.directory = directory
+        makedirs(directory, exist_ok=True)
+        # the contents of setup files read so far
+        self.loaded: dict[str, dict[int, Outcome]] = {}
+
+    def setup_key(self, demo: SETTINGS.DemoAgora, demo_args: DemoArguments) -> str:
+        """The stable hash a parameter setup's outcomes are filed under, given the current settings."""
+        key = { 'version' : self.VERSION,
+                'demo' : demo,
+                'demo_args' : astuple(demo_args),
+                'settings' : settings_fingerprint() }
+        return sha256(dumps(key, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def _filename(self, key: str) -> str:
+        return join(self.directory, key + '.jsonl')
+
+    def _load(self, key: str) -> dict[int, Outcome]:
+        """The seeds and outcomes filed under a key, read from disk on first use."""
+        if key not in self.loaded:
+            outcomes: dict[int, Outcome] = {}
+            if isfile(self._filename(key)):
+                with open(self._filename(key), 'r', encoding='utf-8') as filehandle:
+                    for line in filehandle.read().splitlines():
+                        try:
+                            entry = loads(line)
+                        except ValueError:
+                            # the last line may have been cut short
+                            warning("ResultCache: Ignoring incomplete entry %r" % line)
+                            continue
+                        dominant_form, uniform_balance = entry['outcome']
+                        outcomes[entry['seed']] = (dominant_form, uniform_balance)
+            self.loaded[key] = outcomes
+        return self.loaded[key]
+
+    def get(self, demo: SETTINGS.DemoAgora, demo_args: DemoArguments, seeds: list[int]) -> dict[int, Outcome]:
+        """The outcomes of those runs of a setup with the given seeds that are in the cache."""
+        outcomes = self._load(self.setup_key(demo, demo_args))
+        return { seed: outcomes[seed] for seed in seeds if seed in outcomes }
+
+    def put(self, demo: SETTINGS.DemoAgora, demo_args: DemoArguments, entries: list[tuple[int, Outcome]]) -> None:
+        """File the outcomes of a number of runs of a setup, given as (seed, outcome)."""
+        key = self.setup_key(demo, demo_args)
+        outcomes = self._load(key)
+        with open(self._filename(key), 'a', encoding='utf-8') as filehandle:
+            filehandle.write(''.join(dumps({ 'seed' : seed, 'outcome' : outcome }) + "\n" for seed, outcome in entries))
+        outcomes.update(entries)
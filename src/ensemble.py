@@ -0,0 +1,161 @@
+"""Many independent simulation runs from the same starting Agora, advanced in lockstep."""
+
+from typing import Optional
+
+import numpy as np
+
+from .learning import learning_kernel
+from .rng import RAND
+from .settings import SETTINGS
+
+class Ensemble:
+    """A number of independent replicas of the same starting Agora stored in (replica, speaker, cell)
+    arrays and all advanced by one vectorized simulation step at a time. Each replica stops on its own
+    as soon as it is stable in the sense of Agora.all_biased_and_experienced (or when it reaches the
+    maximum iteration), just like a run of Agora.simulate_till_stable would."""
+
+    def __init__(self, agora, replicas: int) -> None:
+        population = agora.bind_population()
+        population.settle_decay()
+        self.pair_sampler = agora.bind_pair_sampler()
+        self.replicas = replicas
+        self.size = len(population)
+        # the lexicon is shared by all speakers in all replicas
+        lexicon = population.lexicon
+        self.alternates = lexicon.alternates
+        self.is_broadcaster = population.is_broadcaster
+        self.weights = lexicon.weights
+        self.weight_total = lexicon.weight_total
+        self.lexicon = lexicon
+        self.learning_kernel = learning_kernel(SETTINGS.sim_learning_model)
+        # the state of each replica
+        self.bias_a = np.repeat(population.bias_a[np.newaxis], replicas, axis=0)
+        self.experience = np.repeat(population.experience[np.newaxis], replicas, axis=0)
+        self.principal_biases = np.repeat(population.principal_biases()[np.newaxis], replicas, axis=0)
+        self.iterations = np.zeros(replicas, dtype=np.int64)
+        self.finished = np.zeros(replicas, dtype=bool)
+        # queued picks: the rest of a broadcast or the second half of a mutual exchange
+        self.broadcaster = np.full(replicas, -1)
+        self.broadcast_next = np.zeros(replicas, dtype=np.int64)
+        self.reverse_pending = np.zeros(replicas, dtype=bool)
+        self.reverse_speaker = np.zeros(replicas, dtype=np.int64)
+        self.reverse_hearer = np.zeros(replicas, dtype=np.int64)
+
+    def run(self) -> None:
+        """Keep stepping all unfinished replicas until each of them is stable or out of time."""
+        max_iteration = SETTINGS.sim_max_iteration
+        while True:
+            active = np.flatnonzero(~self.finished)
+            stable = self.stable(active)
+            self.finished[active[stable]] = True
+            active = active[~stable]
+            if not len(active):
+                return
+            self.step(active)
+            self.iterations[active] += 1
+            self.finished[active[self.iterations[active] >= max_iteration]] = True
+
+    def stable(self, replicas: np.ndarray) -> np.ndarray:
+        """Check the stopping criterion for the given replicas: every speaker is sufficiently biased and experienced."""
+        assert SETTINGS.bias_threshold >= 0.5
+        bias_enough = abs(self.principal_biases[replicas] - 0.5) > SETTINGS.bias_threshold - 0.5
+        experience_enough = self.experience[replicas] > SETTINGS.experience_threshold
+        return (self.is_broadcaster | (bias_enough & experience_enough)).all(axis=-1)
+
+    def dominant_forms(self) -> list[Optional[str]]:
+        """The form every speaker leans towards in each replica, if there is one."""
+        all_a = (self.principal_biases > 0.5).all(axis=-1)
+        all_b = (self.principal_biases < 0.5).all(axis=-1)
+        return ['A' if a else 'B' if b else None for a, b in zip(all_a, all_b)]
+
+    def uniform_balances(self) -> np.ndarray:
+        """Detect replicas where no speaker is strongly biased either way."""
+        return ((1 - SETTINGS.bias_threshold < self.principal_biases) &
+                (self.principal_biases < SETTINGS.bias_threshold)).all(axis=-1)
+
+    def step(self, replicas: np.ndarray) -> None:
+        """Perform one iteration in each of the given replicas."""
+        speakers, hearers = self._pick(replicas)
+        count = len(replicas)
+        if SETTINGS.sim_single_cell:
+            # the first cell of a lexeme
+            cells = self.lexicon.draw_lexemes(count) * self.lexicon.num_cells
+        else:
+            # a non-empty cell to share with the hearer
+            cells = self.lexicon.draw_cells(count, SETTINGS.sim_cell_sampling == SETTINGS.CellSampling.PROMINENCE)
+        form_a_used = RAND.uniform(count) < self.bias_a[replicas, speakers, cells]
+        if SETTINGS.sim_prefer_opposite:
+            form_a_used = ~form_a_used
+        self.hear(replicas, hearers, cells, form_a_used)
+        if SETTINGS.sim_influence_self:
+            self.hear(replicas, speakers, cells, form_a_used)
+        if SETTINGS.sim_passive_decay:
+            self.passive_decay(replicas, speakers, hearers)
+
+    def _pick(self, replicas: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Choose a speaker and a hearer in each replica, taking queued picks first."""
+        speakers = np.empty(len(replicas), dtype=np.int64)
+        hearers = np.empty(len(replicas), dtype=np.int64)
+        # the rest of a broadcast
+        queued = self.broadcaster[replicas] >= 0
+        broadcasting = replicas[queued]
+        broadcaster = self.broadcaster[broadcasting]
+        ordinal = self.broadcast_next[broadcasting]
+        speakers[queued] = broadcaster
+        hearers[queued] = ordinal + (ordinal >= broadcaster)
+        self._advance_broadcast(broadcasting, ordinal + 1)
+        # the second half of a mutual exchange
+        reversed_ = self.reverse_pending[replicas]
+        reversing = replicas[reversed_]
+        speakers[reversed_] = self.reverse_speaker[reversing]
+        hearers[reversed_] = self.reverse_hearer[reversing]
+        self.reverse_pending[reversing] = False
+        # fresh picks for everyone else
+        fresh = ~queued & ~reversed_
+        fresh_speakers, fresh_hearers = self.pair_sampler.pick_many(int(fresh.sum()))
+        starts_broadcast = self.is_broadcaster[fresh_speakers]
+        # a broadcaster's first hearer is the first row other than their own
+        fresh_hearers = np.where(starts_broadcast, (fresh_speakers == 0).astype(np.int64), fresh_hearers)
+        speakers[fresh] = fresh_speakers
+        hearers[fresh] = fresh_hearers
+        fresh_replicas = replicas[fresh]
+        self.broadcaster[fresh_replicas[starts_broadcast]] = fresh_speakers[starts_broadcast]
+        self._advance_broadcast(fresh_replicas[starts_broadcast], 1)
+        if SETTINGS.sim_influence_mutual:
+            reversing = fresh_replicas[~starts_broadcast]
+            self.reverse_pending[reversing] = True
+            self.reverse_speaker[reversing] = fresh_hearers[~starts_broadcast]
+            self.reverse_hearer[reversing] = fresh_speakers[~starts_broadcast]
+        return speakers, hearers
+
+    def _advance_broadcast(self, replicas: np.ndarray, next_ordinal: np.ndarray | int) -> None:
+        """Move on to the next hearer of a broadcast, or end it if everybody has heard it."""
+        self.broadcast_next[replicas] = next_ordinal
+        over = self.broadcast_next[replicas] > self.size - 2
+        self.broadcaster[replicas[over]] = -1
+
+    def hear(self, replicas: np.ndarray, rows: np.ndarray, cells: np.ndarray, form_a_used: np.ndarray) -> None:
+        """Let the given speakers in the given replicas hear the given forms and adjust their biases."""
+        # impossible to tell which kind of form we got in a cell that does not alternate
+        recognized = self.alternates[cells]
+        replicas, rows, cells, form_a_used = replicas[recognized], rows[recognized], cells[recognized], form_a_used[recognized]
+        self.learning_kernel(self.bias_a, (replicas, rows), cells, form_a_used, self.experience[replicas, rows], self.lexicon)
+        self.experience[replicas, rows] += 1
+        self.principal_biases[replicas, rows] = \
+            (self.bias_a[replicas, rows] * self.weights).sum(axis=-1) / self.weight_total
+
+    def passive_decay(self, replicas: np.ndarray, speakers: np.ndarray, hearers: np.ndarray) -> None:
+        """Make everyone on the sidelines gradually forget their underrepresented forms."""
+        rows = np.arange(self.size)
+        sidelined = np.ones((len(replicas), self.size), dtype=bool)
+        sidelined[np.arange(len(replicas)), speakers] = False
+        sidelined[np.arange(len(replicas)), hearers] = False
+        # whoever is still waiting to hear the rest of a broadcast is busy too
+        broadcaster = self.broadcaster[replicas][:, np.newaxis]
+        ordinals = rows - (rows > broadcaster)
+        waiting = (broadcaster >= 0) & (ordinals >= self.broadcast_next[replicas][:, np.newaxis])
+        sidelined &= ~waiting
+        bias_a = self.bias_a[replicas]
+        decayed = np.clip(np.where(bias_a > 0.5, bias_a * 1.02, np.where(bias_a < 0.5, bias_a / 1.02, bias_a)), 0., 1.)
+        self.bias_a[replicas] = np.where(sidelined[..., np.newaxis], decayed, bias_a)
+        self.principal_biases[replicas] = (self.bias_a[replicas] * self.weights).sum(axis=-1) / self.weight_total
@@ -213,6 +213,7 @@ _LOCALIZE_TEXTS_HUN = L10nDict({
     "Inner ring radius" : "Belső gyűrű sugara",
     " start, stop, step:" : " eleje, vége, lépésköz:",
     "Repetitions per configuration:" : "Ismétlés beállításonként:",
+    "Run the repetitions side by side (faster, but not seeded one by one)" : "Az ismétlések egyszerre fussanak (gyorsabb, de nem egyenként seedelve)",
     "Go" : "Menjen!",
     "Crunching numbers, hang tight..." : "Kis türelmet, ez eltarthat ám egy darabig...",
     "Running parameter setup %d out of %d..." : "Ez a(z) %d. beállítás %d közül..."
@@ -8,7 +8,6 @@ from sys import path
 from typing import Dict, Optional, Self, Union
 
 from kivy.config import ConfigParser
-from kivy.graphics import Color
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.button import Button
 from kivy.uix.settings import InterfaceWithNoMenu, Settings, SettingItem, SettingOptions, SettingsPanel
@@ -275,8 +274,8 @@ class CustomSettings(Settings):
                     if 'draw_arrow' == key and new_value == ('0' if getattr(SETTINGS, key) else '1'):
                         update_arrow = True
                 elif 'color' == value_type:
-                    new_value = Color(*get_color_from_hex(new_value))
-                    if new_value.rgb != getattr(SETTINGS, key).rgb:
+                    new_value = tuple(get_color_from_hex(new_value)[:3])
+                    if new_value != getattr(SETTINGS, key):
                         update_colors = True
                 elif 'numeric' == value_type:
                     new_value = int(new_value)
@@ -329,8 +328,8 @@ class CustomSettings(Settings):
                     old_value = getattr(SETTINGS, config_key)
                     if isinstance(old_value, bool):
                         old_value = '1' if old_value else '0'
-                    elif isinstance(old_value, Color):
-                        old_value = get_hex_from_color(old_value.rgb)
+                    elif isinstance(old_value, tuple):
+                        old_value = get_hex_from_color(old_value)
                     elif isinstance(old_value, float):
                         # plain float to percentage
                         old_value = str(100 * old_value) + '%'
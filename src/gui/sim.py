@@ -33,8 +33,8 @@ from .l10n import localize, LocalizedPopup
 
 from ..settings import SETTINGS
 from ..agora import Agora
-from ..paradigm import CellIndex, NounParadigm
-from ..speaker import Speaker, PairPick
+from ..paradigm import Paradigm
+from ..speaker import Speaker
 
 
 class SimTabLayout(BoxLayout):
@@ -264,7 +264,7 @@ class SpeakerDot(Speaker, DragBehavior, Widget):
 
     color = ColorProperty()
 
-    def __init__(self, n: int, pos: tuple[float, float], para: NounParadigm, experience: int, **kwargs) -> None:
+    def __init__(self, n: int, pos: tuple[float, float], para: Paradigm, experience: int, **kwargs) -> None:
         Speaker.__init__(self, n, pos, para, experience, False)
         DragBehavior.__init__(self, **kwargs)
         Widget.__init__(self, **kwargs)
@@ -280,8 +280,12 @@ class SpeakerDot(Speaker, DragBehavior, Widget):
     def fromspeaker(cls, speaker: Speaker) -> Self:
         """Copy an existing Speaker."""
         if speaker.is_broadcaster:
-            return BroadcasterSpeakerDot(speaker.n, speaker.pos, deepcopy(speaker.para), speaker.experience)
-        return SpeakerDot(speaker.n, speaker.pos, deepcopy(speaker.para), speaker.experience)
+            speakerdot = BroadcasterSpeakerDot(speaker.n, speaker.pos, deepcopy(speaker.para), speaker.experience)
+        else:
+            speakerdot = SpeakerDot(speaker.n, speaker.pos, deepcopy(speaker.para), speaker.experience)
+        speakerdot.copy_lexemes(speaker)
+        speakerdot.update_color()
+        return speakerdot
 
     def on_mouse_pos(self, _window, pos: tuple[float, float]) -> None:
         """Show/hide NameTag on hover."""
@@ -335,32 +339,20 @@ class SpeakerDot(Speaker, DragBehavior, Widget):
         color_a = SETTINGS.color_a
         color_b = SETTINGS.color_b
         bias = self.principal_bias(force_update=force_update)
-        self.color = [sum(x) for x in zip([bias * c for c in color_a.rgb],
-                                          [(1-bias) * c for c in color_b.rgb])]
-
-    def talk(self, pick: PairPick) -> tuple[CellIndex, bool]:
-        """Interact with and influence another Speaker in the Agora."""
-        assert pick['speaker'] == self
-        assert isinstance(pick['speaker'], SpeakerDot)
-        assert isinstance(pick['hearer'], SpeakerDot)
-        retval = Speaker.talk(self, pick)
-        if self.parent.graphics_on:
-            pick['hearer'].update_color()
-            if SETTINGS.sim_influence_self:
-                pick['speaker'].update_color()
-        return retval
+        self.color = [sum(x) for x in zip([bias * c for c in color_a],
+                                          [(1-bias) * c for c in color_b])]
 
 class BroadcasterSpeakerDot(SpeakerDot):
     """The GUI representation of a broadcasting speaker who never listens to anyone."""
 
-    def __init__(self, n: int, pos: tuple[float, float], para: NounParadigm, experience: int, **kwargs):
+    def __init__(self, n: int, pos: tuple[float, float], para: Paradigm, experience: int, **kwargs):
         super().__init__(n, pos, para, experience, **kwargs)
         self.is_broadcaster = True
         self.update_color()
 
     def update_color(self, force_update: bool=False) -> None:
         """Set own color to special color to stand apart from the rest of the speakers."""
-        self.color = SETTINGS.color_broadcaster.rgb
+        self.color = SETTINGS.color_broadcaster
 
 # TODO: use a single global NameTag for all SpeakerDots
 class NameTag(Label):
@@ -385,15 +377,17 @@ class BrainViewTable(GridLayout):
         super().__init__(**kwargs)
         self.columns = 8
         self.rows = 14
+        # export the speaker's paradigm only once, not for every cell
+        para = speaker.para
         for case in range(0, 14):
             self.add_widget(Label(text=SETTINGS.paradigm.para[0][case].form_a))
-            self.add_widget(Label(text=str(round(speaker.para[0][case].bias_a, 3))))
+            self.add_widget(Label(text=str(round(para[0][case].bias_a, 3))))
             self.add_widget(Label(text=SETTINGS.paradigm.para[0][case].form_b))
-            self.add_widget(Label(text=str(round(1 - speaker.para[0][case].bias_a, 3))))
+            self.add_widget(Label(text=str(round(1 - para[0][case].bias_a, 3))))
             self.add_widget(Label(text=SETTINGS.paradigm.para[1][case].form_a))
-            self.add_widget(Label(text=str(round(speaker.para[1][case].bias_a, 3))))
+            self.add_widget(Label(text=str(round(para[1][case].bias_a, 3))))
             self.add_widget(Label(text=SETTINGS.paradigm.para[1][case].form_b))
-            self.add_widget(Label(text=str(round(1 - speaker.para[1][case].bias_a, 3))))
+            self.add_widget(Label(text=str(round(1 - para[1][case].bias_a, 3))))
 
 class AgoraWidget(Widget, Agora):
     """An agora of speakers visualized on the screen."""
@@ -477,7 +471,7 @@ class AgoraWidget(Widget, Agora):
         """Add an array of pre-built Speakers."""
         # Attention: base class method is *not* called here
         assert not self.state.speakers
-        assert not self.speaker_pairs
+        assert not self.pair_sampler
         for speaker in speakers:
             self.add_speakerdot(SpeakerDot.fromspeaker(speaker))
         assert self.state.speakers
@@ -534,6 +528,10 @@ class AgoraWidget(Widget, Agora):
     def simulate(self, *_) -> None:
         """Perform a single step of simulation: let one speaker talk to another."""
         super().simulate(*_)
+        if self.graphics_on:
+            self.pick['hearer'].update_color()
+            if SETTINGS.sim_influence_self:
+                self.pick['speaker'].update_color()
         self.update_talk_arrow()
         self.update_iteration_counter()
 
@@ -543,6 +541,7 @@ class AgoraWidget(Widget, Agora):
         self.graphics_on = False
         keep_going = super().simulate_till_stable(batch_size=batch_size)
         self.graphics_on = graphics_on_before
+        self.update_iteration_counter()
         if not keep_going:
             self.stop_sim()
             ff_button = get_button_layout().ids.fast_forward_button
@@ -583,12 +582,12 @@ class AgoraWidget(Widget, Agora):
         step_y = int(self.height / SETTINGS.grid_resolution)
         if highlight:
             # highlight grid while dragged (looks cool)
-            grid_color_doubled = (2 * SETTINGS.grid_color.rgb[0],
-                                  2 * SETTINGS.grid_color.rgb[1],
-                                  2 * SETTINGS.grid_color.rgb[2])
+            grid_color_doubled = (2 * SETTINGS.grid_color[0],
+                                  2 * SETTINGS.grid_color[1],
+                                  2 * SETTINGS.grid_color[2])
             self.canvas.before.add(Color(*grid_color_doubled))
         else:
-            self.canvas.before.add(SETTINGS.grid_color)
+            self.canvas.before.add(Color(*SETTINGS.grid_color))
         for delta_x in range(0, int(half_sqrt_2 * self.width), step_x):
             self.canvas.before.add(Line(points=[self.width/2 + delta_x,
                                                 bottom,
@@ -658,15 +657,15 @@ class AgoraWidget(Widget, Agora):
                                                width=width)
             color_arrow_shaft = None
             if self.history[-1].form_a:
-                color_arrow_shaft = SETTINGS.color_a.rgb
+                color_arrow_shaft = SETTINGS.color_a
             else:
-                color_arrow_shaft = SETTINGS.color_b.rgb
+                color_arrow_shaft = SETTINGS.color_b
             color_arrow_shaft = (0.85 * color_arrow_shaft[0],
                                  0.85 * color_arrow_shaft[1],
                                  0.85 * color_arrow_shaft[2])
             self.canvas.add(Color(*color_arrow_shaft))
             self.canvas.add(self.talk_arrow_shaft)
-            self.canvas.add(SETTINGS.color_arrow_tip)
+            self.canvas.add(Color(*SETTINGS.color_arrow_tip))
             self.canvas.add(self.talk_arrow_tip)
 
     def update_speakerdot_colors(self) -> None:
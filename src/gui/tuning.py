@@ -144,6 +144,7 @@ class LaunchTuningButton(Button):
             # parameter not available
             inner_radius_params = (None, None, None)
         repetitions = int(tuning_menu.ids.repetition_input.text)
+        batched = tuning_menu.ids.batched_checkbox.active
 
         content = TuningProgressPopup(cancel=self.cancel_tuning)
         self.tuner = TunerPopup(our_bias_params,
@@ -151,6 +152,7 @@ class LaunchTuningButton(Button):
                                 starting_experience_params,
                                 inner_radius_params,
                                 repetitions,
+                                batched,
                                 title="Crunching numbers, hang tight...",
                                 content=content,
                                 size_hint=(None, None),
@@ -199,4 +201,4 @@ class TunerPopup(Tuner, LocalizedPopup):
         super().prepare_next_setup()
         self.ids.container.children[0].ids.progress_label.text = \
             localize("Running parameter setup %d out of %d...") % \
-            (self.current_setup, self.num_total_setups)
+            (self.current_setup + 1, self.num_total_setups)
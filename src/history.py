@@ -0,0 +1,186 @@
+"""A compact, columnar log of the interactions that make up an Agora's past history."""
+
+from dataclasses import dataclass
+from typing import Iterator, Optional, Self
+
+import numpy as np
+
+from .paradigm import AnyCellIndex, CellIndex, NounParadigm, Paradigm, PARADIGM_CLASSES
+from .settings import SETTINGS
+
+@dataclass(frozen=True)
+class HistoryItem:
+    """A single entry in the list of interactions that constitute the Agora's past history.
+    Basically stores a pick and which cell (of which lexeme) and form was used in the interaction."""
+    speaker: int
+    hearer: int
+    cell: AnyCellIndex
+    form_a: bool
+    lexeme: int = 0
+
+    def to_dict(self):
+        """Returns own state for JSON serialization."""
+        return self.__dict__
+
+class HistoryLog:
+    """Interactions stored column by column in typed arrays (about 12 bytes apiece) that grow in chunks.
+    Depending on the mode every interaction is kept, or only every k'th one, or only the last M ones,
+    or none at all. Indexing the log yields HistoryItems just like a plain list would.
+    Cell ids are split into lexeme and cell according to paradigm_class, which the Agora keeps up to date
+    with set_paradigm_class."""
+
+    # number of entries the arrays grow by at least when they fill up
+    CHUNK_SIZE = 4096
+
+    def __init__(self, mode: Optional[SETTINGS.HistoryMode]=None,
+                 every: Optional[int]=None, capacity: Optional[int]=None) -> None:
+        self.mode = mode if mode is not None else SETTINGS.sim_history_mode
+        self.every = every if every is not None else SETTINGS.sim_history_every
+        self.capacity = capacity if capacity is not None else SETTINGS.sim_history_capacity
+        assert self.every > 0 and self.capacity > 0
+        self.paradigm_class: type[Paradigm] = NounParadigm
+        self.clear()
+
+    def clear(self) -> None:
+        """Forget all logged interactions."""
+        size = self.capacity if self.mode == SETTINGS.HistoryMode.RING else 0
+        self.speaker = np.zeros(size, dtype=np.int32)
+        self.hearer = np.zeros(size, dtype=np.int32)
+        self.lexeme = np.zeros(size, dtype=np.uint16)
+        self.cell_id = np.zeros(size, dtype=np.uint8)
+        self.form_a = np.zeros(size, dtype=bool)
+        # number of interactions offered to the log so far and number of entries written
+        self.total = 0
+        self.written = 0
+
+    def set_paradigm_class(self, paradigm_class: type[Paradigm]) -> None:
+        """Log interactions in paradigms of the given kind from now on. The entries logged so far
+        would be read as cells of the wrong kind of paradigm, so they are forgotten if the kind changes."""
+        if paradigm_class is not self.paradigm_class:
+            self.clear()
+            self.paradigm_class = paradigm_class
+
+    def _grow(self) -> None:
+        new_size = len(self.speaker) + max(len(self.speaker), self.CHUNK_SIZE)
+        for column in ('speaker', 'hearer', 'lexeme', 'cell_id', 'form_a'):
+            old = getattr(self, column)
+            new = np.zeros(new_size, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, column, new)
+
+    def append(self, speaker: int, hearer: int, cell_id: int, form_a: bool) -> None:
+        """Log an interaction unless the mode says to skip it (cell_id counts across all lexemes)."""
+        self.total += 1
+        if self.mode == SETTINGS.HistoryMode.OFF:
+            return
+        if self.mode == SETTINGS.HistoryMode.SAMPLED and (self.total - 1) % self.every:
+            return
+        if self.mode == SETTINGS.HistoryMode.RING:
+            pos = self.written % self.capacity
+        else:
+            if self.written == len(self.speaker):
+                self._grow()
+            pos = self.written
+        self.speaker[pos] = speaker
+        self.hearer[pos] = hearer
+        self.lexeme[pos], self.cell_id[pos] = divmod(cell_id, self.paradigm_class.NUM_CELLS)
+        self.form_a[pos] = form_a
+        self.written += 1
+
+    def append_many(self, speaker: np.ndarray, hearer: np.ndarray, cell_id: np.ndarray, form_a: np.ndarray) -> None:
+        """Log a number of interactions in one go, the same as appending them one after the other."""
+        count = len(speaker)
+        first = self.total
+        self.total += count
+        if self.mode == SETTINGS.HistoryMode.OFF:
+            return
+        if self.mode == SETTINGS.HistoryMode.SAMPLED:
+            kept = np.arange(-first % self.every, count, self.every)
+        elif self.mode == SETTINGS.HistoryMode.RING:
+            # only the last ones would survive anyway
+            kept = np.arange(max(count - self.capacity, 0), count)
+        else:
+            kept = np.arange(count)
+        if self.mode == SETTINGS.HistoryMode.RING:
+            positions = (self.written + kept) % self.capacity
+            written = count
+        else:
+            while self.written + len(kept) > len(self.speaker):
+                self._grow()
+            positions = np.arange(self.written, self.written + len(kept))
+            written = len(kept)
+        self.speaker[positions] = speaker[kept]
+        self.hearer[positions] = hearer[kept]
+        self.lexeme[positions], self.cell_id[positions] = np.divmod(cell_id[kept], self.paradigm_class.NUM_CELLS)
+        self.form_a[positions] = form_a[kept]
+        self.written += written
+
+    def __len__(self) -> int:
+        if self.mode == SETTINGS.HistoryMode.RING:
+            return min(self.written, self.capacity)
+        return self.written
+
+    def _positions(self) -> np.ndarray:
+        """Where the retained entries are in the arrays, oldest first."""
+        if self.mode == SETTINGS.HistoryMode.RING and self.written > self.capacity:
+            return np.roll(np.arange(self.capacity), -(self.written % self.capacity))
+        return np.arange(len(self))
+
+    def __getitem__(self, index: int) -> HistoryItem:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("history index out of range")
+        if self.mode == SETTINGS.HistoryMode.RING and self.written > self.capacity:
+            index = (self.written + index) % self.capacity
+        return HistoryItem(self.speaker.item(index),
+                           self.hearer.item(index),
+                           self.paradigm_class.INDEX_CLASS.fromid(self.cell_id.item(index)),
+                           self.form_a.item(index),
+                           self.lexeme.item(index))
+
+    def __iter__(self) -> Iterator[HistoryItem]:
+        return (self[i] for i in range(len(self)))
+
+    def to_dict(self):
+        """Returns own state for JSON serialization, one list per column."""
+        positions = self._positions()
+        return { 'paradigm' : self.paradigm_class.KIND,
+                 'speaker' : self.speaker[positions].tolist(),
+                 'hearer'  : self.hearer[positions].tolist(),
+                 'lexeme'  : self.lexeme[positions].tolist(),
+                 'cell_id' : self.cell_id[positions].tolist(),
+                 'form_a'  : self.form_a[positions].tolist() }
+
+    @classmethod
+    def from_dict(cls, history_dict) -> Self:
+        """Construct a HistoryLog in the configured mode from an imported JSON dictionary
+        (or from the list of HistoryItem dictionaries older files contain).
+        The entries in it count as logged already: a ring keeps the last ones that fit,
+        no entries are kept if logging is off, and all of them are kept otherwise."""
+        history = cls()
+        if isinstance(history_dict, list):
+            history_dict = { 'speaker' : [item['speaker'] for item in history_dict],
+                             'hearer' : [item['hearer'] for item in history_dict],
+                             'cell_id' : [CellIndex(*item['cell']).cell_id() for item in history_dict],
+                             'form_a' : [item['form_a'] for item in history_dict] }
+        history.paradigm_class = PARADIGM_CLASSES[history_dict.get('paradigm', NounParadigm.KIND)]
+        size = len(history_dict['speaker'])
+        columns = { 'speaker' : np.array(history_dict['speaker'], dtype=np.int32),
+                    'hearer' : np.array(history_dict['hearer'], dtype=np.int32),
+                    'lexeme' : np.array(history_dict.get('lexeme', np.zeros(size)), dtype=np.uint16),
+                    'cell_id' : np.array(history_dict['cell_id'], dtype=np.uint8),
+                    'form_a' : np.array(history_dict['form_a'], dtype=bool) }
+        history.total = size
+        if history.mode == SETTINGS.HistoryMode.OFF:
+            return history
+        if history.mode == SETTINGS.HistoryMode.RING:
+            kept = min(size, history.capacity)
+            for column, values in columns.items():
+                getattr(history, column)[:kept] = values[size - kept:]
+            history.written = kept
+            return history
+        for column, values in columns.items():
+            setattr(history, column, values)
+        history.written = size
+        return history
@@ -0,0 +1,164 @@
+"""Learning models as vectorized kernels that adjust the biases of a whole batch of hearers at once."""
+
+from typing import Callable, Optional
+
+import numpy as np
+
+from .lexicon import Lexicon, PlainLexicon
+from .paradigm import propagation_delta
+from .settings import SETTINGS
+
+# kernel(bias_a, hearers, cells, form_a_used, experience, lexicon) -> change in weighted bias sum
+#   bias_a: the biases of everyone (in every replica), its last axis running over all cells of the lexicon
+#   hearers: a tuple of index arrays into the leading axes of bias_a, one entry per event, no hearer twice
+#   cells, form_a_used, experience: one entry per event, experience as it was before the event
+# Only alternating cells are ever heard. The kernel updates bias_a in place and returns how much
+# each hearer's sum of biases weighted by Lexicon.weights has changed.
+LearningKernel = Callable[[np.ndarray, tuple[np.ndarray, ...], np.ndarray, np.ndarray, np.ndarray, Lexicon], np.ndarray]
+
+# scalar_kernel(bias, offset, cell, form_a_used, experience, lexicon) -> change in weighted bias sum
+#   the same as a kernel for a single event, on plain Python numbers: bias is a flat memoryview of bias_a
+#   in which the hearer's cells start at offset, and lexicon is what Lexicon.plain returns.
+# Running one event through every array operation of a kernel costs far more than the arithmetic itself,
+# so a model may come with a scalar kernel for the one interaction at a time of an Agora. It must change
+# bias_a the same way as the kernel does (the returned change may differ in rounding).
+ScalarLearningKernel = Callable[[memoryview, int, int, bool, int, PlainLexicon], float]
+
+LEARNING_MODELS: dict[str, LearningKernel] = {}
+SCALAR_LEARNING_MODELS: dict[str, ScalarLearningKernel] = {}
+
+def register_learning_model(model: str, kernel: LearningKernel, scalar_kernel: Optional[ScalarLearningKernel]=None) -> None:
+    """Make a learning model available under a name (normally a member of SETTINGS.LearningModel)."""
+    LEARNING_MODELS[model] = kernel
+    if scalar_kernel is None:
+        SCALAR_LEARNING_MODELS.pop(model, None)
+    else:
+        SCALAR_LEARNING_MODELS[model] = scalar_kernel
+
+def learning_kernel(model: str) -> LearningKernel:
+    """The kernel of a learning model, to be looked up once per run rather than once per interaction."""
+    return LEARNING_MODELS[model]
+
+def scalar_learning_kernel(model: str) -> Optional[ScalarLearningKernel]:
+    """The scalar kernel of a learning model if it has one."""
+    return SCALAR_LEARNING_MODELS.get(model)
+
+def _clip(bias_a: np.ndarray) -> np.ndarray:
+    """Keep biases within [0,1] (bare ufuncs are much cheaper than np.clip on tiny arrays)."""
+    return np.minimum(np.maximum(bias_a, 0.), 1.)
+
+def _columns(hearers: tuple[np.ndarray, ...], cells: np.ndarray) -> tuple[np.ndarray, ...]:
+    """Index into bias_a at a row of cells per hearer."""
+    return tuple(h[:, np.newaxis] for h in hearers) + (cells,)
+
+def hear_harmonic(bias_a: np.ndarray, hearers: tuple[np.ndarray, ...], cells: np.ndarray,
+                  form_a_used: np.ndarray, experience: np.ndarray, lexicon: Lexicon) -> np.ndarray:
+    """The n'th interaction has +-1/n impact on the exact cell's bias, spread to its neighbours."""
+    delta = np.where(form_a_used, 1., -1.) / (experience + 1)
+    heard = hearers + (cells,)
+    old = bias_a[heard]
+    new = _clip(old + delta)
+    bias_a[heard] = new
+    change = lexicon.weights[cells] * (new - old)
+    delta = propagation_delta(lexicon.prominence[cells], delta)
+    targets = lexicon.targets[cells]
+    spread = _columns(hearers, targets)
+    old = bias_a[spread]
+    new = np.where(lexicon.alternates[targets], _clip(old + delta[:, np.newaxis]), old)
+    bias_a[spread] = new
+    return change + (lexicon.weights[targets] * (new - old)).sum(axis=-1)
+
+def hear_harmonic_one(bias: memoryview, offset: int, cell: int, form_a_used: bool, experience: int,
+                      lexicon: PlainLexicon) -> float:
+    """hear_harmonic for a single event."""
+    delta = (1. if form_a_used else -1.) / (experience + 1)
+    weights = lexicon.weights
+    old = bias[offset + cell]
+    new = old + delta
+    new = 0. if new < 0. else 1. if new > 1. else new
+    bias[offset + cell] = new
+    change = weights[cell] * (new - old)
+    spread = lexicon.spread[cell]
+    if spread:
+        delta = propagation_delta(lexicon.prominence[cell], delta)
+        for target in spread:
+            old = bias[offset + target]
+            new = old + delta
+            new = 0. if new < 0. else 1. if new > 1. else new
+            bias[offset + target] = new
+            change += weights[target] * (new - old)
+    return change
+
+def _hear_rw(bias_a: np.ndarray, hearers: tuple[np.ndarray, ...], cells: np.ndarray,
+             form_a_used: np.ndarray, lexicon: Lexicon, weighted: bool) -> np.ndarray:
+    """The Rescorla-Wagner learning models, vanilla or weighted, over all activated cells at once."""
+    activated = lexicon.activation_table(SETTINGS.sim_single_cell)[cells, np.where(form_a_used, 0, 1)]
+    lexeme_cells = lexicon.lexeme_cells(cells, SETTINGS.sim_single_cell)
+    columns = _columns(hearers, lexeme_cells)
+    old = bias_a[columns]
+    prominence = lexicon.prominence[lexeme_cells]
+    lambda_ = 1  # maximum conditioning (in a single cell)
+    v_max = lambda_ * activated.sum(axis=-1)
+    associations = old - (1 - old)
+    if weighted:
+        associations = associations * prominence
+    # total weight of associations
+    v_total = np.where(activated, associations, 0.).sum(axis=-1) / v_max
+    surprise = lambda_ * np.where(form_a_used, 1., -1.) - v_total
+    alpha = prominence                # salience of conditioned stimuli
+    beta = lexicon.prominence[cells]  # salience of unconditioned stimulus
+    delta_v = SETTINGS.sim_rw_default_rate * alpha * (beta * surprise)[:, np.newaxis]
+    # adjust affected cells only, [-1,1] scaled to [0,1]
+    new = np.where(activated, _clip(old + 0.5 * delta_v), old)
+    bias_a[columns] = new
+    return (lexicon.weights[lexeme_cells] * (new - old)).sum(axis=-1)
+
+def _hear_rw_one(bias: memoryview, offset: int, cell: int, form_a_used: bool,
+                 lexicon: PlainLexicon, weighted: bool) -> float:
+    """_hear_rw for a single event."""
+    activated = [cell] if SETTINGS.sim_single_cell else lexicon.activated[cell][0 if form_a_used else 1]
+    prominence = lexicon.prominence
+    lambda_ = 1  # maximum conditioning (in a single cell)
+    v_max = lambda_ * len(activated)
+    v_total = 0.
+    for activated_cell in activated:
+        old = bias[offset + activated_cell]
+        association = old - (1 - old)
+        v_total += association * prominence[activated_cell] if weighted else association
+    surprise = lambda_ * (1. if form_a_used else -1.) - v_total / v_max
+    beta_surprise = prominence[cell] * surprise
+    weights = lexicon.weights
+    change = 0.
+    for activated_cell in activated:
+        old = bias[offset + activated_cell]
+        delta_v = SETTINGS.sim_rw_default_rate * prominence[activated_cell] * beta_surprise
+        new = old + 0.5 * delta_v
+        new = 0. if new < 0. else 1. if new > 1. else new
+        bias[offset + activated_cell] = new
+        change += weights[activated_cell] * (new - old)
+    return change
+
+def hear_rw_vanilla(bias_a: np.ndarray, hearers: tuple[np.ndarray, ...], cells: np.ndarray,
+                    form_a_used: np.ndarray, experience: np.ndarray, lexicon: Lexicon) -> np.ndarray:
+    """Vanilla implementation of the Rescorla-Wagner learning model."""
+    return _hear_rw(bias_a, hearers, cells, form_a_used, lexicon, weighted=False)
+
+def hear_rw_vanilla_one(bias: memoryview, offset: int, cell: int, form_a_used: bool, experience: int,
+                        lexicon: PlainLexicon) -> float:
+    """hear_rw_vanilla for a single event."""
+    return _hear_rw_one(bias, offset, cell, form_a_used, lexicon, weighted=False)
+
+def hear_rw_weighted(bias_a: np.ndarray, hearers: tuple[np.ndarray, ...], cells: np.ndarray,
+                     form_a_used: np.ndarray, experience: np.ndarray, lexicon: Lexicon) -> np.ndarray:
+    """Tweaked implementation of the Rescorla-Wagner learning model where v_total is weighted
+    according to the salience (prominence) of each conditioned stimulus."""
+    return _hear_rw(bias_a, hearers, cells, form_a_used, lexicon, weighted=True)
+
+def hear_rw_weighted_one(bias: memoryview, offset: int, cell: int, form_a_used: bool, experience: int,
+                         lexicon: PlainLexicon) -> float:
+    """hear_rw_weighted for a single event."""
+    return _hear_rw_one(bias, offset, cell, form_a_used, lexicon, weighted=True)
+
+register_learning_model(SETTINGS.LearningModel.HARMONIC, hear_harmonic, hear_harmonic_one)
+register_learning_model(SETTINGS.LearningModel.RW, hear_rw_vanilla, hear_rw_vanilla_one)
+register_learning_model(SETTINGS.LearningModel.RW_WEIGHTED, hear_rw_weighted, hear_rw_weighted_one)
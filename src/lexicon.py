@@ -0,0 +1,248 @@
+"""The word forms and prominence values of a set of paradigms, stored once and shared by a whole community of speakers."""
+
+from dataclasses import dataclass
+from typing import Optional, Self, Sequence
+from weakref import WeakValueDictionary
+
+import numpy as np
+
+from .paradigm import AnyCellIndex, NounParadigm, Paradigm, PARADIGM_CLASSES, propagation_targets
+from .rng import RAND
+from .sampling import AliasTable
+
+# the cells activated in the Rescorla-Wagner models when a given form of a given cell is heard:
+# activation_index[cell_id][0 if form A else 1] is an array of cell ids
+ActivationIndex = tuple[tuple[np.ndarray, np.ndarray], ...]
+
+def _activation_index(form_a: np.ndarray, form_b: np.ndarray, offset: int=0) -> ActivationIndex:
+    """All cells containing a substring of the form just heard are assumed to be activated."""
+    alternates = form_a != form_b
+    def activated_cells(form: str) -> np.ndarray:
+        return np.array([offset + c for c in range(len(form_a))
+                         if alternates[c] and (form.startswith(form_a[c]) or form.startswith(form_b[c]))], dtype=np.intp)
+    return tuple((activated_cells(form_a[cell_id]), activated_cells(form_b[cell_id])) for cell_id in range(len(form_a)))
+
+@dataclass(frozen=True)
+class PlainLexicon:
+    """The columns of a Lexicon the scalar learning kernels need, as plain Python lists:
+    picking single elements out of these is several times cheaper than out of arrays."""
+    weights: list[float]
+    weight_total: float
+    prominence: list[float]
+    alternates: list[bool]
+    # for each cell, the alternating cells a change in it spreads to
+    spread: list[list[int]]
+    # for each cell and form (A or B), the cells activated in the Rescorla-Wagner models
+    activated: list[tuple[list[int], list[int]]]
+
+class Lexicon:
+    """The forms and prominence values in each cell of one or more noun or verb paradigms (lexemes) of the same kind,
+    without any biases, along with the relative corpus frequency of each lexeme. Cells of all lexemes are laid out
+    on a single flat axis, lexeme by lexeme, so per lexeme views are just a reshape to (lexemes, cells) away.
+    Lexicons are immutable and interned: paradigms with the same forms and prominences
+    get the very same Lexicon object, so comparing two of them is an identity check."""
+
+    _known: WeakValueDictionary[tuple, 'Lexicon'] = WeakValueDictionary()
+
+    def __init__(self, form_a: np.ndarray, form_b: np.ndarray, prominence: np.ndarray,
+                 frequency: Optional[np.ndarray]=None, paradigm_class: type[Paradigm]=NounParadigm) -> None:
+        """Use Lexicon.intern or Lexicon.fromparadigms instead."""
+        self.paradigm_class = paradigm_class
+        # the number of cells in each lexeme
+        self.num_cells = num_cells = paradigm_class.NUM_CELLS
+        self.form_a = np.array(form_a, dtype=object)
+        self.form_b = np.array(form_b, dtype=object)
+        self.prominence = np.array(prominence, dtype=float)
+        assert len(self.form_a) % num_cells == 0
+        self.num_lexemes = len(self.form_a) // num_cells
+        self.frequency = np.ones(self.num_lexemes) if frequency is None else np.array(frequency, dtype=float)
+        assert self.frequency.shape == (self.num_lexemes,)
+        self.cell_ids = np.arange(len(self.form_a))
+        self.alternates = self.form_a != self.form_b
+        self.nonempty = self.form_a != ''
+        self.nonempty_ids = np.flatnonzero(self.nonempty)
+        # each cell's share in a speaker's principal bias
+        self.weights = np.where(self.alternates, self.prominence, 0.) * np.repeat(self.frequency, num_cells)
+        self.weight_total = self.weights.sum()
+        # propagation stays within the lexeme
+        offsets = np.repeat(np.arange(self.num_lexemes) * num_cells, num_cells)[:, np.newaxis]
+        self.targets = np.tile(propagation_targets(paradigm_class.SHAPE), (self.num_lexemes, 1)) + offsets
+        for array in (self.form_a, self.form_b, self.prominence, self.frequency, self.cell_ids, self.alternates,
+                      self.nonempty, self.nonempty_ids, self.weights, self.targets):
+            array.setflags(write=False)
+        self._activation: Optional[ActivationIndex] = None
+        self._activation_tables: dict[bool, np.ndarray] = {}
+        self._lexeme_table: Optional[AliasTable] = None
+        self._cell_tables: dict[bool, AliasTable] = {}
+        self._plain: Optional[PlainLexicon] = None
+
+    @classmethod
+    def intern(cls, form_a: np.ndarray, form_b: np.ndarray, prominence: np.ndarray,
+               frequency: Optional[np.ndarray]=None, paradigm_class: type[Paradigm]=NounParadigm) -> Self:
+        """The one Lexicon with the given contents."""
+        num_lexemes = len(form_a) // paradigm_class.NUM_CELLS
+        frequency = np.ones(num_lexemes) if frequency is None else np.asarray(frequency, dtype=float)
+        key = (paradigm_class.KIND, tuple(form_a), tuple(form_b),
+               tuple(np.asarray(prominence, dtype=float).tolist()), tuple(frequency.tolist()))
+        lexicon = cls._known.get(key)
+        if lexicon is None:
+            lexicon = cls(form_a, form_b, prominence, frequency, paradigm_class)
+            cls._known[key] = lexicon
+        return lexicon
+
+    @classmethod
+    def fromparadigms(cls, paras: Sequence[Paradigm], frequency: Optional[Sequence[float]]=None) -> Self:
+        """The Lexicon holding the forms and prominence values of a number of paradigms (all nouns
+        or all verbs), one lexeme each."""
+        paradigm_class = type(paras[0])
+        assert all(type(para) is paradigm_class for para in paras)
+        return cls.intern(np.concatenate([para.form_a for para in paras]),
+                          np.concatenate([para.form_b for para in paras]),
+                          np.concatenate([para.prominence for para in paras]),
+                          None if frequency is None else np.asarray(frequency, dtype=float),
+                          paradigm_class)
+
+    @classmethod
+    def fromparadigm(cls, para: Paradigm) -> Self:
+        """The Lexicon holding the forms and prominence values of a single paradigm."""
+        return cls.fromparadigms([para])
+
+    @classmethod
+    def empty(cls) -> Self:
+        """The Lexicon of a paradigm without any forms in it."""
+        return cls.fromparadigm(NounParadigm())
+
+    def with_paradigm(self, lexeme: int, para: Paradigm) -> Self:
+        """The Lexicon with the forms and prominence values of one lexeme replaced by those in a paradigm.
+        A paradigm of a different kind replaces the whole Lexicon by a single lexeme of its own kind."""
+        if type(para) is not self.paradigm_class:
+            assert lexeme == 0
+            return self.fromparadigm(para)
+        cells = slice(lexeme * self.num_cells, (lexeme + 1) * self.num_cells)
+        form_a, form_b, prominence = self.form_a.copy(), self.form_b.copy(), self.prominence.copy()
+        form_a[cells], form_b[cells], prominence[cells] = para.form_a, para.form_b, para.prominence
+        return self.intern(form_a, form_b, prominence, self.frequency, self.paradigm_class)
+
+    def __len__(self) -> int:
+        """The number of cells in all lexemes together."""
+        return len(self.form_a)
+
+    def paradigm(self, bias_a: np.ndarray, lexeme: int=0) -> Paradigm:
+        """A standalone paradigm object with the forms of a lexeme and the given biases
+        (either for that lexeme only or for all cells of the Lexicon)."""
+        cells = slice(lexeme * self.num_cells, (lexeme + 1) * self.num_cells)
+        para = self.paradigm_class()
+        para.bias_a[:] = bias_a[cells] if len(bias_a) == len(self) else bias_a
+        para.form_a[:] = self.form_a[cells]
+        para.form_b[:] = self.form_b[cells]
+        para.prominence[:] = self.prominence[cells]
+        return para
+
+    def by_lexeme(self, array: np.ndarray) -> np.ndarray:
+        """View an array whose last axis runs over all cells as (..., lexemes, cells)."""
+        return array.reshape(array.shape[:-1] + (self.num_lexemes, self.num_cells))
+
+    def cell_index(self, cell_id: int) -> AnyCellIndex:
+        """The index of a cell (of whichever lexeme) within its own paradigm."""
+        return self.paradigm_class.INDEX_CLASS.fromid(cell_id % self.num_cells)
+
+    def activation_index(self) -> ActivationIndex:
+        """The Rescorla-Wagner activation index for our forms, worked out on first use.
+        Only cells of the same lexeme are ever activated."""
+        if self._activation is None:
+            num_cells = self.num_cells
+            self._activation = sum((_activation_index(self.form_a[offset:offset + num_cells],
+                                                      self.form_b[offset:offset + num_cells], offset)
+                                    for offset in range(0, len(self), num_cells)), ())
+        return self._activation
+
+    def activation_table(self, single_cell: bool=False) -> np.ndarray:
+        """For each cell and form (A or B) a mask of the cells of the same lexeme (see lexeme_cells)
+        activated in the Rescorla-Wagner models, worked out on first use. In single cell mode
+        a cell only ever activates itself."""
+        if single_cell not in self._activation_tables:
+            if single_cell:
+                activation = np.ones((len(self), 2, 1), dtype=bool)
+            else:
+                activation = np.zeros((len(self), 2, self.num_cells), dtype=bool)
+                for cell_id, activated_cells in enumerate(self.activation_index()):
+                    for form_index, cells in enumerate(activated_cells):
+                        activation[cell_id, form_index, cells % self.num_cells] = True
+            activation.setflags(write=False)
+            self._activation_tables[single_cell] = activation
+        return self._activation_tables[single_cell]
+
+    def plain(self) -> PlainLexicon:
+        """The columns needed by the scalar learning kernels as plain lists, worked out on first use."""
+        if self._plain is None:
+            alternates = self.alternates.tolist()
+            self._plain = PlainLexicon(self.weights.tolist(), float(self.weight_total), self.prominence.tolist(), alternates,
+                                       [[target for target in targets if alternates[target]] for targets in self.targets.tolist()],
+                                       [(cells_a.tolist(), cells_b.tolist()) for cells_a, cells_b in self.activation_index()])
+        return self._plain
+
+    def lexeme_cells(self, cells: np.ndarray, single_cell: bool=False) -> np.ndarray:
+        """All cell ids of the lexeme each of the given cells belongs to, one row per cell
+        (or just the cells themselves in single cell mode)."""
+        if single_cell:
+            return cells[:, np.newaxis]
+        return (cells // self.num_cells * self.num_cells)[:, np.newaxis] + self.cell_ids[:self.num_cells]
+
+    def draw_lexeme(self) -> int:
+        """Pick a lexeme with probability proportional to its corpus frequency."""
+        if self.num_lexemes == 1:
+            return 0
+        return self.lexeme_table().draw()
+
+    def draw_lexemes(self, count: int) -> np.ndarray:
+        """Like draw_lexeme, but a number of independent picks at once."""
+        if self.num_lexemes == 1:
+            return np.zeros(count, dtype=np.intp)
+        return self.lexeme_table().draw_many(count)
+
+    def draw_cell(self, by_prominence: bool=False) -> int:
+        """Pick a non-empty cell id with a single draw: a lexeme according to its frequency,
+        then one of its cells either uniformly or weighted by prominence."""
+        if self.num_lexemes == 1 and not by_prominence:
+            return self.nonempty_ids.item(RAND.next() * len(self.nonempty_ids) >> 32)
+        return self.nonempty_ids.item(self.cell_table(by_prominence).draw())
+
+    def draw_cells(self, count: int, by_prominence: bool=False) -> np.ndarray:
+        """Like draw_cell, but a number of independent picks at once."""
+        if self.num_lexemes == 1 and not by_prominence:
+            return self.nonempty_ids[RAND.integers(count, len(self.nonempty_ids))]
+        return self.nonempty_ids[self.cell_table(by_prominence).draw_many(count)]
+
+    def lexeme_table(self) -> AliasTable:
+        """An alias table over the lexemes weighted by their frequency, worked out on first use."""
+        if self._lexeme_table is None:
+            self._lexeme_table = AliasTable(self.frequency)
+        return self._lexeme_table
+
+    def cell_table(self, by_prominence: bool=False) -> AliasTable:
+        """An alias table over the non-empty cells of all lexemes, worked out on first use."""
+        if by_prominence not in self._cell_tables:
+            weights = self.prominence[self.nonempty_ids] if by_prominence else np.ones(len(self.nonempty_ids))
+            lexemes = self.nonempty_ids // self.num_cells
+            # each lexeme gets its frequency's share, divided among its own cells
+            lexeme_totals = np.bincount(lexemes, weights=weights, minlength=self.num_lexemes)
+            self._cell_tables[by_prominence] = AliasTable(weights / lexeme_totals[lexemes] * self.frequency[lexemes])
+        return self._cell_tables[by_prominence]
+
+    def to_dict(self):
+        """Returns own state for JSON serialization."""
+        return { 'paradigm' : self.paradigm_class.KIND,
+                 'form_a' : self.form_a.tolist(),
+                 'form_b' : self.form_b.tolist(),
+                 'prominence' : self.prominence.tolist(),
+                 'frequency' : self.frequency.tolist() }
+
+    @classmethod
+    def from_dict(cls, lexicon_dict) -> Self:
+        """Construct (or look up) a Lexicon from an imported JSON dictionary."""
+        frequency = lexicon_dict.get('frequency')
+        return cls.intern(np.array(lexicon_dict['form_a'], dtype=object),
+                          np.array(lexicon_dict['form_b'], dtype=object),
+                          np.array(lexicon_dict['prominence'], dtype=float),
+                          None if frequency is None else np.array(frequency, dtype=float),
+                          PARADIGM_CLASSES[lexicon_dict.get('paradigm', NounParadigm.KIND)])
@@ -1,12 +1,35 @@
 """A simple probabilistic model of Hungarian noun and verb paradigms and their internal mechanics."""
 
 from abc import ABC, abstractmethod
-from itertools import chain
+from functools import cache
 from typing import Iterator, Optional, overload, Self, Union
 
+import numpy as np
+
 def _clamp(value: float) -> float:
     return max(0., min(1., value))
 
+@cache
+def propagation_targets(shape: tuple[int, ...]) -> np.ndarray:
+    """For each cell of a paradigm of the given shape, the ids of the cells a change in it spreads to:
+    those that differ from it along exactly one dimension, dimension by dimension in ascending order."""
+    targets = []
+    for index in np.ndindex(*shape):
+        cell_targets = []
+        for dim, size in enumerate(shape):
+            for own in range(size):
+                if own != index[dim]:
+                    cell_targets.append(np.ravel_multi_index(index[:dim] + (own,) + index[dim+1:], shape))
+        targets.append(cell_targets)
+    return np.array(targets, dtype=np.intp)
+
+def propagation_delta(prominence: float | np.ndarray, delta: float | np.ndarray) -> float | np.ndarray:
+    """How far a bias change in a cell (or in each of an array of cells) moves the cells it spreads to,
+    given the prominence of the cell. Only the biases it lands on are clamped, never the change itself."""
+    delta = prominence * delta
+    assert (np.abs(delta) <= 1).all() if isinstance(delta, np.ndarray) else abs(delta) <= 1
+    return delta
+
 class _NounCellIndex(tuple):
     """Identifies a single NounParadigm entry: a tuple of two non-negative integers."""
     def __new__(cls, number: int=0, case: int=0) -> Self:
@@ -15,26 +38,109 @@ class _NounCellIndex(tuple):
         new_cell_index = super(_NounCellIndex, cls).__new__(cls, [number, case])  # type: ignore[list-item]
         return new_cell_index
 
+    @classmethod
+    def fromid(cls, cell_id: int) -> Self:
+        """Construct the index of the cell stored at the given flat position."""
+        return cls(*divmod(cell_id, 14))
+
+    def cell_id(self) -> int:
+        """The flat position of this cell in array-backed storage (row-major order)."""
+        return self[0] * 14 + self[1]
+
 class _VerbCellIndex(tuple):
     """Identifies a single VerbParadigm entry: a tuple of five non-negative integers."""
-    def __new__(cls, person: int, number: int, defness: int, tense: int, mood: int) -> Self:
+    def __new__(cls, person: int=0, number: int=0, defness: int=0, tense: int=0, mood: int=0) -> Self:
         assert person >= 0 and number >= 0 and defness >= 0 and tense >= 0 and mood >= 0
         assert person < 3 and number < 2 and defness < 2 and tense < 2 and mood < 3
         new_cell_index = super(_VerbCellIndex, cls).__new__(cls, [person, number, defness, tense, mood])  # type: ignore[list-item]
         return new_cell_index
 
+    @classmethod
+    def fromid(cls, cell_id: int) -> Self:
+        """Construct the index of the cell stored at the given flat position."""
+        rest, mood = divmod(cell_id, 3)
+        rest, tense = divmod(rest, 2)
+        rest, defness = divmod(rest, 2)
+        person, number = divmod(rest, 2)
+        return cls(person, number, defness, tense, mood)
+
+    def cell_id(self) -> int:
+        """The flat position of this cell in array-backed storage (row-major order)."""
+        return (((self[0] * 2 + self[1]) * 2 + self[2]) * 2 + self[3]) * 3 + self[4]
+
+# the index of a noun cell, the default kind of paradigm
 CellIndex = _NounCellIndex
-#CellIndex = Union[_NounCellIndex, _VerbCellIndex]
+VerbCellIndex = _VerbCellIndex
+AnyCellIndex = Union[_NounCellIndex, _VerbCellIndex]
+
+class _CellFields:
+    """Flat per-field storage for a number of paradigm cells, addressed by their cell id."""
+
+    def __init__(self, size: int, bias_a: float=0.5) -> None:
+        self.bias_a = np.full(size, bias_a)
+        self.form_a = np.full(size, '', dtype=object)
+        self.form_b = np.full(size, '', dtype=object)
+        self.prominence = np.ones(size)
 
 class _Cell(ABC):
-    """A weighted superposition of two word forms for the same morphosyntactic context."""
+    """A weighted superposition of two word forms for the same morphosyntactic context.
+    The cell's fields live in a _CellFields store: a paradigm's own when the cell is a view
+    of one of its entries, or a store of a single entry when the cell stands alone."""
+
+    # names of the attributes that locate the cell within its paradigm
+    INDEX_FIELDS: tuple[str, ...] = ()
+
     # TODO: disallow empty forms
     def __init__(self, bias_a: float=0.5, form_a: str='', form_b: str='', prominence: float=1.0) -> None:
+        self._fields = _CellFields(1)
+        self._cell_id = 0
         self.bias_a = bias_a
         self.form_a = form_a
         self.form_b = form_b
         self.prominence = prominence
 
+    @classmethod
+    def _view(cls, fields: _CellFields, cell_id: int, index: tuple[int, ...]) -> Self:
+        """A cell that reads and writes an entry of existing field storage."""
+        cell = cls.__new__(cls)
+        cell._fields = fields
+        cell._cell_id = cell_id
+        for name, value in zip(cls.INDEX_FIELDS, index):
+            setattr(cell, name, value)
+        return cell
+
+    @property
+    def bias_a(self) -> float:
+        return self._fields.bias_a.item(self._cell_id)
+
+    @bias_a.setter
+    def bias_a(self, bias_a: float) -> None:
+        self._fields.bias_a[self._cell_id] = bias_a
+
+    @property
+    def form_a(self) -> str:
+        return self._fields.form_a[self._cell_id]
+
+    @form_a.setter
+    def form_a(self, form_a: str) -> None:
+        self._fields.form_a[self._cell_id] = form_a
+
+    @property
+    def form_b(self) -> str:
+        return self._fields.form_b[self._cell_id]
+
+    @form_b.setter
+    def form_b(self, form_b: str) -> None:
+        self._fields.form_b[self._cell_id] = form_b
+
+    @property
+    def prominence(self) -> float:
+        return self._fields.prominence.item(self._cell_id)
+
+    @prominence.setter
+    def prominence(self, prominence: float) -> None:
+        self._fields.prominence[self._cell_id] = prominence
+
     def __bool__(self) -> bool:
         return 0 != len(self.form_a)
 
@@ -54,7 +160,13 @@ class _Cell(ABC):
 
     def to_dict(self):
         """Returns own state for JSON serialization."""
-        return self.__dict__
+        my_dict = { 'bias_a' : self.bias_a,
+                    'form_a' : self.form_a,
+                    'form_b' : self.form_b,
+                    'prominence' : self.prominence }
+        for name in self.INDEX_FIELDS:
+            my_dict[name] = getattr(self, name)
+        return my_dict
 
     @classmethod
     @abstractmethod
@@ -73,11 +185,64 @@ class _Cell(ABC):
         if self.alternates():
             self.bias_a = _clamp(self.bias_a + delta)
 
-class _Paradigm(ABC):
-    """A 2D or 5D matrix of competing noun of verb forms for given morphosyntactic contexts."""
+class _Paradigm(_CellFields, ABC):
+    """A 2D or 5D matrix of competing noun of verb forms for given morphosyntactic contexts.
+    The cells' fields are stored in flat arrays in row-major order; the cells themselves
+    are views into these arrays."""
+
+    # the size of the paradigm along each of its dimensions
+    SHAPE: tuple[int, ...] = ()
+    NUM_CELLS = 0
+    CELL_CLASS: type[_Cell]
+    INDEX_CLASS: type[AnyCellIndex]
+    # how the paradigm is referred to in saved files
+    KIND = ''
 
-    def __init__(self) -> None:
-        self.para: Optional[list] = None
+    def __init__(self, bias_a: float=0.5) -> None:
+        super().__init__(self.NUM_CELLS, bias_a)
+        self._cells: Optional[list[_Cell]] = None
+        self._para: Optional[list] = None
+
+    @property
+    def cells(self) -> list[_Cell]:
+        """Views of all our cells in flat cell id order."""
+        if self._cells is None:
+            self._cells = [self.CELL_CLASS._view(self, cell_id, index)
+                           for cell_id, index in enumerate(np.ndindex(*self.SHAPE))]
+        return self._cells
+
+    @property
+    def para(self) -> list:
+        """Our cells nested along each dimension of the paradigm."""
+        if self._para is None:
+            def nest(cells: list[_Cell], shape: tuple[int, ...]) -> list:
+                if len(shape) == 1:
+                    return cells
+                step = len(cells) // shape[0]
+                return [nest(cells[i * step : (i+1) * step], shape[1:]) for i in range(shape[0])]
+            self._para = nest(self.cells, self.SHAPE)
+        return self._para
+
+    def copy(self) -> Self:
+        """A detached copy of the paradigm, at the cost of copying the field arrays."""
+        new_para = self.__class__.__new__(self.__class__)
+        new_para.bias_a = self.bias_a.copy()
+        new_para.form_a = self.form_a.copy()
+        new_para.form_b = self.form_b.copy()
+        new_para.prominence = self.prominence.copy()
+        new_para._cells = None
+        new_para._para = None
+        return new_para
+
+    def __deepcopy__(self, _memo) -> Self:
+        return self.copy()
+
+    def read_only(self) -> Self:
+        """Make the field arrays (and thereby all our cells) read-only, so that writes to a paradigm
+        that is only a copy of some other state fail loudly instead of going nowhere. Copies are writable."""
+        for array in (self.bias_a, self.form_a, self.form_b, self.prominence):
+            array.setflags(write=False)
+        return self
 
     @overload
     def __getitem__(self, index: CellIndex) -> _Cell:
@@ -92,7 +257,6 @@ class _Paradigm(ABC):
         """Return a row of cells or a specific cell (assignable)."""
 
     def __str__(self) -> str:
-        assert self.para is not None
         def descend(cells) -> str:
             if not isinstance(cells, list):
                 return str(cells)
@@ -103,14 +267,7 @@ class _Paradigm(ABC):
 
     def __iter__(self) -> Iterator[_Cell]:
         """Return an iterator that will loop through our cells in order."""
-        assert self.para is not None
-        para_flattened = self.para
-        while True:
-            try:
-                para_flattened = list(chain.from_iterable(para_flattened))  # type: ignore[var-annotated]
-            except TypeError:
-                break
-        return para_flattened.__iter__()
+        return iter(self.cells)
 
     @staticmethod
     @abstractmethod
@@ -134,26 +291,23 @@ class _Paradigm(ABC):
     def from_dict(cls, para_dict) -> Self:
         """Construct paradigm object from an imported JSON dictionary."""
 
+    def _propagate(self, cell_id: int, delta: float) -> None:
+        """Nudge all alternating cells along each dimension from the given cell at once."""
+        delta = propagation_delta(self.prominence.item(cell_id), delta)
+        targets = propagation_targets(self.SHAPE)[cell_id]
+        targets = targets[self.form_a[targets] != self.form_b[targets]]
+        self.bias_a[targets] = np.clip(self.bias_a[targets] + delta, 0., 1.)
+
     def passive_decay(self) -> None:
         """Gradually forget underdog variants in each cell."""
-        # TODO: optimize this if possible
-        assert self.para is not None
-        def descend(cells):
-            if isinstance(cells, list):
-                for below in cells:
-                    descend(below)
-            else:
-                cell = cells
-                if cell.bias_a > 0.5:
-                    cell.bias_a *= 1.02
-                elif cell.bias_a < 0.5:
-                    cell.bias_a /= 1.02
-                cell.bias_a = _clamp(cell.bias_a)
-                return
-        descend(self.para)
+        bias_a = self.bias_a
+        bias_a[:] = np.clip(np.where(bias_a > 0.5, bias_a * 1.02, np.where(bias_a < 0.5, bias_a / 1.02, bias_a)), 0., 1.)
 
 class _NounCell(_Cell):
     """A single cell in a noun paradigm for a given morphosyntactic context."""
+
+    INDEX_FIELDS = ('number', 'case')
+
     def __init__(self, number: int=0, case: int=0, bias_a: float=0.5, form_a: str='', form_b: str='', prominence: float=1.0) -> None:
         super().__init__(bias_a, form_a, form_b, prominence)
         self.number = number
@@ -175,6 +329,9 @@ class _NounCell(_Cell):
 
 class _VerbCell(_Cell):
     """A single cell in a verb paradigm for a given morphosyntactic context."""
+
+    INDEX_FIELDS = ('person', 'number', 'defness', 'tense', 'mood')
+
     def __init__(self, person: int=0, number: int=0, defness: int=0, tense: int=0, mood: int=0, bias_a: float=0.5,
                  form_a: str='', form_b: str='', prominence: float=1.0) -> None:
         super().__init__(bias_a, form_a, form_b, prominence)
@@ -208,11 +365,18 @@ class _VerbCell(_Cell):
 class NounParadigm(_Paradigm):
     """A 2D matrix representing the competing forms of a single noun.
        Hungarian nouns inflect for number and case."""
+
+    SHAPE = (2, 14)
+    NUM_CELLS = 2 * 14
+    CELL_CLASS = _NounCell
+    INDEX_CLASS = _NounCellIndex
+    KIND = 'noun'
+
     def __init__(self, bias_a: float=0.5, form_a: str='', form_b: str='') -> None:
-        self.para = [[_NounCell(i, j, bias_a) for j in range(14)] for i in range(2)]
-        self.para[0][0].form_a = form_a
-        self.para[0][0].form_b = form_b
-        self.para[0][0].prominence = 1.0
+        super().__init__(bias_a)
+        self.form_a[0] = form_a
+        self.form_b[0] = form_b
+        self.prominence[0] = 1.0
 
     @classmethod
     def from_dict(cls, para_dict) -> Self:
@@ -220,28 +384,21 @@ class NounParadigm(_Paradigm):
         assert list(para_dict.keys()) == ['para']
         para_list = para_dict['para']
         new_para = cls()
-        assert new_para.para is not None
         assert len(para_list) <= 2
-        while para_list:
-            list_below = para_list.pop(0)
+        for list_below in para_list:
             assert len(list_below) <= 14
-            while list_below:
-                cell = _NounCell.from_dict(list_below.pop(0))
-                new_para.para[cell.number][cell.case] = cell
+            for cell_dict in list_below:
+                cell_id = _NounCellIndex(cell_dict['number'], cell_dict['case']).cell_id()
+                new_para.bias_a[cell_id] = cell_dict['bias_a']
+                new_para.form_a[cell_id] = cell_dict['form_a']
+                new_para.form_b[cell_id] = cell_dict['form_b']
+                new_para.prominence[cell_id] = cell_dict['prominence']
         return new_para
 
     def to_dict(self):
         """Returns own state for JSON serialization."""
         # output non-empty cells only to save space
-        dense_para = []
-        assert self.para is not None
-        assert len(self.para) <= 2
-        for num in self.para:
-            assert len(num) <= 14
-            dense_para.append([])
-            for cell in num:
-                if cell:
-                    dense_para[-1].append(cell)
+        dense_para = [[cell for cell in num if cell] for num in self.para]
         my_dict = { 'para': dense_para }
         return my_dict
 
@@ -255,11 +412,8 @@ class NounParadigm(_Paradigm):
 
     def __getitem__(self, index: Union[CellIndex, int]) -> Union[_Cell, list[_Cell]]:
         """Return a row of cells or a specific cell (assignable)."""
-        assert self.para is not None
         if isinstance(index, _NounCellIndex):
-            num = index[0]
-            cas = index[1]
-            return self.para[num][cas]  #type: ignore[no-any-return]
+            return self.cells[index.cell_id()]
         elif isinstance(index, int):
             return self.para[index]  #type: ignore[no-any-return]
         else:
@@ -295,31 +449,74 @@ class NounParadigm(_Paradigm):
 
     def nudge(self, delta: float, index: CellIndex) -> None:
         """Adjust the weights in a single cell."""
-        assert self.para is not None
         assert isinstance(index, _NounCellIndex)
-        num = index[0]
-        cas = index[1]
-        self.para[num][cas].nudge(delta)
+        self.cells[index.cell_id()].nudge(delta)
 
     def propagate(self, delta: float, index: CellIndex) -> None:
         """Spread a weight change down each dimension in the paradigm."""
-        assert self.para is not None
         assert isinstance(index, _NounCellIndex)
-        num = index[0]
-        cas = index[1]
-        delta = self.para[num][cas].prominence * delta
-        for own_num in range(2):
-            if own_num != num:
-                self.nudge(delta, _NounCellIndex(own_num, cas))
-        for own_cas in range(14):
-            if own_cas != cas:
-                self.nudge(delta, _NounCellIndex(num, own_cas))
+        self._propagate(index.cell_id(), delta)
 
 class VerbParadigm(_Paradigm):
     """A 5D matrix representing the competing forms of a single verb.
        Hungarian verbs inflect for person, number, object definiteness, tense and mood."""
-    def __init__(self, bias_a: float=0.5) -> None:
-        self.para = [[[[[_VerbCell(i, j, k, l, m, bias_a) for m in range(3)] for l in range(2)] for k in range(2)] for j in range(2)] for i in range(3)]
+    SHAPE = (3, 2, 2, 2, 3)
+    NUM_CELLS = 3 * 2 * 2 * 2 * 3
+    CELL_CLASS = _VerbCell
+    INDEX_CLASS = _VerbCellIndex
+    KIND = 'verb'
+
+    def __init__(self, bias_a: float=0.5, form_a: str='', form_b: str='') -> None:
+        super().__init__(bias_a)
+        self.form_a[0] = form_a
+        self.form_b[0] = form_b
+        self.prominence[0] = 1.0
+
+    @classmethod
+    def from_dict(cls, para_dict) -> Self:
+        """Construct paradigm object from an imported JSON dictionary."""
+        assert list(para_dict.keys()) == ['para']
+        new_para = cls()
+        def descend(cells, depth: int) -> None:
+            assert len(cells) <= cls.SHAPE[depth]
+            for below in cells:
+                if depth + 1 < len(cls.SHAPE):
+                    descend(below, depth + 1)
+                    continue
+                cell_id = _VerbCellIndex(*(below[name] for name in _VerbCell.INDEX_FIELDS)).cell_id()
+                new_para.bias_a[cell_id] = below['bias_a']
+                new_para.form_a[cell_id] = below['form_a']
+                new_para.form_b[cell_id] = below['form_b']
+                new_para.prominence[cell_id] = below['prominence']
+        descend(para_dict['para'], 0)
+        return new_para
+
+    def to_dict(self):
+        """Returns own state for JSON serialization."""
+        # output non-empty cells only to save space
+        def dense(cells) -> list:
+            if isinstance(cells[0], list):
+                return [dense(below) for below in cells]
+            return [cell for cell in cells if cell]
+        my_dict = { 'para': dense(self.para) }
+        return my_dict
+
+    @overload
+    def __getitem__(self, index: AnyCellIndex) -> _Cell:
+        pass
+
+    @overload
+    def __getitem__(self, index: int) -> list:
+        pass
+
+    def __getitem__(self, index: Union[AnyCellIndex, int]) -> Union[_Cell, list]:
+        """Return a slice of cells along the first dimension or a specific cell (assignable)."""
+        if isinstance(index, _VerbCellIndex):
+            return self.cells[index.cell_id()]
+        elif isinstance(index, int):
+            return self.para[index]  #type: ignore[no-any-return]
+        else:
+            raise TypeError
 
     @staticmethod
     def morphosyntactic_properties(index: CellIndex) -> str:
@@ -357,7 +554,6 @@ class VerbParadigm(_Paradigm):
 
     def nudge(self, delta: float, index: CellIndex) -> None:
         """Adjust the weights in a single cell."""
-        assert self.para is not None
         assert isinstance(index, _VerbCellIndex)
         i = index[0]
         j = index[1]
@@ -369,26 +565,9 @@ class VerbParadigm(_Paradigm):
 
     def propagate(self, delta: float, index: CellIndex) -> None:
         """Spread a weight change down each dimension in the paradigm."""
-        assert self.para is not None
         assert isinstance(index, _VerbCellIndex)
-        i = index[0]
-        j = index[1]
-        k = index[2]
-        l = index[3]
-        m = index[4]
-        delta = _clamp(self.para[i][j][k][l][m].prominence * delta)
-        for own_i in range(3):
-            if own_i != i:
-                self.nudge(delta, _VerbCellIndex(own_i, j, k, l, m))  # type: ignore[arg-type]
-        for own_j in range(2):
-            if own_j != j:
-                self.nudge(delta, _VerbCellIndex(i, own_j, k, l, m))  # type: ignore[arg-type]
-        for own_k in range(2):
-            if own_k != k:
-                self.nudge(delta, _VerbCellIndex(i, j, own_k, l, m))  # type: ignore[arg-type]
-        for own_l in range(2):
-            if own_l != l:
-                self.nudge(delta, _VerbCellIndex(i, j, k, own_l, m))  # type: ignore[arg-type]
-        for own_m in range(3):
-            if own_m != m:
-                self.nudge(delta, _VerbCellIndex(i, j, k, l, own_m))  # type: ignore[arg-type]
+        self._propagate(index.cell_id(), delta)
+
+# the kinds of paradigms a simulation can run on
+Paradigm = Union[NounParadigm, VerbParadigm]
+PARADIGM_CLASSES: dict[str, type[Paradigm]] = { cls.KIND: cls for cls in (NounParadigm, VerbParadigm) }
@@ -0,0 +1,406 @@
+"""Compact storage for the state of a whole community of speakers in contiguous NumPy arrays."""
+
+from dataclasses import dataclass, replace
+from logging import debug, getLogger, warning, DEBUG
+from typing import Callable, Optional, Self
+
+import numpy as np
+
+from .learning import learning_kernel, scalar_learning_kernel
+from .lexicon import Lexicon
+from .paradigm import Paradigm
+from .rng import RAND
+from .settings import SETTINGS
+
+# principal biases are kept up to date incrementally, but summed up exactly after this many updates to bound drift
+EXACT_RESUM_INTERVAL = 1000
+
+def _frozen(array: np.ndarray) -> np.ndarray:
+    """A read-only copy of an array."""
+    array = array.copy()
+    array.setflags(write=False)
+    return array
+
+@dataclass(frozen=True)
+class PopulationSnapshot:
+    """Read-only copies of the columns of a Population, taken e.g. before a simulation run.
+    Being immutable, a snapshot can be restored any number of times without copying it first."""
+    ids: np.ndarray
+    pos: np.ndarray
+    is_broadcaster: np.ndarray
+    bias_a: np.ndarray
+    experience: np.ndarray
+    principal_bias_cached: np.ndarray
+    lexicon: Lexicon
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def with_experience(self, experience: int) -> Self:
+        """The same snapshot with everyone's experience set to the given value."""
+        return replace(self, experience=_frozen(np.full(len(self), experience, dtype=np.int64)))
+
+# tells whether the speaker in a given row of a Population (or each speaker in an array of rows) is stable
+SpeakerCriterion = Callable[['Population', int | np.ndarray], bool | np.ndarray]
+# how many more steps of passive decay the given (settled) speakers can take before a SpeakerCriterion
+# might change its mind about them, np.inf if it never will
+DecayHorizon = Callable[['Population', int | np.ndarray], float | np.ndarray]
+
+class Population:
+    """The state of a list of speakers laid out column by column: every array has one row per speaker
+    and paradigm cells are addressed by their flat cell id. The word forms and prominence values are
+    the same for everyone and live in a single shared Lexicon. If the Lexicon has several lexemes,
+    their cells follow each other in bias_a, which Lexicon.by_lexeme views as (speakers, lexemes, cells).
+    Speaker objects are thin views into a Population and the simulation itself runs directly on the arrays."""
+
+    def __init__(self, size: int) -> None:
+        self.speakers: list = [None] * size
+        # the speakers' identifiers 'n'
+        self.ids = np.zeros(size, dtype=np.int64)
+        self.lexicon = Lexicon.empty()
+        self.bias_a = np.full((size, len(self.lexicon)), 0.5)
+        self.experience = np.zeros(size, dtype=np.int64)
+        self.pos = np.zeros((size, 2))
+        self.is_broadcaster = np.zeros(size, dtype=bool)
+        # NaN if unknown, otherwise kept up to date by every change in bias_a
+        self.principal_bias_cached = np.full(size, np.nan)
+        self.updates_since_resum = np.zeros(size, dtype=np.int64)
+        # passive decay is counted in steps; each speaker has been decayed up to a certain step
+        self.decay_clock = 0
+        self.decay_synced = np.zeros(size, dtype=np.int64)
+        # running tally of unstable speakers, if someone is interested
+        self.is_speaker_stable: Optional[SpeakerCriterion] = None
+        self.stable = np.zeros(size, dtype=bool)
+        self.num_unstable = size
+        # if the criterion comes with a DecayHorizon, the decay step at which each speaker needs a second look
+        self.decay_horizon: Optional[DecayHorizon] = None
+        self.decay_due = np.zeros(size)
+        # memoryviews of the columns the scalar learning kernels work on, see scalar_views
+        self.views: tuple[memoryview, ...] = ()
+        self.views_of: Optional[np.ndarray] = None
+        self.choose_learning_model()
+
+    @classmethod
+    def fromspeakers(cls, speakers: list) -> Self:
+        """Gather the state of existing Speakers in a new Population and turn them into views of it."""
+        population = cls(len(speakers))
+        if speakers:
+            population.set_lexicon(speakers[0].population.lexicon)
+        for row, speaker in enumerate(speakers):
+            if speaker.population.lexicon is not population.lexicon:
+                warning("Population: Speaker %d has different word forms from the rest, ignoring them." % speaker.n)
+            population.copy_row(row, speaker.population, speaker.row)
+            speaker.attach(population, row)
+        population.update_positions()
+        return population
+
+    def __len__(self) -> int:
+        return len(self.speakers)
+
+    def copy_row(self, row: int, other: Self, other_row: int) -> None:
+        """Overwrite a speaker's state with that of a speaker in another Population."""
+        self.speakers[row] = other.speakers[other_row]
+        self.ids[row] = self.speakers[row].n
+        self.pos[row] = other.pos[other_row]
+        self.is_broadcaster[row] = other.is_broadcaster[other_row]
+        self.copy_state(row, other, other_row)
+
+    def copy_state(self, row: int, other: Self, other_row: int) -> None:
+        """Overwrite a speaker's biases and experience with those of a speaker in another Population
+        (only in the lexemes both Populations have if their Lexicons differ)."""
+        other.settle_decay(other_row)
+        width = min(len(self.lexicon), len(other.lexicon))
+        self.bias_a[row, :width] = other.bias_a[other_row, :width]
+        self.experience[row] = other.experience[other_row]
+        self.principal_bias_cached[row] = other.principal_bias_cached[other_row] if other.lexicon is self.lexicon else np.nan
+        self.decay_synced[row] = self.decay_clock
+
+    def snapshot(self) -> PopulationSnapshot:
+        """Take a read-only copy of every speaker's state."""
+        self.settle_decay()
+        return PopulationSnapshot(_frozen(self.ids), _frozen(self.pos), _frozen(self.is_broadcaster),
+                                  _frozen(self.bias_a), _frozen(self.experience),
+                                  _frozen(self.principal_bias_cached), self.lexicon)
+
+    def restore(self, snapshot: PopulationSnapshot) -> None:
+        """Reset the biases and experience of speakers to those in a snapshot, pairing them by identifier.
+        As long as the speakers are still in the same order this is a single buffer copy per column."""
+        if np.array_equal(self.ids, snapshot.ids):
+            rows = saved_rows = slice(None)
+        else:
+            saved_row_of = {n: saved_row for saved_row, n in enumerate(snapshot.ids.tolist())}
+            rows = np.array([row for row, n in enumerate(self.ids.tolist()) if n in saved_row_of], dtype=np.intp)
+            saved_rows = np.array([saved_row_of[n] for n in self.ids[rows].tolist()], dtype=np.intp)
+        self.set_lexicon(snapshot.lexicon)
+        self.bias_a[rows] = snapshot.bias_a[saved_rows]
+        self.experience[rows] = snapshot.experience[saved_rows]
+        self.principal_bias_cached[rows] = snapshot.principal_bias_cached[saved_rows]
+        self.decay_synced[rows] = self.decay_clock
+        if self.is_speaker_stable is not None:
+            self.track_stability(self.is_speaker_stable)
+
+    def update_positions(self) -> None:
+        """Refresh the position column after speakers have been moved around."""
+        for row, speaker in enumerate(self.speakers):
+            self.pos[row] = speaker.pos
+
+    def get_paradigm(self, row: int, lexeme: int=0) -> Paradigm:
+        """Export a speaker's state in a lexeme as a standalone paradigm object."""
+        self.settle_decay(row)
+        return self.lexicon.paradigm(self.bias_a[row], lexeme)
+
+    def set_paradigm(self, row: int, para: Paradigm, lexeme: int=0) -> None:
+        """Overwrite a speaker's biases in a lexeme with those in a paradigm object.
+        Its forms and prominence values become everyone's if they differ from ours."""
+        self.set_lexicon(self.lexicon.with_paradigm(lexeme, para))
+        self.settle_decay(row)
+        num_cells = self.lexicon.num_cells
+        self.bias_a[row, lexeme * num_cells:(lexeme + 1) * num_cells] = para.bias_a
+        self.principal_bias_cached[row] = np.nan
+
+    def set_biases(self, row: int, bias_a: np.ndarray) -> None:
+        """Overwrite a speaker's biases in every cell of every lexeme."""
+        self.bias_a[row] = bias_a
+        self.principal_bias_cached[row] = np.nan
+        self.decay_synced[row] = self.decay_clock
+
+    def set_forms(self, para: Paradigm, lexeme: int=0) -> None:
+        """Update the word forms and prominence values of a lexeme for every speaker at once."""
+        self.set_lexicon(self.lexicon.with_paradigm(lexeme, para))
+
+    def set_lexicon(self, lexicon: Lexicon) -> None:
+        """Replace the word forms and prominence values shared by every speaker.
+        Lexemes the speakers have not had so far start out with the biases of their first lexeme,
+        and a Lexicon of a different kind of paradigm (verbs instead of nouns, say) starts out neutral."""
+        if lexicon is self.lexicon:
+            return
+        if lexicon.paradigm_class is not self.lexicon.paradigm_class:
+            self.bias_a = np.full((len(self), len(lexicon)), 0.5)
+            self.decay_synced[:] = self.decay_clock
+        elif len(lexicon) != len(self.lexicon):
+            self.settle_decay()
+            bias_a = np.tile(self.bias_a[:, :lexicon.num_cells], lexicon.num_lexemes)
+            width = min(len(lexicon), len(self.lexicon))
+            bias_a[:, :width] = self.bias_a[:, :width]
+            self.bias_a = bias_a
+        self.lexicon = lexicon
+        self.principal_bias_cached[:] = np.nan
+
+    def principal_bias(self, row: int, force_update: bool=False) -> float:
+        """Which way a speaker is leaning, summed up in a single float."""
+        self.settle_decay(row)
+        if force_update or np.isnan(self.principal_bias_cached[row]):
+            self._resum_principal_biases(row, self.bias_a[row])
+        return self.principal_bias_cached.item(row)
+
+    def principal_biases(self, rows: Optional[int | np.ndarray]=None) -> float | np.ndarray:
+        """The principal bias of every speaker (or the given ones), refreshing stale cache entries in one go."""
+        if isinstance(rows, (int, np.integer)):
+            return self.principal_bias(rows)
+        self.settle_decay(rows)
+        if rows is None:
+            stale_rows = np.flatnonzero(np.isnan(self.principal_bias_cached))
+        else:
+            stale_rows = rows[np.isnan(self.principal_bias_cached[rows])]
+        if len(stale_rows):
+            self._resum_principal_biases(stale_rows, self.bias_a[stale_rows])
+        return self.principal_bias_cached if rows is None else self.principal_bias_cached[rows]
+
+    def lexeme_principal_biases(self, rows: Optional[np.ndarray]=None) -> np.ndarray:
+        """Which way every speaker (or the given ones) is leaning in each lexeme, as a (speakers, lexemes) array.
+        Lexemes without alternating cells come out as NaN."""
+        self.settle_decay(rows)
+        bias_a = self.bias_a if rows is None else self.bias_a[rows]
+        weights = self.lexicon.by_lexeme(self.lexicon.weights)
+        with np.errstate(invalid='ignore'):
+            return (self.lexicon.by_lexeme(bias_a) * weights).sum(axis=-1) / weights.sum(axis=-1)
+
+    def _resum_principal_biases(self, rows: int | np.ndarray, bias_a: np.ndarray) -> None:
+        """Work out the principal bias of a speaker (or an array of speakers) exactly, from scratch."""
+        if self.lexicon.weight_total:
+            self.principal_bias_cached[rows] = (bias_a * self.lexicon.weights).sum(axis=-1) / self.lexicon.weight_total
+        else:
+            # no alternating cells at all
+            self.principal_bias_cached[rows] = np.nan
+        self.updates_since_resum[rows] = 0
+
+    def track_stability(self, is_speaker_stable: Optional[SpeakerCriterion],
+                        decay_horizon: Optional[DecayHorizon]=None) -> None:
+        """Start keeping count of the speakers that are not stable according to the given criterion,
+        or stop counting if None. With a DecayHorizon for the criterion, lazy passive decay
+        only has to catch up with the speakers whose stability it might change."""
+        self.settle_decay()
+        self.is_speaker_stable = is_speaker_stable
+        self.decay_horizon = decay_horizon if is_speaker_stable is not None else None
+        if is_speaker_stable is not None:
+            rows = np.arange(len(self))
+            self.stable = is_speaker_stable(self, rows)
+            self.num_unstable = len(self) - int(self.stable.sum())
+            if self.decay_horizon is not None:
+                self.decay_due[:] = self.decay_clock + self.decay_horizon(self, rows) + 1
+
+    def update_stability(self, rows: int | np.ndarray) -> None:
+        """Reevaluate the stability of a speaker (or an array of distinct speakers) after their state has changed."""
+        if self.is_speaker_stable is None:
+            return
+        if isinstance(rows, (int, np.integer)):
+            stable = bool(self.is_speaker_stable(self, rows))
+            if stable != self.stable.item(rows):
+                self.stable[rows] = stable
+                self.num_unstable += -1 if stable else 1
+        else:
+            stable = self.is_speaker_stable(self, rows)
+            self.num_unstable -= int(stable.sum()) - int(self.stable[rows].sum())
+            self.stable[rows] = stable
+        if self.decay_horizon is not None:
+            self.decay_due[rows] = self.decay_clock + self.decay_horizon(self, rows) + 1
+
+    def utter(self, row: int) -> tuple[int, bool]:
+        """Pick a cell and one of its forms for a speaker to say."""
+        if SETTINGS.sim_single_cell:
+            # the first cell of a lexeme
+            cell_id = self.lexicon.draw_lexeme() * self.lexicon.num_cells
+        else:
+            # pick a non-empty cell to share with the hearer
+            cell_id = self.lexicon.draw_cell(SETTINGS.sim_cell_sampling == SETTINGS.CellSampling.PROMINENCE)
+        return cell_id, self.choose_form(row, cell_id, RAND.random())
+
+    def draw_utterances(self, count: int) -> tuple[np.ndarray, np.ndarray]:
+        """The cells of a number of utterances to come and the random numbers that will choose their forms
+        (see choose_form), drawn in bulk."""
+        if SETTINGS.sim_single_cell:
+            cells = self.lexicon.draw_lexemes(count) * self.lexicon.num_cells
+        else:
+            cells = self.lexicon.draw_cells(count, SETTINGS.sim_cell_sampling == SETTINGS.CellSampling.PROMINENCE)
+        return cells, RAND.uniform(count)
+
+    def choose_form(self, row: int, cell_id: int, chance: float) -> bool:
+        """Whether a speaker says form A in a cell, given a random number in [0,1)."""
+        bias, _, _, _, decay_synced = self.scalar_views()
+        if decay_synced[row] != self.decay_clock:
+            self.settle_decay(row)
+        form_a_used = chance < bias[row * self.bias_a.shape[1] + cell_id]
+        if SETTINGS.sim_prefer_opposite:
+            form_a_used = not form_a_used
+        return form_a_used
+
+    def talk(self, row: int, hearer_row: int) -> tuple[int, bool]:
+        """Let one speaker influence another within the Population."""
+        assert not self.is_broadcaster[hearer_row]  # broadcasters are deaf
+        cell_id, form_a_used = self.utter(row)
+        self.hear(hearer_row, cell_id, form_a_used)
+        if SETTINGS.sim_influence_self:
+            self.hear(row, cell_id, form_a_used)
+        return cell_id, form_a_used
+
+    def talk_drawn(self, row: int, hearer_row: int, cell_id: int, chance: float) -> bool:
+        """talk in a cell drawn beforehand, with the form chosen by a random number drawn beforehand
+        (see draw_utterances). Returns whether form A was used."""
+        assert not self.is_broadcaster[hearer_row]  # broadcasters are deaf
+        form_a_used = self.choose_form(row, cell_id, chance)
+        self.hear(hearer_row, cell_id, form_a_used)
+        if SETTINGS.sim_influence_self:
+            self.hear(row, cell_id, form_a_used)
+        return form_a_used
+
+    def choose_learning_model(self) -> None:
+        """Look up the kernels of the learning model currently set, to be used until chosen again."""
+        self.learning_kernel = learning_kernel(SETTINGS.sim_learning_model)
+        self.scalar_learning_kernel = scalar_learning_kernel(SETTINGS.sim_learning_model)
+
+    def scalar_views(self) -> tuple[memoryview, ...]:
+        """bias_a (flattened), experience, principal_bias_cached, updates_since_resum and decay_synced as memoryviews,
+        which read and write single elements as plain Python numbers much more cheaply than NumPy indexing does."""
+        if self.views_of is not self.bias_a:
+            self.views = tuple(memoryview(array) for array in (self.bias_a.reshape(-1), self.experience, self.principal_bias_cached,
+                                                               self.updates_since_resum, self.decay_synced))
+            self.views_of = self.bias_a
+        return self.views
+
+    def hear(self, row: int, cell_id: int, form_a_used: bool) -> None:
+        """Accept a given form from another speaker and adjust the hearer's bias based on it.
+        Has the same effect as hear_many with a single event, but goes through the scalar kernel
+        of the learning model (if it has one) instead of arrays of one element."""
+        scalar_kernel = self.scalar_learning_kernel
+        if scalar_kernel is None:
+            self.hear_many(np.array([row]), np.array([cell_id]), np.array([form_a_used]))
+            return
+        bias, experience, principal_bias_cached, updates_since_resum, decay_synced = self.scalar_views()
+        if decay_synced[row] != self.decay_clock:
+            self.settle_decay(row)
+        lexicon = self.lexicon.plain()
+        if getLogger().isEnabledFor(DEBUG):
+            debug("Speaker: I just heard '%s'" % (self.lexicon.form_a[cell_id] if form_a_used else self.lexicon.form_b[cell_id]))
+        # impossible to tell which kind of form we got in a cell that does not alternate
+        if not lexicon.alternates[cell_id]:
+            return
+        change = scalar_kernel(bias, row * len(lexicon.weights), cell_id, form_a_used, experience[row], lexicon)
+        experience[row] += 1
+        updates_since_resum[row] += 1
+        if updates_since_resum[row] >= EXACT_RESUM_INTERVAL:
+            principal_bias_cached[row] = np.nan
+        else:
+            principal_bias_cached[row] += change / lexicon.weight_total
+        self.update_stability(row)
+
+    def hear_many(self, rows: np.ndarray, cells: np.ndarray, form_a_used: np.ndarray) -> None:
+        """Let a number of distinct speakers accept the given forms and adjust their biases in one go."""
+        self.settle_decay(rows)
+        if getLogger().isEnabledFor(DEBUG):
+            for cell_id, form_a in zip(cells.tolist(), form_a_used.tolist()):
+                debug("Speaker: I just heard '%s'" % (self.lexicon.form_a[cell_id] if form_a else self.lexicon.form_b[cell_id]))
+        # impossible to tell which kind of form we got in a cell that does not alternate
+        recognized = self.lexicon.alternates[cells]
+        if not recognized.all():
+            rows, cells, form_a_used = rows[recognized], cells[recognized], form_a_used[recognized]
+        change = self.learning_kernel(self.bias_a, (rows,), cells, form_a_used, self.experience[rows], self.lexicon)
+        self.experience[rows] += 1
+        self.principal_bias_cached[rows] += change / self.lexicon.weight_total
+        self.updates_since_resum[rows] += 1
+        drifting = rows[self.updates_since_resum[rows] >= EXACT_RESUM_INTERVAL]
+        self.principal_bias_cached[drifting] = np.nan
+        for row in rows.tolist():
+            self.update_stability(row)
+
+    def passive_decay(self, row: int) -> None:
+        """Tilt all of a speaker's biases slightly in favor of the preferred form, fading the opposite form."""
+        # owe one more step and pay it off right away
+        self.decay_synced[row] -= 1
+        self.settle_decay(row)
+
+    def passive_decay_all_but(self, busy_rows: list[int]) -> None:
+        """One step of passive decay for everyone on the sidelines. If SETTINGS.sim_lazy_decay is on,
+        the step is only written down and each speaker catches up whenever their state is needed next.
+        While the number of unstable speakers is being kept track of, the speakers whose stability
+        the step might change catch up right away: those who are due according to the DecayHorizon
+        of the criterion, or everyone if it has none."""
+        self.decay_clock += 1
+        # repeated rows are only counted once
+        self.decay_synced[busy_rows] += 1
+        if not SETTINGS.sim_lazy_decay or (self.is_speaker_stable is not None and self.decay_horizon is None):
+            self.settle_decay()
+        elif self.is_speaker_stable is not None:
+            self.settle_decay(np.flatnonzero(self.decay_due <= self.decay_clock))
+
+    def settle_decay(self, rows: Optional[int | np.ndarray]=None) -> None:
+        """Apply all the passive decay owed by a speaker (or an array of distinct speakers, or everyone) at once."""
+        if isinstance(rows, (int, np.integer)):
+            steps = self.decay_clock - self.decay_synced.item(rows)
+            if not steps:
+                return
+        else:
+            if rows is None:
+                rows = np.arange(len(self))
+            rows = rows[self.decay_synced[rows] < self.decay_clock]
+            if not len(rows):
+                return
+            steps = (self.decay_clock - self.decay_synced[rows])[:, np.newaxis]
+        # decay never pushes a bias across 0.5, so k steps amount to a single 1.02**k factor
+        factor = 1.02 ** steps
+        bias_a = self.bias_a[rows]
+        bias_a = np.clip(np.where(bias_a > 0.5, bias_a * factor, np.where(bias_a < 0.5, bias_a / factor, bias_a)), 0., 1.)
+        self.bias_a[rows] = bias_a
+        self.decay_synced[rows] = self.decay_clock
+        # every cell has changed, so summing them up again costs no more than tallying the changes
+        self._resum_principal_biases(rows, bias_a)
+        self.update_stability(rows)
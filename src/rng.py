@@ -1,39 +1,65 @@
-"""See if we have simplerandom available. If not, fall back on standard random."""
-from typing import TypeVar
+"""Random numbers served from large blocks generated ahead of time by NumPy."""
+from bisect import bisect
+from typing import Sequence, TypeVar
+
+import numpy as np
 
 T = TypeVar('T')
 
-# TODO: see if numpy is much faster (buffering a lot of random numbers ahead of time)
+class _RNG:
+    """Buffered random source. Scalar draws are taken one by one from pregenerated blocks,
+    bulk draws are generated on the spot as NumPy arrays. Both come from the same seeded
+    Generator, so a given sequence of calls always yields the same numbers."""
+
+    # number of values generated ahead of time for the scalar draws
+    BLOCK_SIZE = 4096
+
+    def __init__(self, random_seed: int) -> None:
+        self.seed(random_seed)
 
-try:
-    from simplerandom.iterators import MWC1
-    from bisect import bisect
+    def seed(self, random_seed: int) -> None:
+        """Start over from a new seed, dropping whatever was generated ahead of time."""
+        self.generator = np.random.default_rng(random_seed)
+        self.next_ints = iter(())
+        self.next_floats = iter(())
 
-    class _RNG:
-        def __init__(self, random_seed: int) -> None:
-            self.mwc = MWC1(random_seed)
+    def next(self) -> int:
+        """A random integer in the range [0, 2**32)."""
+        try:
+            return next(self.next_ints)
+        except StopIteration:
+            block = self.generator.integers(0, 2**32, self.BLOCK_SIZE, dtype=np.uint64)
+            self.next_ints = iter(block.tolist())
+            return next(self.next_ints)
 
-        def next(self) -> int:
-            return next(self.mwc)
+    def random(self) -> float:
+        """A random float in the range [0, 1)."""
+        try:
+            return next(self.next_floats)
+        except StopIteration:
+            self.next_floats = iter(self.generator.random(self.BLOCK_SIZE).tolist())
+            return next(self.next_floats)
 
-        def choices(self, population: list[T], cum_weights: list[float]) -> list[T]:
-            assert len(population) == len(cum_weights)
-            scale = cum_weights[-1] + 0.0
-            random = next(self.mwc) / 2**32
-            # copied this trick from the original Lib/random.py
-            return [population[bisect(cum_weights, random * scale, 0, len(population) - 1)]]
-except ImportError:
-    from random import choices, randrange, seed
+    def choices(self, population: Sequence[T], cum_weights: Sequence[float]) -> list[T]:
+        assert len(population) == len(cum_weights)
+        scale = cum_weights[-1] + 0.0
+        # copied this trick from the original Lib/random.py
+        return [population[bisect(cum_weights, self.random() * scale, 0, len(population) - 1)]]
 
-    class _RNG:
-        def __init__(self, random_seed: int) -> None:
-            seed(random_seed)
+    def uniform(self, n: int) -> np.ndarray:
+        """An array of n random floats in the range [0, 1)."""
+        return self.generator.random(n)
 
-        def next(self) -> int:
-            return randrange(2**32)
+    def integers(self, n: int, k: int | np.ndarray) -> np.ndarray:
+        """An array of n random integers in the range [0, k), k may vary element by element."""
+        return self.generator.integers(0, k, n)
 
-        def choices(self, population: list[T], cum_weights: list[float]) -> list[T]:
-            return choices(population, cum_weights=cum_weights)
+    def choices_many(self, population: Sequence[T] | np.ndarray, cum_weights: Sequence[float] | np.ndarray, n: int) -> np.ndarray:
+        """Like choices, but n independent picks at once."""
+        assert len(population) == len(cum_weights)
+        cum_weights = np.asarray(cum_weights, dtype=float)
+        picks = np.searchsorted(cum_weights, self.uniform(n) * cum_weights[-1], side='right')
+        return np.asarray(population)[np.minimum(picks, len(population) - 1)]
 
 
 # random seed courtesy of Lia & Bella
@@ -0,0 +1,170 @@
+"""Constant time weighted sampling of interacting speaker pairs."""
+
+from typing import Callable
+
+import numpy as np
+
+from .rng import RAND
+
+InvDistSq = Callable[[np.ndarray, np.ndarray], np.ndarray]
+
+def inv_dist_sq_constant(speaker_pos: np.ndarray, hearer_pos: np.ndarray) -> np.ndarray:
+    return np.ones(np.broadcast_shapes(speaker_pos.shape, hearer_pos.shape)[:-1])
+
+def inv_dist_sq_manhattan(speaker_pos: np.ndarray, hearer_pos: np.ndarray) -> np.ndarray:
+    dist_sq = np.abs(speaker_pos - hearer_pos).sum(axis=-1) ** 2
+    return 1 / dist_sq
+
+def inv_dist_sq_euclidean(speaker_pos: np.ndarray, hearer_pos: np.ndarray) -> np.ndarray:
+    dist_sq = ((speaker_pos - hearer_pos) ** 2).sum(axis=-1)
+    return 1 / dist_sq
+
+class AliasTable:
+    """Walker's alias method (Vose's variant) to draw from a fixed discrete distribution in O(1)."""
+
+    def __init__(self, weights: np.ndarray) -> None:
+        size = len(weights)
+        assert size > 0
+        scaled = weights * (size / weights.sum())
+        self.prob = np.ones(size)
+        self.alias = np.arange(size)
+        small = np.flatnonzero(scaled < 1)
+        large = np.flatnonzero(scaled >= 1)
+        # Vectorized pairing: lay the deficits of the small columns and the excesses of the large
+        # columns out on two cumulative axes and let each small column borrow from the large column
+        # its deficit ends in. No large column can be overdrawn below zero this way; the ones that
+        # drop under one become small columns themselves in the next round.
+        while len(small) and len(large):
+            deficit_ends = np.cumsum(1 - scaled[small])
+            excess_ends = np.cumsum(scaled[large] - 1)
+            lenders = np.minimum(np.searchsorted(excess_ends, deficit_ends), len(large) - 1)
+            self.prob[small] = scaled[small]
+            self.alias[small] = large[lenders]
+            scaled[large] -= np.bincount(lenders, weights=1 - scaled[small], minlength=len(large))
+            small = large[scaled[large] < 1]
+            large = large[scaled[large] >= 1]
+        # whatever is left over is a full column up to rounding errors
+
+    def __len__(self) -> int:
+        return len(self.prob)
+
+    def draw(self) -> int:
+        """Pick a random index with probability proportional to its weight."""
+        column = RAND.next() * len(self.prob) >> 32
+        if RAND.random() < self.prob.item(column):
+            return column
+        return self.alias.item(column)
+
+    def draw_many(self, count: int) -> np.ndarray:
+        """Pick a number of independent random indices at once."""
+        columns = RAND.integers(count, len(self.prob))
+        return np.where(RAND.uniform(count) < self.prob[columns], columns, self.alias[columns])
+
+class PairSampler:
+    """Draws (speaker, hearer) row pairs of a Population in constant time, with probability proportional
+    to the pair's inverse squared distance. Pairs with a broadcaster hearer are left out of the table
+    altogether since broadcasters are deaf."""
+
+    def __init__(self, population, inv_dist_sq: InvDistSq) -> None:
+        size = len(population)
+        eligible = ~np.eye(size, dtype=bool) & ~population.is_broadcaster[np.newaxis, :]
+        speakers, hearers = np.nonzero(eligible)
+        self.speakers = speakers.astype(np.int32)
+        self.hearers = hearers.astype(np.int32)
+        weights = inv_dist_sq(population.pos[speakers], population.pos[hearers])
+        self.table = AliasTable(weights)
+
+    def pick(self) -> tuple[int, int]:
+        """Choose a speaker and a hearer."""
+        pair = self.table.draw()
+        return self.speakers.item(pair), self.hearers.item(pair)
+
+    def pick_many(self, count: int) -> tuple[np.ndarray, np.ndarray]:
+        """Choose a number of independent speaker and hearer pairs at once."""
+        pairs = self.table.draw_many(count)
+        return self.speakers[pairs], self.hearers[pairs]
+
+class ConditionalPairSampler:
+    """Draws (speaker, hearer) row pairs with the same distribution as PairSampler without ever
+    building the table of all pairs: the speaker is drawn first according to the total weight of their
+    eligible pairs, then the hearer from that speaker's own conditional distribution.
+    Memory use grows linearly with the size of the Population, apart from a bounded cache of the running totals
+    of the hearer weights of the speakers drawn so far. The sampler is tied to the positions it was built with
+    (the Agora builds a new one whenever someone moves), so cached rows never go stale."""
+
+    # number of rows of the weight matrix to materialize at a time
+    _CHUNK_ROWS = 256
+    # most cached hearer weights to keep, summed over all speakers
+    _CACHE_BUDGET = 2**22
+
+    def __init__(self, population, inv_dist_sq: InvDistSq) -> None:
+        size = len(population)
+        self.pos = population.pos.copy()
+        self.inv_dist_sq = inv_dist_sq
+        self.uniform = inv_dist_sq is inv_dist_sq_constant
+        self.listeners = np.flatnonzero(~population.is_broadcaster)
+        # where each speaker is found among the listeners, if at all
+        self.listener_index = np.full(size, -1)
+        self.listener_index[self.listeners] = np.arange(len(self.listeners))
+        if self.uniform:
+            pair_weights = len(self.listeners) - (self.listener_index >= 0)
+        else:
+            pair_weights = np.empty(size)
+            for start in range(0, size, self._CHUNK_ROWS):
+                rows = np.arange(start, min(start + self._CHUNK_ROWS, size))
+                weights = self._hearer_weights(rows[:, np.newaxis])
+                pair_weights[rows] = weights.sum(axis=-1)
+        self.speaker_table = AliasTable(pair_weights.astype(float))
+        self.cum_hearer_weights: dict[int, np.ndarray] = {}
+
+    def _hearer_weights(self, speaker: np.ndarray) -> np.ndarray:
+        """Inverse squared distances from the given speaker row(s) to every listener, zero to themselves."""
+        with np.errstate(divide='ignore'):
+            weights = self.inv_dist_sq(self.pos[speaker], self.pos[self.listeners])
+        weights[speaker == self.listeners] = 0
+        return weights
+
+    def _cum_hearer_weights(self, speaker: int) -> np.ndarray:
+        """The running total of a speaker's hearer weights, worked out on first use.
+        Once the cache outgrows its budget the rows cached earliest are dropped."""
+        cum_weights = self.cum_hearer_weights.get(speaker)
+        if cum_weights is None:
+            cum_weights = np.cumsum(self._hearer_weights(np.array(speaker)))
+            while self.cum_hearer_weights and (len(self.cum_hearer_weights) + 1) * len(cum_weights) > self._CACHE_BUDGET:
+                del self.cum_hearer_weights[next(iter(self.cum_hearer_weights))]
+            self.cum_hearer_weights[speaker] = cum_weights
+        return cum_weights
+
+    def pick(self) -> tuple[int, int]:
+        """Choose a speaker and a hearer."""
+        speaker = self.speaker_table.draw()
+        own_index = self.listener_index.item(speaker)
+        if self.uniform:
+            # any listener but the speaker themselves
+            hearer_index = RAND.next() * (len(self.listeners) - (own_index >= 0)) >> 32
+            if 0 <= own_index <= hearer_index:
+                hearer_index += 1
+        else:
+            cum_weights = self._cum_hearer_weights(speaker)
+            threshold = RAND.random() * cum_weights[-1]
+            hearer_index = min(int(np.searchsorted(cum_weights, threshold, side='right')), len(cum_weights) - 1)
+        return speaker, self.listeners.item(hearer_index)
+
+    def pick_many(self, count: int) -> tuple[np.ndarray, np.ndarray]:
+        """Choose a number of independent speaker and hearer pairs at once."""
+        speakers = self.speaker_table.draw_many(count)
+        own_indices = self.listener_index[speakers]
+        if self.uniform:
+            hearer_indices = RAND.integers(count, len(self.listeners) - (own_indices >= 0))
+            hearer_indices += (0 <= own_indices) & (own_indices <= hearer_indices)
+        else:
+            uniforms = RAND.uniform(count)
+            hearer_indices = np.empty(count, dtype=np.intp)
+            # one search per distinct speaker among the picks
+            order = np.argsort(speakers, kind='stable')
+            distinct, starts = np.unique(speakers[order], return_index=True)
+            for speaker, picks in zip(distinct.tolist(), np.split(order, starts[1:])):
+                cum_weights = self._cum_hearer_weights(speaker)
+                hearer_indices[picks] = np.searchsorted(cum_weights, uniforms[picks] * cum_weights[-1], side='right')
+            hearer_indices = np.minimum(hearer_indices, len(self.listeners) - 1)
+        return speakers, self.listeners[hearer_indices]
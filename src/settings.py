@@ -7,12 +7,11 @@ try:
 except ImportError:
     from strenum import StrEnum
 
-from kivy.graphics import Color
-
 from .paradigm import NounParadigm
 
 class _Settings:
-    """A plain struct holding all relevant constants and parameters."""
+    """A plain struct holding all relevant constants and parameters.
+    Colors are plain RGB tuples so that the simulation core does not depend on Kivy."""
 
     class GuiLanguage(StrEnum):
         ENG = "English"
@@ -37,11 +36,25 @@ class _Settings:
         MANHATTAN = "Manhattan"
         EUCLIDEAN = "Euclidean"
 
+    class PairSampling(StrEnum):
+        TABLE       = "pair table"
+        CONDITIONAL = "speaker, then hearer"
+
+    class CellSampling(StrEnum):
+        UNIFORM    = "uniform"
+        PROMINENCE = "weighted by prominence"
+
     class LearningModel(StrEnum):
         HARMONIC    = "harmonic"
         RW          = "Rescorla-Wagner (vanilla)"
         RW_WEIGHTED = "Rescorla-Wagner (weighted)"
 
+    class HistoryMode(StrEnum):
+        FULL    = "full"
+        SAMPLED = "every k'th"
+        RING    = "last M"
+        OFF     = "off"
+
     def __init__(self) -> None:
         self.reset()
 
@@ -49,13 +62,13 @@ class _Settings:
         self.gui_language = self.GuiLanguage.ENG
 
         self.agora_size = (600, 600)
-        self.color_a = Color(1.0, 1.0, 0.0)
-        self.color_b = Color(1.0, 0.0, 1.0)
-        self.color_broadcaster = Color(0.2, 0.9, 0.1)
-        self.color_arrow_tip = Color(0.2, 0.0, 0.8)
+        self.color_a = (1.0, 1.0, 0.0)
+        self.color_b = (1.0, 0.0, 1.0)
+        self.color_broadcaster = (0.2, 0.9, 0.1)
+        self.color_arrow_tip = (0.2, 0.0, 0.8)
         self.arrow_width = 2
         self.draw_arrow = True
-        self.grid_color = Color(0.15, 0.15, 0.15)
+        self.grid_color = (0.15, 0.15, 0.15)
         self.grid_resolution = 10
 
         self.speakerdot_size = (20, 20)
@@ -74,13 +87,19 @@ class _Settings:
 
         self.sim_single_cell = True
         self.sim_distance_metric = self.DistanceMetric.CONSTANT
+        self.sim_pair_sampling = self.PairSampling.TABLE
+        self.sim_cell_sampling = self.CellSampling.UNIFORM
         self.sim_learning_model = self.LearningModel.HARMONIC
         self.sim_rw_default_rate = 0.1
         self.sim_influence_self = True
         self.sim_influence_mutual = False
         self.sim_passive_decay = False
+        self.sim_lazy_decay = False
         self.sim_prefer_opposite = False
         self.sim_batch_size = 100
         self.sim_max_iteration = 10000
+        self.sim_history_mode = self.HistoryMode.FULL
+        self.sim_history_every = 100
+        self.sim_history_capacity = 10000
 
 SETTINGS = _Settings()
@@ -1,75 +1,136 @@
 """Bare-bones simulated speakers that use one-word sentences to interact with each other."""
 
-from copy import deepcopy
-from logging import debug
+from typing import Optional, Self, TypedDict
 
-from .paradigm import CellIndex, NounParadigm
-from .rng import RAND
+import numpy as np
+
+from .lexicon import Lexicon
+from .paradigm import AnyCellIndex, NounParadigm, Paradigm
+from .population import Population, PopulationSnapshot
 from .settings import SETTINGS
-from typing import Self, TypedDict
 
 class Speaker:
-    """A simulated individual within the speaking community."""
-    def __init__(self, n: int, pos: tuple[float, float], para: NounParadigm,
+    """A simulated individual within the speaking community.
+    The speaker's state lives in a row of a Population, which it shares with the rest of the Agora."""
+    def __init__(self, n: int, pos: tuple[float, float], para: Paradigm,
                  experience: int=SETTINGS.starting_experience, is_broadcaster: bool=False) -> None:
         self.n = n
         self.pos = pos
+        # a standalone speaker gets a Population of its own
+        self.population = Population(1)
+        self.row = 0
+        self.population.speakers[0] = self
+        self.population.ids[0] = n
         self.para = para
         self.experience = experience
         self.is_broadcaster = is_broadcaster
-        self.principal_bias_cached = None
 
     @classmethod
     def fromspeaker(cls, speaker: Self) -> Self:
         """Copy an existing Speaker."""
-        new_speaker = cls(speaker.n, speaker.pos, deepcopy(speaker.para),
+        new_speaker = cls(speaker.n, speaker.pos, speaker.para,
                           speaker.experience, speaker.is_broadcaster)
+        new_speaker.copy_lexemes(speaker)
+        return new_speaker
+
+    @classmethod
+    def fromsnapshot(cls, snapshot: PopulationSnapshot, index: int) -> Self:
+        """Recreate a Speaker from a row of a Population snapshot."""
+        new_speaker = cls(snapshot.ids.item(index),
+                          tuple(snapshot.pos[index].tolist()),
+                          snapshot.lexicon.paradigm(snapshot.bias_a[index]),
+                          snapshot.experience.item(index),
+                          bool(snapshot.is_broadcaster[index]))
+        new_speaker.population.set_lexicon(snapshot.lexicon)
+        new_speaker.population.set_biases(0, snapshot.bias_a[index])
         return new_speaker
 
     @classmethod
     def frombias(cls, n: int, pos: tuple[float, float], bias_a: float,
                  experience: int=SETTINGS.starting_experience, is_broadcaster: bool=False) -> Self:
         """Construct a Speaker from a single bias value."""
-        assert SETTINGS.paradigm.para is not None
         if SETTINGS.sim_single_cell:
-            para = NounParadigm(bias_a=bias_a, form_a=SETTINGS.paradigm.para[0][0].form_a,
-                                               form_b=SETTINGS.paradigm.para[0][0].form_b)
+            para = type(SETTINGS.paradigm)(bias_a=bias_a, form_a=SETTINGS.paradigm.form_a[0],
+                                                          form_b=SETTINGS.paradigm.form_b[0])
         else:
-            para = deepcopy(SETTINGS.paradigm)
-            for cell in para:
-                cell.bias_a = bias_a
+            para = SETTINGS.paradigm.copy()
+            para.bias_a[:] = bias_a
         new_speaker = cls(n, pos, para, experience, is_broadcaster)
         return new_speaker
 
+    def copy_lexemes(self, speaker: Self) -> None:
+        """Take over another Speaker's biases in every lexeme of their Lexicon
+        (the paradigm a Speaker is constructed from only covers the first lexeme)."""
+        if speaker.population.lexicon.num_lexemes > 1:
+            self.population.set_lexicon(speaker.population.lexicon)
+            self.population.copy_state(self.row, speaker.population, speaker.row)
+
+    def attach(self, population: Population, row: int) -> None:
+        """Turn this Speaker into a view of a given row in a (shared) Population."""
+        self.population = population
+        self.row = row
+
+    @property
+    def para(self) -> Paradigm:
+        """A read-only copy of the speaker's paradigm of the first lexeme.
+        To change it, assign a modified copy of it (para.copy()) to write the changes back."""
+        return self.population.get_paradigm(self.row).read_only()
+
+    @para.setter
+    def para(self, para: Paradigm) -> None:
+        self.population.set_paradigm(self.row, para)
+
+    @property
+    def experience(self) -> int:
+        return self.population.experience.item(self.row)
+
+    @experience.setter
+    def experience(self, experience: int) -> None:
+        self.population.experience[self.row] = experience
+
+    @property
+    def is_broadcaster(self) -> bool:
+        return bool(self.population.is_broadcaster[self.row])
+
+    @is_broadcaster.setter
+    def is_broadcaster(self, is_broadcaster: bool) -> None:
+        self.population.is_broadcaster[self.row] = is_broadcaster
+
     def to_dict(self):
-        """Export object contents for JSON serialization."""
-        speaker_only = Speaker.fromspeaker(self)
-        speaker_dict = speaker_only.__dict__
-        del speaker_dict['principal_bias_cached']
-        return speaker_dict
+        """Export object contents for JSON serialization.
+        The forms are left to the Lexicon, only the biases in non-empty cells are included."""
+        self.population.settle_decay(self.row)
+        bias_a = self.population.bias_a[self.row, self.population.lexicon.nonempty_ids]
+        return { 'n' : self.n,
+                 'pos' : self.pos,
+                 'bias_a' : bias_a.tolist(),
+                 'experience' : self.experience,
+                 'is_broadcaster' : self.is_broadcaster }
 
     @classmethod
-    def from_dict(cls, speaker_dict) -> Self:
-        """Construct Speaker object from an imported JSON dictionary."""
-        para = NounParadigm.from_dict(speaker_dict['para'])
-        return cls(speaker_dict['n'],
-                   speaker_dict['pos'],
-                   para,
-                   speaker_dict['experience'],
-                   speaker_dict['is_broadcaster'])
+    def from_dict(cls, speaker_dict, lexicon: Optional[Lexicon]=None) -> Self:
+        """Construct Speaker object from an imported JSON dictionary
+        (older files store a whole paradigm in each speaker instead of a shared Lexicon)."""
+        if lexicon is None:
+            return cls(speaker_dict['n'],
+                       speaker_dict['pos'],
+                       NounParadigm.from_dict(speaker_dict['para']),
+                       speaker_dict['experience'],
+                       speaker_dict['is_broadcaster'])
+        bias_a = np.full(len(lexicon), 0.5)
+        bias_a[lexicon.nonempty_ids] = speaker_dict['bias_a']
+        new_speaker = cls(speaker_dict['n'],
+                          speaker_dict['pos'],
+                          lexicon.paradigm(bias_a),
+                          speaker_dict['experience'],
+                          speaker_dict['is_broadcaster'])
+        new_speaker.population.set_lexicon(lexicon)
+        new_speaker.population.set_biases(0, bias_a)
+        return new_speaker
 
     def principal_bias(self, force_update: bool=False) -> float:
         """Which way the speaker is leaning, summed up in a single float."""
-        if not force_update and self.principal_bias_cached is not None:
-            return self.principal_bias_cached
-        sum_bias = 0
-        sum_prominence = 0
-        for cell in self.para:
-            if cell.alternates():
-                sum_bias += cell.bias_a * cell.prominence
-                sum_prominence += cell.prominence
-        self.principal_bias_cached = sum_bias / sum_prominence
-        return self.principal_bias_cached
+        return self.population.principal_bias(self.row, force_update)
 
     def uniform_paradigm(self, strong=False) -> bool:
         """Is the speaker consistently biased towards the same kind of alternants?"""
@@ -78,122 +139,52 @@ class Speaker:
             threshold = SETTINGS.bias_threshold
         else:
             threshold = 0.5
+        self.population.settle_decay(self.row)
+        bias_a = self.population.bias_a[self.row]
+        alternates = self.population.lexicon.alternates
         if SETTINGS.sim_single_cell:
-            main_cell = self.para[CellIndex()]
-            if not main_cell.alternates():
+            # the first cell of the first lexeme
+            main_cell_id = 0
+            if not alternates[main_cell_id]:
                 # no bias possible at all
                 return False
-            uniformly_a = main_cell.bias_a >     threshold
-            uniformly_b = main_cell.bias_a < 1 - threshold
+            uniformly_a = bias_a[main_cell_id] >     threshold
+            uniformly_b = bias_a[main_cell_id] < 1 - threshold
         else:
-            uniformly_a = all(cell.bias_a >     threshold for cell in self.para if cell.alternates())
-            uniformly_b = all(cell.bias_a < 1 - threshold for cell in self.para if cell.alternates())
-        return uniformly_a or uniformly_b
+            uniformly_a = (bias_a[alternates] >     threshold).all()
+            uniformly_b = (bias_a[alternates] < 1 - threshold).all()
+        return bool(uniformly_a or uniformly_b)
 
     def name_tag(self) -> str:
         """Text to display next to SpeakerDot label on mouse hover."""
-        for main_cell in self.para:
-            if main_cell.alternates():
-                break
+        lexicon = self.population.lexicon
+        alternating_ids = lexicon.alternates.nonzero()[0]
+        main_cell_id = alternating_ids[0] if len(alternating_ids) else lexicon.num_cells - 1
         bias = self.principal_bias()
-        form_a = main_cell.form_a
-        form_b = main_cell.form_b
+        form_a = lexicon.form_a[main_cell_id]
+        form_b = lexicon.form_b[main_cell_id]
         return "%g*\"%s\" + %g*\"%s\"; xp:%d" % (bias, form_a, 1-bias, form_b, self.experience)
 
-    def talk(self, pick: 'PairPick') -> tuple[CellIndex, bool]:
+    def talk(self, pick: 'PairPick') -> tuple[AnyCellIndex, bool]:
         """Interact with and influence another Speaker in the Agora."""
         assert pick['speaker'] == self
         hearer = pick['hearer']
         assert not hearer.is_broadcaster # broadcasters are deaf
-        index = CellIndex()
-        if not SETTINGS.sim_single_cell:
-            # pick a non-empty cell to share with the hearer
-            while True:
-                index = CellIndex(RAND.next() % 2, RAND.next() % 14)
-                if self.para[index].form_a:
-                    break
-        cum_weights = [self.para[index].bias_a, 1]
-        form_a_used = RAND.choices([True, False], cum_weights=cum_weights)[0]
-        if SETTINGS.sim_prefer_opposite:
-            form_a_used = not form_a_used
-        hearer.hear_noun(index, form_a_used)
+        cell_id, form_a_used = self.population.utter(self.row)
+        hearer.population.hear(hearer.row, cell_id, form_a_used)
         if SETTINGS.sim_influence_self:
-            self.hear_noun(index, form_a_used)
-        return index, form_a_used  # let the Agora know which form of which cell we used
-
-    def hear_noun(self, index: CellIndex, form_a_used: bool) -> None:
-        """Accept a given form from another Speaker and adjust own bias based on it."""
-        form = self.para[index].form_a if form_a_used else self.para[index].form_b
-        debug("Speaker: I just heard '%s'" % form)
-        if not self.para[index].alternates():
-            # impossible to tell which kind of form we got
-            return
-        learning_model_funcs = {
-            SETTINGS.LearningModel.HARMONIC    : self._hear_noun_harmonic,
-            SETTINGS.LearningModel.RW          : self._hear_noun_rw_vanilla,
-            SETTINGS.LearningModel.RW_WEIGHTED : self._hear_noun_rw_weighted
-        }
-        learning_model_funcs[SETTINGS.sim_learning_model](index, form_a_used)
-        self.experience = self.experience + 1
-        self.principal_bias_cached = None
-
-    def _hear_noun_harmonic(self, index: CellIndex, form_a_used: bool) -> None:
-        """The n'th interaction has +-1/n impact on the exact cell's bias."""
-        delta = (1 if form_a_used else -1) / (self.experience + 1)
-        self.para.nudge(delta, index)
-        self.para.propagate(delta, index)
-
-    def _hear_noun_rw_vanilla(self, index: CellIndex, form_a_used: bool) -> None:
-        """Vanilla implementation of the Rescorla-Wagner learning model.
-        All cells containing a substring of the string just heard are assumed to be activated."""
-        cell_used = self.para[index]
-        form = cell_used.form_a if form_a_used else cell_used.form_b
-        if SETTINGS.sim_single_cell:
-            assert index == CellIndex()
-            activated_cells = [cell_used]
-        else:
-            def activated(c):
-                return c.alternates() and (form.startswith(c.form_a) or form.startswith(c.form_b))
-            activated_cells = [cell for cell in self.para if activated(cell)]
-        lambda_ = 1  # maximum conditioning (in a single cell)
-        v_max = lambda_ * len(activated_cells)
-        # total weight of associations
-        v_total = sum(cell.bias_a - (1 - cell.bias_a) for cell in activated_cells) / v_max
-        # adjust affected cells only
-        for cell in activated_cells:
-            alpha = cell.prominence       # salience of conditioned stimulus
-            beta  = cell_used.prominence  # salience of unconditioned stimulus
-            surprise = lambda_ * (1 if form_a_used else -1) - v_total
-            delta_v = SETTINGS.sim_rw_default_rate * alpha * beta * surprise
-            cell.nudge(0.5 * delta_v)  # [-1,1] scaled to [0,1]
-
-    def _hear_noun_rw_weighted(self, index: CellIndex, form_a_used: bool) -> None:
-        """Tweaked implementation of the Rescorla-Wagner learning model where v_total is weighted
-        according to the salience (prominence) of each conditioned stimulus."""
-        cell_used = self.para[index]
-        form = cell_used.form_a if form_a_used else cell_used.form_b
-        if SETTINGS.sim_single_cell:
-            assert index == CellIndex()
-            activated_cells = [cell_used]
-        else:
-            def activated(c):
-                return c.alternates() and (form.startswith(c.form_a) or form.startswith(c.form_b))
-            activated_cells = [cell for cell in self.para if activated(cell)]
-        lambda_ = 1  # maximum conditioning (in a single cell)
-        v_max = lambda_ * len(activated_cells)
-        # total weight of associations
-        v_total = sum((cell.bias_a - (1 - cell.bias_a)) * cell.prominence for cell in activated_cells) / v_max
-        # adjust affected cells only
-        for cell in activated_cells:
-            alpha   = cell.prominence       # salience of conditioned stimulus
-            beta    = cell_used.prominence  # salience of unconditioned stimulus
-            surprise = lambda_ * (1 if form_a_used else -1) - v_total
-            delta_v = SETTINGS.sim_rw_default_rate * alpha * beta * surprise
-            cell.nudge(0.5 * delta_v)  # [-1,1] scaled to [0,1]
+            self.population.hear(self.row, cell_id, form_a_used)
+        # let the Agora know which form of which cell (of whichever lexeme) we used
+        return self.population.lexicon.cell_index(cell_id), form_a_used
+
+    def hear_noun(self, index: AnyCellIndex, form_a_used: bool, lexeme: int=0) -> None:
+        """Accept a given form (of a noun or a verb, whichever the Lexicon holds)
+        from another Speaker and adjust own bias based on it."""
+        self.population.hear(self.row, lexeme * self.population.lexicon.num_cells + index.cell_id(), form_a_used)
 
     def passive_decay(self) -> None:
         """Tilt all biases slightly in favor of the preferred form, fading the opposite form."""
-        self.para.passive_decay()
+        self.population.passive_decay(self.row)
 
 
 class PairPick(TypedDict):
@@ -1,13 +1,24 @@
 """Tools to exhaustively simulate a multidimensional range of model parameter settings."""
 
+from argparse import ArgumentParser, ArgumentTypeError
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
 from copy import copy
-from logging import info
-from os.path import isfile
+from dataclasses import astuple
+from hashlib import md5
+from itertools import product
+from json import dumps, loads
+from logging import info, warning
+from math import sqrt
+from os import cpu_count
+from os.path import isfile, splitext
 from time import gmtime, strftime, perf_counter
-from typing import Iterator
+from typing import Iterator, Optional
 
 from .agora import Agora
-from .demos import DemoArguments
+from .cache import Outcome, ResultCache
+from .demos import DEFAULT_DEMO_ARGUMENTS, DemoArguments
+from .ensemble import Ensemble
+from .rng import RAND
 from .settings import SETTINGS
 
 
@@ -48,6 +59,64 @@ def _normalize_hungarian(string: str) -> str:
             return char
     return ''.join(map(convert, string))
 
+# the normal quantile of a two-sided 95% confidence interval
+_Z_95 = 1.96
+
+def _interval_width(successes: int, trials: int) -> float:
+    """The width of the 95% Wilson score interval of a proportion, which behaves well even at 0% and 100%."""
+    p = successes / trials
+    z_sq = _Z_95 * _Z_95
+    return 2 * _Z_95 * sqrt(p * (1 - p) / trials + z_sq / (4 * trials * trials)) / (1 + z_sq / trials)
+
+def _split(low, high) -> list[tuple]:
+    """The two halves of a range of parameter values, or the range itself if it cannot be split
+    (integer parameters cannot be split any further than neighbouring values)."""
+    if low == high:
+        return [(low, high)]
+    mid = (low + high) // 2 if isinstance(low, int) and isinstance(high, int) else (low + high) / 2
+    if mid in (low, high):
+        return [(low, high)]
+    return [(low, mid), (mid, high)]
+
+# a cell of the parameter grid in refinement mode: its depth and its (low, high) bounds
+# along each of the DemoArguments, its corners being the parameter setups at the bounds
+GridCell = tuple[int, tuple[tuple, ...]]
+
+# a single simulation run: the demo, its arguments and the repetition number
+TuningTask = tuple[SETTINGS.DemoAgora, DemoArguments, int]
+
+def task_seed(demo: SETTINGS.DemoAgora, demo_args: DemoArguments, repetition: int) -> int:
+    """The random seed of a single simulation run, derived from its parameter setup and repetition
+    alone, so that the run comes out the same whichever process performs it and in whatever order."""
+    key = repr((str(demo), astuple(demo_args), repetition))
+    return int.from_bytes(md5(key.encode('utf-8')).digest(), 'big')
+
+# the Agora a worker process last simulated, kept around for the next repetition of the same setup
+_worker_agora: Optional[Agora] = None
+_worker_setup: Optional[tuple[SETTINGS.DemoAgora, DemoArguments]] = None
+
+def _init_worker(settings: dict) -> None:
+    """Give a freshly started worker process the same settings as the Tuner that started it."""
+    vars(SETTINGS).update(settings)
+
+def _run_task(task: TuningTask) -> Outcome:
+    """Perform a single simulation run in a worker process and report its outcome."""
+    global _worker_agora, _worker_setup
+    demo, demo_args, repetition = task
+    if _worker_agora is None or _worker_setup != (demo, demo_args):
+        _worker_agora = Agora()
+        _worker_agora.load_demo_agora(demo, demo_args)
+        _worker_setup = (demo, demo_args)
+    else:
+        _worker_agora.quick_reset()
+    RAND.seed(task_seed(demo, demo_args, repetition))
+    _worker_agora.simulate_till_stable()
+    return _worker_agora.dominant_form(), _worker_agora.uniform_balance()
+
+def _run_tasks(tasks: list[TuningTask]) -> list[Outcome]:
+    """Perform a chunk of simulation runs in a worker process, one after the other."""
+    return [_run_task(task) for task in tasks]
+
 
 # TODO: yeah I mean this class could use a bit of a cleanup...
 class Tuner:
@@ -71,6 +140,22 @@ class Tuner:
         'uniform_egyensuly' : 0
     }
 
+    # extra columns when the number of repetitions is adaptive: how many there were
+    # and the widths of the confidence intervals of the proportions above
+    adaptive_item = {
+        'ismetlesek_szama' : 0,
+        'A_intervallum' : 0.,
+        'B_intervallum' : 0.,
+        'egyik_sem_intervallum' : 0.,
+        'uniform_egyensuly_intervallum' : 0.
+    }
+
+    # extra column when the grid is refined: how many times the cell
+    # in which the parameter setup first turned up had been subdivided
+    refined_item = {
+        'melyseg' : 0
+    }
+
     # why doesn't Python have macros?
     def loop_our_bias(self) -> Iterator[float]:
         return _float_range(*self.our_bias_params)
@@ -88,19 +173,67 @@ class Tuner:
                        their_bias_params: tuple[float, float, float],
                        starting_experience_params: tuple[int, int, int],
                        inner_radius_params: tuple[float, float, float],
-                       repetitions: int) -> None:
-        """Prepare for actually performing the simulations."""
+                       repetitions: int,
+                       batched: bool=False,
+                       output_filename: str='results.csv',
+                       resume: bool=False,
+                       cache: Optional[ResultCache]=None,
+                       tolerance: Optional[float]=None,
+                       min_repetitions: int=10,
+                       refine_depth: int=0) -> None:
+        """Prepare for actually performing the simulations.
+        If batched, all repetitions of a setup are run side by side by an Ensemble. This is faster,
+        but each step of run then takes a whole setup, and the runs are not seeded one by one.
+        Every finished simulation run is recorded in a journal next to the output file.
+        If resume is set and the output file has a journal, the runs recorded in it are
+        not performed again and the output file is continued instead of starting a new one.
+        Runs found in the cache are not performed again either, and seeded runs are added to it
+        (runs batched in an Ensemble do not have seeds of their own, so they are not cached).
+        If a tolerance is given, repetitions is only the maximum: after min_repetitions, and every
+        min_repetitions more, a setup is done as soon as the 95% confidence intervals of all of
+        its outcome proportions are at most that wide.
+        If refine_depth is given, the parameter ranges only make up a coarse grid to start with.
+        Every cell of the grid where the most common outcomes of the parameter setups at its corners
+        disagree is then halved along each parameter, and so on, up to refine_depth times over."""
         self.our_bias_params = our_bias_params
         self.their_bias_params = their_bias_params
         self.starting_experience_params = starting_experience_params
         self.inner_radius_params = inner_radius_params
         self.repetitions = repetitions
+        self.batched = batched
+        self.cache = cache
+        self.tolerance = tolerance
+        if min_repetitions < 1:
+            raise ValueError("Tuning: At least one repetition is needed before stopping, not %d" % min_repetitions)
+        self.repetition_step = min(min_repetitions, repetitions)
+        if tolerance is not None:
+            self.result_item = self.result_item | self.adaptive_item
+        self.refine_depth = refine_depth
+        if refine_depth:
+            self.result_item = self.result_item | self.refined_item
 
         # man, that's a lot of setups
-        self.num_total_setups = len(list(self.loop_our_bias())) * \
-                                len(list(self.loop_their_bias())) * \
-                                len(list(self.loop_starting_experience())) * \
-                                len(list(self.loop_inner_radius()))
+        self.grid = [DemoArguments(our_bias=our_bias,
+                                   their_bias=their_bias,
+                                   starting_experience=starting_experience,
+                                   inner_radius=inner_radius)
+                     for our_bias, their_bias, starting_experience, inner_radius in product(self.loop_our_bias(),
+                                                                                            self.loop_their_bias(),
+                                                                                            self.loop_starting_experience(),
+                                                                                            self.loop_inner_radius())]
+        self.num_total_setups = self.num_coarse_setups = len(self.grid)
+        # in refinement mode: where each parameter setup is in the grid, the depth it turned up at,
+        # its most common outcome once known, and the cells to look into once a setup is known,
+        # filed under their last corner to be finished
+        self.setup_ids = { astuple(demo_args): setup for setup, demo_args in enumerate(self.grid) }
+        self.depths = [0] * self.num_total_setups
+        self.verdicts: dict[int, str] = {}
+        self.cells: dict[int, list[GridCell]] = {}
+        if refine_depth:
+            values = [list(dict.fromkeys(loop())) for loop in (self.loop_our_bias, self.loop_their_bias,
+                                                                self.loop_starting_experience, self.loop_inner_radius)]
+            for bounds in product(*[list(zip(axis, axis[1:])) or [(axis[0], axis[0])] for axis in values]):
+                self.file_cell((0, bounds))
 
         # state to keep track of simulation parameters and results
         self.agora = Agora()
@@ -109,19 +242,27 @@ class Tuner:
         self.current_setup = 0
         self.current_rep = 0
         self.num_total_reps = 0
+        self.num_cached_reps = 0
         self.tuning_cancelled = False
-        self.our_bias_range = self.loop_our_bias()
-        self.their_bias_range = self.loop_their_bias()
-        self.starting_experience_range = self.loop_starting_experience()
-        self.inner_radius_range = self.loop_inner_radius()
-        self.our_bias = next(self.our_bias_range)
-        self.their_bias = next(self.their_bias_range)
-        self.starting_experience = next(self.starting_experience_range)
-        self.inner_radius = next(self.inner_radius_range)
-
-        # create the CSV file, write the header line, and we're good to go
-        self.output_filename = 'results.csv'
-        self.initialize_csv_file()
+        # outcomes of runs not yet written to file, by setup and repetition
+        self.outcomes: dict[int, dict[int, Outcome]] = {}
+        # the repetitions of the current setup still to be performed
+        self.pending_reps: list[int] = []
+        # the setup the Agora has been loaded with
+        self.loaded_setup: Optional[int] = None
+
+        self.output_filename = output_filename
+        if resume and isfile(self.output_filename) and isfile(self.journal_filename()):
+            # pick up where an interrupted tuning left off
+            self.load_journal()
+            self.num_total_reps = sum(len(finished) for finished in self.outcomes.values())
+            self.write_csv_header()
+            self.write_finished_rows()
+            info("Tuning: Resuming with %d out of %d setups already finished" % (self.current_setup, self.num_total_setups))
+        else:
+            # create the CSV file, write the header line, and we're good to go
+            self.initialize_csv_file()
+            self.start_journal()
 
     def run(self) -> None:
         """Run the predefined number of repetitions for every possible model parameter setting
@@ -137,6 +278,70 @@ class Tuner:
             # we're done with all parameter settings
             self.on_finished()
 
+    def run_parallel(self, workers: Optional[int]=None) -> None:
+        """Like run, but with each repetition of each parameter setup simulated as an independent task
+        on a pool of worker processes (one per CPU by default). Every task seeds the random source
+        from its own setup and repetition, so the results do not depend on the number of workers.
+        Rows are written in the same order and format as run writes them."""
+        self.on_start()
+        demo = SETTINGS.current_demo
+        submitted: set[tuple[int, int]] = set()
+        known = self.current_setup
+        def discover() -> list[int]:
+            """Take over what is known of the setups added to the grid since last time."""
+            nonlocal known
+            new = []
+            while known < self.num_total_setups:
+                new.extend(range(known, self.num_total_setups))
+                for setup in range(known, self.num_total_setups):
+                    self.pull_cached(setup)
+                known = self.num_total_setups
+                # which may refine the grid further
+                self.write_finished_rows()
+            return new
+        def runs_needed(setups: list[int]) -> list[tuple[int, int]]:
+            """The runs still to be submitted for the next verdict on some setups."""
+            runs = [(setup, repetition) for setup in setups if setup >= self.current_setup
+                    for repetition in self.missing_reps(setup) if (setup, repetition) not in submitted]
+            submitted.update(runs)
+            return runs
+        # runs recorded in the journal of an earlier tuning or found in the cache are not repeated
+        pending = runs_needed(discover())
+        num_workers = workers or cpu_count() or 1
+        # several runs of the same setup in a row let a worker reuse its Agora
+        chunksize = max(1, min(self.repetition_step if self.tolerance is not None else self.repetitions,
+                               len(pending) // (4 * num_workers)))
+        with ProcessPoolExecutor(max_workers=num_workers, initializer=_init_worker,
+                                 initargs=(copy(vars(SETTINGS)),)) as executor:
+            futures: dict[Future, list[tuple[int, int]]] = {}
+            def submit(runs: list[tuple[int, int]]) -> None:
+                for start in range(0, len(runs), chunksize):
+                    chunk = runs[start:start + chunksize]
+                    tasks = [(demo, self.grid[setup], repetition) for setup, repetition in chunk]
+                    futures[executor.submit(_run_tasks, tasks)] = chunk
+            submit(pending)
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                if self.tuning_cancelled:
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    self.on_cancelled()
+                    return
+                for future in done:
+                    chunk = futures.pop(future)
+                    entries = [(setup, repetition, outcome) for (setup, repetition), outcome in zip(chunk, future.result())]
+                    self.journal_outcomes(entries)
+                    self.cache_outcomes(entries)
+                    for setup, repetition, outcome in entries:
+                        self.outcomes.setdefault(setup, {})[repetition] = outcome
+                    self.num_total_reps += len(entries)
+                    # setups that cannot be told apart yet get their next round of repetitions
+                    submit(runs_needed(sorted({setup for setup, _ in chunk})))
+                # rows are written in grid order, as soon as all repetitions of a setup are in
+                self.write_finished_rows()
+                # and setups the grid is refined with are started on straight away
+                submit(runs_needed(discover()))
+        self.on_finished()
+
     def on_start(self) -> None:
         """Print and save the starting time of the tuning process."""
         info("Tuning: Exhaustive simulation started at %s" % strftime("%H:%M:%S", gmtime()))
@@ -161,64 +366,79 @@ class Tuner:
         parameter combinations chosen by the user, then dump the results in a CSV file."""
         if self.tuning_cancelled:
             raise self.Cancelled
-        # poor man's nested for loop, continued from previous call...
-        # this is pretty horrifying actually, maybe we could try continuation-passing style?
-        if self.current_rep == self.repetitions:
-            self.current_rep = 0
+        # continued from previous call
+        if not self.pending_reps:
             # export results to file incrementally
-            self.write_new_row_to_csv_file()
-            try:
-                self.inner_radius = next(self.inner_radius_range)
-            except StopIteration:
-                self.inner_radius_range = self.loop_inner_radius()
-                self.inner_radius = next(self.inner_radius_range)
-                try:
-                    self.starting_experience = next(self.starting_experience_range)
-                except StopIteration:
-                    self.starting_experience_range = self.loop_starting_experience()
-                    self.starting_experience = next(self.starting_experience_range)
-                    try:
-                        self.their_bias = next(self.their_bias_range)
-                    except StopIteration:
-                        self.their_bias_range = self.loop_their_bias()
-                        self.their_bias = next(self.their_bias_range)
-                        try:
-                            self.our_bias = next(self.our_bias_range)
-                        except StopIteration:
-                            # we're done, stop iterating
-                            raise self.Finished
-        if 0 == self.current_rep:
+            self.write_finished_rows()
+            if self.current_setup == self.num_total_setups:
+                # we're done, stop iterating
+                raise self.Finished
             self.prepare_next_setup()
-        self.perform_next_rep()
+            if not self.pending_reps:
+                # all repetitions needed were finished before the tuning was interrupted or earlier on
+                return
+        if self.batched:
+            self.perform_all_reps()
+        else:
+            self.perform_next_rep()
 
     def prepare_next_setup(self) -> None:
-        """Initialize Agora according to next parameter setup."""
-        demo_args = DemoArguments(our_bias=self.our_bias,
-                                  their_bias=self.their_bias,
-                                  starting_experience=self.starting_experience,
-                                  inner_radius=self.inner_radius)
-        self.agora.load_demo_agora(SETTINGS.current_demo, demo_args)
-        self.new_result = copy(self.result_item)
-        self.new_result['egyik_bias'] = self.our_bias
-        self.new_result['masik_bias'] = self.their_bias
-        self.new_result['kezdo_tapasztalat'] = self.starting_experience
-        self.new_result['belso_gyuru_sugara'] = self.inner_radius
-        self.current_setup += 1
-        info("Tuning: Running setup %d out of %d..." % (self.current_setup, self.num_total_setups))
+        """Initialize Agora according to next parameter setup (or its next round of repetitions)."""
+        setup = self.current_setup
+        if setup not in self.outcomes:
+            # repetitions finished before the tuning was interrupted or earlier on
+            self.pull_cached(setup)
+            info("Tuning: Running setup %d out of %d..." % (setup + 1, self.num_total_setups))
+        self.current_rep = len(self.outcomes[setup])
+        self.pending_reps = self.missing_reps(setup)
+        if self.pending_reps and self.loaded_setup != setup:
+            self.agora.load_demo_agora(SETTINGS.current_demo, self.grid[setup])
+            self.loaded_setup = setup
+
+    def start_result_row(self, demo_args: DemoArguments) -> dict:
+        """An empty row of results for a parameter setup."""
+        new_result = copy(self.result_item)
+        new_result['egyik_bias'] = demo_args.our_bias
+        new_result['masik_bias'] = demo_args.their_bias
+        new_result['kezdo_tapasztalat'] = demo_args.starting_experience
+        new_result['belso_gyuru_sugara'] = demo_args.inner_radius
+        return new_result
 
     def perform_next_rep(self) -> None:
-        """Perform a single simulation run for the current parameter setup."""
+        """Perform a single simulation run for the current parameter setup,
+        seeded just like the same run would be by run_parallel."""
+        setup, repetition = self.current_setup, self.pending_reps.pop(0)
+        RAND.seed(task_seed(SETTINGS.current_demo, self.grid[setup], repetition))
         self.agora.simulate_till_stable()
-        dominant_form = self.agora.dominant_form()
+        outcome = (self.agora.dominant_form(), self.agora.uniform_balance())
+        self.outcomes[setup][repetition] = outcome
+        self.journal_outcomes([(setup, repetition, outcome)])
+        self.cache_outcomes([(setup, repetition, outcome)])
+        self.agora.quick_reset()
+        self.current_rep += 1
+        self.num_total_reps += 1
+
+    def perform_all_reps(self) -> None:
+        """Perform all the remaining simulation runs for the current parameter setup (or round of them) at once."""
+        ensemble = Ensemble(self.agora, len(self.pending_reps))
+        ensemble.run()
+        outcomes = [(dominant_form, bool(uniform_balance))
+                    for dominant_form, uniform_balance in zip(ensemble.dominant_forms(), ensemble.uniform_balances())]
+        self.outcomes[self.current_setup].update(zip(self.pending_reps, outcomes))
+        self.journal_outcomes([(self.current_setup, repetition, outcome)
+                               for repetition, outcome in zip(self.pending_reps, outcomes)])
+        self.num_total_reps += len(self.pending_reps)
+        self.current_rep += len(self.pending_reps)
+        self.pending_reps = []
+
+    def record_outcome(self, dominant_form: Optional[str], uniform_balance: bool) -> None:
+        """Add the end result of a single simulation run to the current row of results."""
         if dominant_form is None:
             self.new_result['egyik_sem'] += 1
         else:
             self.new_result[dominant_form] += 1
-        if self.agora.uniform_balance():
+        if uniform_balance:
             self.new_result['uniform_egyensuly'] += 1
-        self.agora.quick_reset()
-        self.current_rep += 1
-        self.num_total_reps += 1
 
     def initialize_csv_file(self) -> None:
         """Create output CSV file and write the first row with the column names."""
@@ -230,6 +450,10 @@ class Tuner:
         while isfile(self.output_filename):
             self.output_filename = filename_until_dot + str(append_num) + '.csv'
             append_num += 1
+        self.write_csv_header()
+
+    def write_csv_header(self) -> None:
+        """Start the output CSV file over with the first row holding the column names."""
         with open(self.output_filename, 'w', encoding='utf-8') as filehandle:
             keys_normalized = [_normalize_hungarian(key) for key in self.result_item.keys()]
             csv_header = ','.join(keys_normalized)
@@ -242,3 +466,216 @@ class Tuner:
             filehandle.write("\n")
             csv_row = ','.join([str(value) for value in self.new_result.values()])
             filehandle.write(csv_row)
+
+    def write_finished_rows(self) -> None:
+        """Output the rows of the next setups in line as long as all the repetitions they need are finished."""
+        while self.current_setup < self.num_total_setups and \
+              self.current_setup in self.outcomes and not self.missing_reps(self.current_setup):
+            finished = self.outcomes.pop(self.current_setup)
+            used = self.reps_needed(finished)
+            self.new_result = self.start_result_row(self.grid[self.current_setup])
+            for repetition in range(used):
+                self.record_outcome(*finished[repetition])
+            if self.tolerance is not None:
+                self.new_result['ismetlesek_szama'] = used
+                for column, width in zip(('A', 'B', 'egyik_sem', 'uniform_egyensuly'), self.interval_widths(self.new_result)):
+                    self.new_result[column + '_intervallum'] = width
+            if self.refine_depth:
+                self.new_result['melyseg'] = self.depths[self.current_setup]
+            self.write_new_row_to_csv_file()
+            self.verdicts[self.current_setup] = max(('A', 'B', 'egyik_sem'), key=self.new_result.get)
+            self.refine(self.current_setup)
+            self.current_setup += 1
+
+    def refine(self, setup: int) -> None:
+        """Subdivide the cells of the grid whose corners are all known now that a setup is,
+        if the most common outcomes at their corners disagree."""
+        cells = self.cells.pop(setup, [])
+        while cells:
+            depth, bounds = cells.pop(0)
+            verdicts = { self.verdicts[self.setup_ids[corner]] for corner in product(*bounds) }
+            if depth == self.refine_depth or len(verdicts) == 1:
+                continue
+            halves = [_split(low, high) for low, high in bounds]
+            if all(len(halves_along) == 1 for halves_along in halves):
+                continue
+            for values in product(*[dict.fromkeys(value for half in halves_along for value in half)
+                                    for halves_along in halves]):
+                if values not in self.setup_ids:
+                    self.setup_ids[values] = len(self.grid)
+                    self.grid.append(DemoArguments(*values))
+                    self.depths.append(depth + 1)
+            self.num_total_setups = len(self.grid)
+            for sub_bounds in product(*halves):
+                # the corners of a smaller cell may all have been known for a while
+                if not self.file_cell((depth + 1, sub_bounds), setup):
+                    cells.append((depth + 1, sub_bounds))
+
+    def file_cell(self, cell: GridCell, known: int=-1) -> bool:
+        """File a cell of the grid under the last of its corners to be finished,
+        unless that is one of the first setups given as known."""
+        last = max(self.setup_ids[corner] for corner in product(*cell[1]))
+        if last <= known:
+            return False
+        self.cells.setdefault(last, []).append(cell)
+        return True
+
+    def interval_widths(self, result: dict) -> list[float]:
+        """The widths of the confidence intervals of the outcome proportions in a row of results."""
+        trials = result['A'] + result['B'] + result['egyik_sem']
+        return [_interval_width(result[column], trials) for column in ('A', 'B', 'egyik_sem', 'uniform_egyensuly')]
+
+    def reps_needed(self, finished: dict[int, Outcome]) -> int:
+        """How many repetitions a setup needs as far as we can tell from those finished so far.
+        Repetitions are only ever looked at in rounds, first to last, so that the answer does not depend on
+        the order they happen to finish in."""
+        if self.tolerance is None:
+            return self.repetitions
+        needed = self.repetition_step
+        while needed < self.repetitions and all(repetition in finished for repetition in range(needed)):
+            result = copy(self.result_item)
+            for repetition in range(needed):
+                dominant_form, uniform_balance = finished[repetition]
+                result['egyik_sem' if dominant_form is None else dominant_form] += 1
+                result['uniform_egyensuly'] += uniform_balance
+            if max(self.interval_widths(result)) <= self.tolerance:
+                break
+            needed = min(needed + self.repetition_step, self.repetitions)
+        return needed
+
+    def missing_reps(self, setup: int) -> list[int]:
+        """The repetitions of a setup still to be performed for the next verdict on it."""
+        finished = self.outcomes.get(setup, {})
+        return [repetition for repetition in range(self.reps_needed(finished)) if repetition not in finished]
+
+    def pull_cached(self, setup: int) -> None:
+        """Take over the outcomes of those runs of a setup still to be performed that are in the cache."""
+        finished = self.outcomes.setdefault(setup, {})
+        if self.cache is None:
+            return
+        seeds = { task_seed(SETTINGS.current_demo, self.grid[setup], repetition): repetition
+                  for repetition in range(self.repetitions) if repetition not in finished }
+        cached = self.cache.get(SETTINGS.current_demo, self.grid[setup], list(seeds))
+        entries = [(setup, seeds[seed], outcome) for seed, outcome in cached.items()]
+        for _, repetition, outcome in entries:
+            finished[repetition] = outcome
+        if entries:
+            self.journal_outcomes(entries)
+        self.num_cached_reps += len(entries)
+        self.num_total_reps += len(entries)
+
+    def cache_outcomes(self, entries: list[tuple[int, int, Outcome]]) -> None:
+        """File the outcomes of seeded runs, given as (setup, repetition, outcome), in the cache."""
+        if self.cache is None:
+            return
+        demo = SETTINGS.current_demo
+        by_setup: dict[int, list[tuple[int, Outcome]]] = {}
+        for setup, repetition, outcome in entries:
+            by_setup.setdefault(setup, []).append((task_seed(demo, self.grid[setup], repetition), outcome))
+        for setup, seeded in by_setup.items():
+            self.cache.put(demo, self.grid[setup], seeded)
+
+    def journal_filename(self) -> str:
+        """The journal of finished simulation runs kept next to the output file."""
+        return splitext(self.output_filename)[0] + '.journal'
+
+    def journal_header(self):
+        """What the journal has to start with for us to be able to resume from it."""
+        header = { 'demo' : SETTINGS.current_demo,
+                   'grid' : [astuple(demo_args) for demo_args in self.grid[:self.num_coarse_setups]],
+                   'repetitions' : self.repetitions }
+        if self.tolerance is not None:
+            header['tolerance'] = self.tolerance
+            header['min_repetitions'] = self.repetition_step
+        if self.refine_depth:
+            # the setups the grid is refined with follow from the outcomes, always in the same order
+            header['refine_depth'] = self.refine_depth
+        return header
+
+    def start_journal(self) -> None:
+        """Create an empty journal for the output file, one JSON object per line."""
+        with open(self.journal_filename(), 'w', encoding='utf-8') as filehandle:
+            filehandle.write(dumps(self.journal_header()) + "\n")
+
+    def journal_outcomes(self, entries: list[tuple[int, int, Outcome]]) -> None:
+        """Record the outcomes of finished simulation runs, given as (setup, repetition, outcome)."""
+        with open(self.journal_filename(), 'a', encoding='utf-8') as filehandle:
+            filehandle.write(''.join(dumps({ 'setup' : setup, 'repetition' : repetition, 'outcome' : outcome }) + "\n"
+                                     for setup, repetition, outcome in entries))
+
+    def load_journal(self) -> None:
+        """Take over the outcomes of all simulation runs recorded in the journal of the output file."""
+        with open(self.journal_filename(), 'r', encoding='utf-8') as filehandle:
+            lines = filehandle.read().splitlines()
+        if loads(lines[0]) != loads(dumps(self.journal_header())):
+            raise ValueError("Tuning: %s was written for different parameter settings" % self.journal_filename())
+        for line in lines[1:]:
+            try:
+                entry = loads(line)
+            except ValueError:
+                # the last line may have been cut short
+                warning("Tuning: Ignoring incomplete journal entry %r" % line)
+                continue
+            dominant_form, uniform_balance = entry['outcome']
+            self.outcomes.setdefault(entry['setup'], {})[entry['repetition']] = (dominant_form, uniform_balance)
+
+
+def _positive_int(string: str) -> int:
+    """An argparse type for counts that must be at least 1."""
+    value = int(string)
+    if value < 1:
+        raise ArgumentTypeError("must be at least 1, not %d" % value)
+    return value
+
+def main(argv: Optional[list[str]]=None) -> None:
+    """Perform a tuning from the command line, without the GUI."""
+    parser = ArgumentParser(prog='morphohistory tune', description=Tuner.__doc__)
+    parser.add_argument('--demo', type=SETTINGS.DemoAgora, default=SETTINGS.startup_demo,
+                        help="the starting state to simulate, one of: %s" % ', '.join(SETTINGS.DemoAgora))
+    for option, kind in (('--our-bias', float), ('--their-bias', float),
+                         ('--starting-experience', int), ('--inner-radius', float)):
+        parser.add_argument(option, type=kind, nargs=3, metavar=('START', 'STOP', 'STEP'),
+                            help="range of values to try (the demo's default only if omitted)")
+    parser.add_argument('--repetitions', type=_positive_int, default=100,
+                        help="number of simulation runs per setup (at most, if --tolerance is given)")
+    parser.add_argument('--tolerance', type=float, default=None,
+                        help="stop repeating a setup once the 95%% confidence intervals of its outcomes are this narrow")
+    parser.add_argument('--min-repetitions', type=_positive_int, default=10,
+                        help="number of simulation runs per setup at least, and per round after that, with --tolerance")
+    parser.add_argument('--refine', type=int, default=0, metavar='DEPTH',
+                        help="halve the grid around changes in the most common outcome, up to this many times over")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="number of worker processes (one per CPU by default)")
+    parser.add_argument('--serial', action='store_true',
+                        help="run all simulations in this process instead of a pool of workers")
+    parser.add_argument('--batched', action='store_true',
+                        help="run all repetitions of a setup side by side in this process "
+                             "(fastest on a single core, but the runs are not seeded one by one, so none are cached)")
+    parser.add_argument('--output', default='results.csv')
+    parser.add_argument('--resume', action='store_true',
+                        help="continue an interrupted tuning into the same output file")
+    parser.add_argument('--cache', default='tuning_cache',
+                        help="directory of outcomes to reuse from earlier tunings and add new ones to")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="simulate everything anew and keep no outcomes")
+    args = parser.parse_args(argv)
+    SETTINGS.current_demo = args.demo
+    defaults = DEFAULT_DEMO_ARGUMENTS[args.demo]
+    def params(given, default):
+        return tuple(given) if given else (default, default, 0)
+    tuner = Tuner(params(args.our_bias, defaults.our_bias),
+                  params(args.their_bias, defaults.their_bias),
+                  params(args.starting_experience, defaults.starting_experience),
+                  params(args.inner_radius, defaults.inner_radius),
+                  args.repetitions,
+                  batched=args.batched,
+                  output_filename=args.output,
+                  resume=args.resume,
+                  cache=None if args.no_cache else ResultCache(args.cache),
+                  tolerance=args.tolerance,
+                  min_repetitions=args.min_repetitions,
+                  refine_depth=args.refine)
+    if args.serial or args.batched:
+        tuner.run()
+    else:
+        tuner.run_parallel(args.workers)
@@ -1,10 +1,27 @@
 """Unit tests to check basic expected behaviors."""
 
+from json import dumps, loads
+from os.path import abspath, dirname
+from subprocess import run
+from sys import executable
+
+import numpy as np
+from pytest import fixture, raises
+
 from ..src.gui.l10n import localize, unlocalize
-from ..src.agora import Agora
-from ..src.paradigm import CellIndex, NounParadigm
+from ..src.agora import Agora, speakers_biased, speakers_biased_and_experienced, speakers_biased_decay_horizon
+from ..src.paradigm import CellIndex, NounParadigm, VerbCellIndex, VerbParadigm, propagation_targets
+from ..src.population import Population
+from ..src.rng import RAND, _RNG, _LIA_BELLA_MD5
 from ..src.agora import Speaker
+from ..src.ensemble import Ensemble
+from ..src.history import HistoryLog
+from ..src.learning import LEARNING_MODELS, register_learning_model
+from ..src.lexicon import Lexicon
+from ..src.sampling import AliasTable, ConditionalPairSampler, PairSampler, inv_dist_sq_euclidean
 from ..src.settings import SETTINGS
+from ..src.tuning import Tuner, main
+from ..src.cache import ResultCache
 
 def test_always_pass():
     assert True
@@ -26,8 +43,8 @@ def test_NounParadigm_assignment():
     assert noun_para[0][0].bias_a == 0.12345
     assert noun_para[CellIndex(0,0)].bias_a == 0.12345
 
-def test_simulation_harmonic():
-    SETTINGS.sim_learning_model = SETTINGS.LearningModel.HARMONIC
+def test_simulation_harmonic(monkeypatch):
+    monkeypatch.setattr(SETTINGS, 'sim_learning_model', SETTINGS.LearningModel.HARMONIC)
     agora = Agora()
     noun_para_tomayto = NounParadigm(0.0, 'tomahto', 'tomayto')
     agora.add_speaker(Speaker(0, (-100, 0), noun_para_tomayto))
@@ -40,9 +57,9 @@ def test_simulation_harmonic():
            (0.5 == agora.state.speakers[0].principal_bias() and 1.0 == agora.state.speakers[1].principal_bias())
     assert 2 == agora.state.speakers[0].experience and 2 == agora.state.speakers[1].experience
 
-def test_simulation_RW_vanilla():
-    SETTINGS.sim_learning_model = SETTINGS.LearningModel.RW
-    SETTINGS.sim_rw_default_rate = 1.0
+def test_simulation_RW_vanilla(monkeypatch):
+    monkeypatch.setattr(SETTINGS, 'sim_learning_model', SETTINGS.LearningModel.RW)
+    monkeypatch.setattr(SETTINGS, 'sim_rw_default_rate', 1.0)
     agora1 = Agora()
     noun_para_tomayto = NounParadigm(0.0, 'tomahto', 'tomayto')
     agora1.add_speaker(Speaker(0, (-100, 0), noun_para_tomayto))
@@ -54,7 +71,7 @@ def test_simulation_RW_vanilla():
     assert (0.0 == agora1.state.speakers[0].principal_bias() == agora1.state.speakers[1].principal_bias()) or \
            (1.0 == agora1.state.speakers[0].principal_bias() == agora1.state.speakers[1].principal_bias())
     assert 2 == agora1.state.speakers[0].experience and 2 == agora1.state.speakers[1].experience
-    SETTINGS.sim_rw_default_rate = 0.1
+    monkeypatch.setattr(SETTINGS, 'sim_rw_default_rate', 0.1)
     agora2 = Agora()
     noun_para_currently = NounParadigm(0.0, 'right now', 'currently')
     agora2.add_speaker(Speaker(0, (-100, 0), noun_para_currently))
@@ -65,8 +82,8 @@ def test_simulation_RW_vanilla():
            (0.1 == agora2.state.speakers[0].principal_bias() and 1.0 == agora2.state.speakers[1].principal_bias())
     assert 2 == agora2.state.speakers[0].experience and 2 == agora2.state.speakers[1].experience
 
-def test_l10n_to_English():
-    SETTINGS.gui_language = SETTINGS.GuiLanguage.ENG
+def test_l10n_to_English(monkeypatch):
+    monkeypatch.setattr(SETTINGS, 'gui_language', SETTINGS.GuiLanguage.ENG)
     assert "Start" == localize("Start")
     assert "%d iterations" % 13 == localize("%d iterations") % 13
     assert "abracadabra" == localize("abracadabra")
@@ -74,11 +91,621 @@ def test_l10n_to_English():
     assert "%d iterations" % 13 == unlocalize("%d iterations") % 13
     assert "abracadabra" == unlocalize("abracadabra")
 
-def test_l10n_to_Hungarian():
-    SETTINGS.gui_language = SETTINGS.GuiLanguage.HUN
+def test_l10n_to_Hungarian(monkeypatch):
+    monkeypatch.setattr(SETTINGS, 'gui_language', SETTINGS.GuiLanguage.HUN)
     assert "Csapassad neki!" == localize("Start")
     assert "%d iteráció" % 13 == localize("%d iterations") % 13
     assert "abracadabra" == localize("abracadabra")
     assert "Start" == unlocalize(localize("Start"))
     assert "%d iterations" % 13 == unlocalize(localize("%d iterations")) % 13
     assert "abracadabra" == unlocalize(localize("abracadabra"))
+
+def test_speakers_are_population_views(monkeypatch):
+    monkeypatch.setattr(SETTINGS, 'sim_learning_model', SETTINGS.LearningModel.HARMONIC)
+    agora = Agora()
+    agora.add_speaker(Speaker(0, (-100, 0), NounParadigm(0.0, 'tomahto', 'tomayto')))
+    agora.add_speaker(Speaker(1, (+100, 0), NounParadigm(1.0, 'tomahto', 'tomayto'), experience=5))
+    population = agora.bind_population()
+    assert agora.state.speakers[1].population is population
+    assert 5 == population.experience[1]
+    population.bias_a[0, CellIndex(0,0).cell_id()] = 0.25
+    population.principal_bias_cached[0] = float('nan')
+    assert 0.25 == agora.state.speakers[0].principal_bias()
+    assert 0.25 == agora.state.speakers[0].para[CellIndex(0,0)].bias_a
+    # the paradigm is only a copy, so writing to it must not go unnoticed
+    with raises(ValueError):
+        agora.state.speakers[0].para[CellIndex(0,0)].bias_a = 0.75
+    with raises(ValueError):
+        agora.state.speakers[0].para.propagate(0.25, CellIndex(0,0))
+    para = agora.state.speakers[0].para.copy()
+    para[CellIndex(0,0)].bias_a = 0.75
+    agora.state.speakers[0].para = para
+    assert 0.75 == population.bias_a[0, CellIndex(0,0).cell_id()]
+    speaker_dict = agora.state.speakers[1].to_dict()
+    assert 5 == speaker_dict['experience'] and not speaker_dict['is_broadcaster']
+
+def test_alias_table_preserves_weights():
+    weights = np.array([1000.0, 1.0, 0.5, 3.0, 0.0, 2.5, 1e-3] + [0.25] * 50)
+    table = AliasTable(weights)
+    mass = table.prob.copy()
+    np.add.at(mass, table.alias, 1 - table.prob)
+    assert np.allclose(mass, weights * len(weights) / weights.sum())
+
+def test_conditional_pair_sampler_matches_pair_table():
+    agora = Agora()
+    agora.load_demo_agora(SETTINGS.DemoAgora.NEWS_ANCHOR)
+    population = agora.bind_population()
+    table_sampler = PairSampler(population, inv_dist_sq_euclidean)
+    conditional_sampler = ConditionalPairSampler(population, inv_dist_sq_euclidean)
+    table_weights = inv_dist_sq_euclidean(population.pos[table_sampler.speakers], population.pos[table_sampler.hearers])
+    speaker_weights = np.bincount(table_sampler.speakers, weights=table_weights, minlength=len(population))
+    speaker_mass = conditional_sampler.speaker_table.prob.copy()
+    np.add.at(speaker_mass, conditional_sampler.speaker_table.alias, 1 - conditional_sampler.speaker_table.prob)
+    assert np.allclose(speaker_mass, speaker_weights * len(population) / speaker_weights.sum())
+    for _ in range(100):
+        speaker, hearer = conditional_sampler.pick()
+        assert speaker != hearer and not population.is_broadcaster[hearer]
+    # hearers are drawn from running totals cached per speaker, in bulk just the same
+    speakers, hearers = conditional_sampler.pick_many(1000)
+    assert (speakers != hearers).all() and not population.is_broadcaster[hearers].any()
+    assert set(speakers.tolist()) <= set(conditional_sampler.cum_hearer_weights)
+    conditional_sampler.cum_hearer_weights.clear()
+    conditional_sampler._CACHE_BUDGET = 2 * len(conditional_sampler.listeners)
+    for _ in range(100):
+        conditional_sampler.pick()
+    assert len(conditional_sampler.cum_hearer_weights) <= 2
+
+def test_ensemble_replicas_run_independently(monkeypatch):
+    monkeypatch.setattr(SETTINGS, 'sim_max_iteration', 2000)
+    agora = Agora()
+    agora.load_demo_agora(SETTINGS.DemoAgora.NEWS_ANCHOR)
+    starting_biases = agora.bind_population().bias_a.copy()
+    ensemble = Ensemble(agora, 16)
+    ensemble.run()
+    assert ensemble.finished.all()
+    assert (ensemble.iterations <= SETTINGS.sim_max_iteration).all()
+    assert len(ensemble.dominant_forms()) == 16
+    assert (ensemble.experience > 0).any(axis=-1).all()
+    # replicas diverge from each other but leave the Agora itself alone
+    assert not (ensemble.bias_a == ensemble.bias_a[0]).all()
+    assert (agora.bind_population().bias_a == starting_biases).all()
+
+def test_rng_reproducible_from_seed():
+    first, second = _RNG(_LIA_BELLA_MD5), _RNG(_LIA_BELLA_MD5)
+    draws = [first.next() for _ in range(5000)] + [first.random()] + first.uniform(10).tolist()
+    assert draws == [second.next() for _ in range(5000)] + [second.random()] + second.uniform(10).tolist()
+    assert all(0 <= draw < 2**32 for draw in draws[:5000])
+    integers = first.integers(1000, np.arange(1, 1001))
+    assert ((0 <= integers) & (integers < np.arange(1, 1001))).all()
+    picks = first.choices_many(['a', 'b', 'c'], [0, 1, 3], 1000)
+    assert 'a' not in picks and 'b' in picks and 'c' in picks
+
+def test_stability_tracked_incrementally():
+    agora = Agora()
+    agora.load_demo_agora(SETTINGS.DemoAgora.RAINBOW_9X9)
+    agora.simulate_till_stable(batch_size=500)
+    population = agora.bind_population()
+    assert population.num_unstable == (~speakers_biased_and_experienced(population, np.arange(len(population)))).sum()
+    # a custom criterion that is only ever evaluated one speaker at a time
+    def all_experienced(agora: Agora) -> bool:
+        return all(speaker.experience > 3 for speaker in agora.state.speakers)
+    def speaker_experienced(population, row):
+        assert isinstance(row, (int, np.integer)) or len(row) == len(population)
+        return population.experience[row] > 3
+    Agora.register_stability_criterion(all_experienced, speaker_experienced)
+    try:
+        agora.reset()
+        agora.simulate_till_stable(is_stable=all_experienced)
+        assert all_experienced(agora)
+        assert agora.bind_population().num_unstable == 0
+    finally:
+        del Agora.speaker_criteria[all_experienced]
+
+def test_lazy_passive_decay_matches_eager():
+    agora = Agora()
+    agora.load_demo_agora(SETTINGS.DemoAgora.RAINBOW_9X9)
+    eager = agora.bind_population()
+    lazy = Population.fromspeakers([Speaker.fromspeaker(s) for s in agora.state.speakers])
+    try:
+        for step in range(50):
+            busy_rows = [step % len(eager), (3 * step) % len(eager)]
+            SETTINGS.sim_lazy_decay = False
+            eager.passive_decay_all_but(busy_rows)
+            SETTINGS.sim_lazy_decay = True
+            lazy.passive_decay_all_but(busy_rows)
+        assert (lazy.decay_synced < lazy.decay_clock).all()
+        assert np.allclose(lazy.principal_biases(), eager.principal_biases())
+        assert np.allclose(lazy.bias_a, eager.bias_a)
+    finally:
+        SETTINGS.reset()
+
+def test_decay_horizon_is_never_overstepped():
+    SETTINGS.sim_single_cell = False
+    SETTINGS.paradigm = NounParadigm(0.5, 'fotelba', 'fotelbe')
+    SETTINGS.paradigm[0][1].form_a, SETTINGS.paradigm[0][1].form_b = 'fotelbakat', 'fotelbeket'
+    SETTINGS.paradigm[1][0].form_a, SETTINGS.paradigm[1][0].form_b = 'fotelekbe', 'fotelekbá'
+    try:
+        agora = Agora()
+        agora.load_demo_agora(SETTINGS.DemoAgora.BALANCE_LARGE)
+        population = agora.bind_population()
+        # speakers leaning different ways in different cells
+        rng = np.random.default_rng(0)
+        lean = rng.uniform(0.1, 0.9, (len(population), 1))
+        population.bias_a[:] = np.clip(lean + rng.uniform(-0.2, 0.2, population.bias_a.shape), 0., 1.)
+        population.principal_bias_cached[:] = np.nan
+        rows = np.arange(len(population))
+        horizon = speakers_biased_decay_horizon(population, rows)
+        stable = speakers_biased(population, rows)
+        assert np.isinf(horizon[stable]).any() and not np.isinf(horizon[~stable]).any()
+        for step in range(1, 100):
+            population.passive_decay_all_but([])
+            changed = speakers_biased(population, rows) != stable
+            assert (horizon[changed] < step).all()
+    finally:
+        SETTINGS.reset()
+
+def test_lazy_passive_decay_stops_at_the_same_iteration():
+    SETTINGS.sim_passive_decay = True
+    try:
+        iterations = {}
+        for lazy in (False, True):
+            SETTINGS.sim_lazy_decay = lazy
+            agora = Agora()
+            agora.load_demo_agora(SETTINGS.DemoAgora.NEWS_ANCHOR)
+            iterations[lazy] = []
+            for seed in range(4):
+                agora.quick_reset()
+                RAND.seed(seed)
+                agora.simulate_till_stable()
+                iterations[lazy].append(agora.state.sim_iteration_total)
+            population = agora.bind_population()
+            # the stable speakers do not have to catch up until they are asked about
+            assert lazy == (population.decay_synced < population.decay_clock).any()
+        assert iterations[False] == iterations[True]
+    finally:
+        SETTINGS.reset()
+
+def test_history_log_modes():
+    full = HistoryLog(SETTINGS.HistoryMode.FULL)
+    sampled = HistoryLog(SETTINGS.HistoryMode.SAMPLED, every=3)
+    ring = HistoryLog(SETTINGS.HistoryMode.RING, capacity=4)
+    off = HistoryLog(SETTINGS.HistoryMode.OFF)
+    for i in range(HistoryLog.CHUNK_SIZE + 10):
+        for history in (full, sampled, ring, off):
+            history.append(i, i + 1, i % 28, i % 2 == 0)
+    assert len(full) == HistoryLog.CHUNK_SIZE + 10 and len(off) == 0
+    assert [item.speaker for item in sampled][:3] == [0, 3, 6]
+    assert [item.speaker for item in ring] == list(range(HistoryLog.CHUNK_SIZE + 6, HistoryLog.CHUNK_SIZE + 10))
+    assert ring[-1] == full[-1] == Agora.HistoryItem(HistoryLog.CHUNK_SIZE + 9, HistoryLog.CHUNK_SIZE + 10,
+                                                     CellIndex.fromid((HistoryLog.CHUNK_SIZE + 9) % 28), False)
+    restored = HistoryLog.from_dict(ring.to_dict())
+    assert list(restored) == list(ring)
+    assert list(HistoryLog.from_dict([item.to_dict() for item in ring])) == list(ring)
+    # a loaded log behaves like a fresh one in the configured mode
+    SETTINGS.sim_history_mode = SETTINGS.HistoryMode.RING
+    SETTINGS.sim_history_capacity = 2
+    try:
+        restored = HistoryLog.from_dict(full.to_dict())
+        assert SETTINGS.HistoryMode.RING == restored.mode and list(restored) == list(full)[-2:]
+        restored.append(1, 2, 3, True)
+        assert [full[-1], Agora.HistoryItem(1, 2, CellIndex.fromid(3), True)] == list(restored)
+    finally:
+        SETTINGS.reset()
+    # logging in bulk keeps the same entries as one by one
+    for mode in SETTINGS.HistoryMode:
+        one_by_one = HistoryLog(mode, every=3, capacity=5)
+        in_bulk = HistoryLog(mode, every=3, capacity=5)
+        for i in range(20):
+            one_by_one.append(i, i + 1, i % 28, i % 2 == 0)
+        for start, end in ((0, 2), (2, 3), (3, 11), (11, 20)):
+            entries = np.arange(start, end)
+            in_bulk.append_many(entries, entries + 1, entries % 28, entries % 2 == 0)
+        assert one_by_one.to_dict() == in_bulk.to_dict() and one_by_one.total == in_bulk.total
+    # entries logged for another kind of paradigm are forgotten rather than misread
+    full.set_paradigm_class(NounParadigm)
+    assert len(full) == HistoryLog.CHUNK_SIZE + 10
+    full.set_paradigm_class(VerbParadigm)
+    assert 0 == len(full)
+    full.append(0, 1, VerbParadigm.NUM_CELLS + 5, True)
+    assert Agora.HistoryItem(0, 1, VerbCellIndex.fromid(5), True, 1) == full[0]
+
+def test_simulate_batch_stops_early():
+    agora = Agora()
+    agora.load_demo_agora(SETTINGS.DemoAgora.RAINBOW_9X9)
+    assert 10 == agora.simulate_batch(10)
+    assert 10 == agora.state.sim_iteration_total == len(agora.history)
+    performed = agora.simulate_batch(100, stop=lambda: agora.state.sim_iteration_total >= 25)
+    assert 15 == performed and 25 == agora.state.sim_iteration_total
+
+def test_simulate_batch_carries_exchanges_over():
+    SETTINGS.sim_influence_mutual = True
+    try:
+        agora = Agora()
+        agora.load_demo_agora(SETTINGS.DemoAgora.NEWS_ANCHOR)
+        population = agora.bind_population()
+        broadcaster = population.ids[population.is_broadcaster].item()
+        for k in (1, 2, 5, 37, 200, 3):
+            agora.simulate_batch(k)
+        agora.simulate_batch(100, stop=lambda: agora.state.sim_iteration_total >= 300)
+        agora.simulate_batch(100)
+        assert 400 == agora.state.sim_iteration_total == len(agora.history)
+        history = list(agora.history)
+        assert agora.pick['speaker'].n == history[-1].speaker and agora.pick['hearer'].n == history[-1].hearer
+        # a broadcast reaches everyone else in turn and anyone else is answered, batches notwithstanding
+        assert any(item.speaker == broadcaster for item in history)
+        i = 0
+        while i < len(history):
+            if history[i].speaker == broadcaster:
+                exchange = [(broadcaster, n) for n in population.ids.tolist() if n != broadcaster]
+            else:
+                exchange = [(history[i].speaker, history[i].hearer), (history[i].hearer, history[i].speaker)]
+            assert [(item.speaker, item.hearer) for item in history[i:i + len(exchange)]] == exchange[:len(history) - i]
+            i += len(exchange)
+    finally:
+        SETTINGS.reset()
+
+def test_simulate_till_stable_cancels_mid_batch():
+    agora = Agora()
+    agora.load_demo_agora(SETTINGS.DemoAgora.RAINBOW_9X9)
+    def cancel_in_sixth(agora) -> bool:
+        # as if the user pressed cancel while the sixth interaction was going on
+        agora.sim_cancelled = 5 == agora.state.sim_iteration_total
+        return False
+    assert not agora.simulate_till_stable(batch_size=100, is_stable=cancel_in_sixth)
+    assert 6 == agora.state.sim_iteration_total
+    assert not agora.sim_cancelled and 0 == agora.sim_iteration
+
+# seconds a headless batch worker may spend importing the simulation core
+_CORE_IMPORT_BUDGET = 1.0
+
+def test_core_imports_without_kivy():
+    package = __package__.rpartition('.')[0]
+    code = ("import sys, time\n"
+            "start = time.perf_counter()\n"
+            "import %s.src.tuning\n"
+            "print(time.perf_counter() - start, 'kivy' in sys.modules)" % package)
+    workdir = dirname(dirname(dirname(abspath(__file__))))
+    result = run([executable, '-c', code], cwd=workdir, capture_output=True, text=True, check=True)
+    import_time, kivy_loaded = result.stdout.split()[-2:]
+    assert 'False' == kivy_loaded
+    assert float(import_time) < _CORE_IMPORT_BUDGET
+
+def test_NounParadigm_cells_are_views():
+    noun_para = NounParadigm(0.25, 'tomahto', 'tomayto')
+    noun_para[1][3].bias_a = 0.75
+    assert 0.75 == noun_para.bias_a[CellIndex(1,3).cell_id()]
+    noun_para.prominence[CellIndex(0,5).cell_id()] = 2.0
+    assert 2.0 == noun_para[CellIndex(0,5)].prominence
+    assert [cell.bias_a for cell in noun_para] == noun_para.bias_a.tolist()
+    para_copy = noun_para.copy()
+    para_copy[0][0].form_a = 'paradicsom'
+    assert 'tomahto' == noun_para[0][0].form_a
+    restored = NounParadigm.from_dict(loads(dumps(noun_para, default=lambda x: x.to_dict())))
+    assert 0.25 == restored[0][0].bias_a and 'tomayto' == restored[0][0].form_b
+
+def test_activation_index_built_once_per_paradigm():
+    para = NounParadigm(0.5, 'fotelba', 'fotelbe')
+    para[0][1].form_a, para[0][1].form_b = 'fotelbakat', 'fotelbeket'
+    agora = Agora()
+    agora.add_speaker(Speaker(0, (-100, 0), para))
+    agora.add_speaker(Speaker(1, (+100, 0), para))
+    agora.set_paradigm(para)
+    population = agora.bind_population()
+    assert population.lexicon.activation_index() is population.lexicon.activation_index()
+    activation = population.lexicon.activation_index()
+    assert [0, 1] == activation[CellIndex(0,1).cell_id()][0].tolist()
+    assert [0] == activation[CellIndex(0,0).cell_id()][1].tolist()
+
+def test_lexicon_shared_and_interned(tmp_path):
+    para = NounParadigm(0.5, 'fotelba', 'fotelbe')
+    assert Lexicon.fromparadigm(para) is Lexicon.fromparadigm(para.copy())
+    agora = Agora()
+    agora.add_speaker(Speaker(0, (-100, 0), para))
+    agora.add_speaker(Speaker.frombias(1, (+100, 0), 0.25))
+    agora.set_paradigm(para)
+    population = agora.bind_population()
+    assert population.lexicon is Lexicon.fromparadigm(para)
+    assert not population.lexicon.form_a.flags.writeable
+    filepath = str(tmp_path / 'agora.json')
+    agora.save_to_file(filepath)
+    with open(filepath, 'r', encoding='utf-8') as stream:
+        saved = loads(stream.read())
+    assert 'para' not in saved['state']['speakers'][0]
+    assert 1 == len(saved['state']['speakers'][1]['bias_a'])
+    restored = Agora()
+    restored.load_from_file(filepath)
+    assert restored.bind_population().lexicon is population.lexicon
+    assert [0.5, 0.25] == [s.para[0][0].bias_a for s in restored.state.speakers]
+
+def test_quick_reset_restores_snapshot_by_identifier():
+    agora = Agora()
+    agora.load_demo_agora(SETTINGS.DemoAgora.RAINBOW_9X9)
+    starting_biases = {s.n: s.principal_bias() for s in agora.state.speakers}
+    assert not agora.starting_state.population.bias_a.flags.writeable
+    agora.simulate_till_stable(batch_size=500)
+    # the rows of the population no longer follow the order of the snapshot
+    speakers = agora.state.speakers[::-1]
+    agora.clear_speakers()
+    agora.load_speakers(speakers)
+    agora.quick_reset()
+    assert [s.n for s in agora.state.speakers] != agora.starting_state.population.ids.tolist()
+    assert all(speaker.principal_bias() == starting_biases[speaker.n] for speaker in agora.state.speakers)
+    assert all(speaker.experience == SETTINGS.starting_experience for speaker in agora.state.speakers)
+    agora.set_starting_experience(5)
+    agora.reset()
+    assert [s.n for s in agora.state.speakers] == agora.starting_state.population.ids.tolist()
+    assert all(speaker.experience == 5 for speaker in agora.state.speakers)
+
+def test_principal_bias_maintained_incrementally():
+    SETTINGS.sim_single_cell = False
+    try:
+        agora = Agora()
+        agora.load_demo_agora(SETTINGS.DemoAgora.RAINBOW_9X9)
+        population = agora.bind_population()
+        population.principal_biases()
+        agora.simulate_batch(2000)
+        # nothing had to be summed up again from scratch
+        assert not np.isnan(population.principal_bias_cached).any()
+        exact = (population.bias_a * population.lexicon.weights).sum(axis=1) / population.lexicon.weight_total
+        assert np.allclose(population.principal_biases(), exact, rtol=0, atol=1e-12)
+    finally:
+        SETTINGS.reset()
+
+def test_cell_sampling_single_draw():
+    para = NounParadigm(0.5, 'fotelba', 'fotelbe')
+    para[1][0].form_a, para[1][0].form_b = 'fotelekbe', 'fotelekbe'
+    para[1][0].prominence = 3.0
+    lexicon = Lexicon.fromparadigm(para)
+    uniform = lexicon.draw_cells(4000)
+    assert {0, CellIndex(1,0).cell_id()} == set(uniform.tolist())
+    assert 1800 < (uniform == 0).sum() < 2200
+    weighted = lexicon.draw_cells(4000, by_prominence=True)
+    assert 800 < (weighted == 0).sum() < 1200
+    assert lexicon.draw_cell() in (0, CellIndex(1,0).cell_id())
+    assert lexicon.cell_table() is lexicon.cell_table()
+
+def test_multi_lexeme_agora(tmp_path):
+    SETTINGS.sim_single_cell = False
+    try:
+        agora = Agora()
+        agora.load_demo_agora(SETTINGS.DemoAgora.BALANCE)
+        paras = [NounParadigm(0.5, 'fotelba', 'fotelbe')] + [NounParadigm(0.5, 'szo%da' % i, 'szo%de' % i) for i in range(99)]
+        frequency = [1000.] + [1.] * 99
+        agora.set_lexemes(paras, frequency)
+        agora.save_starting_state()
+        population = agora.bind_population()
+        assert (len(agora.state.speakers), 100, NounParadigm.NUM_CELLS) == population.lexicon.by_lexeme(population.bias_a).shape
+        agora.simulate_batch(2000)
+        lexeme_biases = population.lexeme_principal_biases()
+        assert (len(agora.state.speakers), 100) == lexeme_biases.shape
+        # the frequent lexeme is the one that gets talked about
+        changed = (lexeme_biases != 0.5).sum(axis=0)
+        assert changed[0] > changed[1:].max()
+        assert 100 == len(agora.dominant_forms_by_lexeme()) == len(agora.uniform_balances_by_lexeme()) == len(agora.lexemes_biased())
+        filepath = str(tmp_path / 'agora.json')
+        agora.save_to_file(filepath)
+        restored = Agora()
+        restored.load_from_file(filepath)
+        assert np.array_equal(restored.bind_population().bias_a, population.bias_a)
+        agora.quick_reset()
+        assert (population.lexeme_principal_biases()[:, 1:] == population.lexeme_principal_biases()[:, [0]]).all()
+    finally:
+        SETTINGS.reset()
+
+def test_learning_kernels_batched_and_pluggable():
+    SETTINGS.sim_single_cell = False
+    # several alternating cells of different prominence for the changes to spread across
+    SETTINGS.paradigm = NounParadigm(0.5, 'fotelba', 'fotelbe')
+    SETTINGS.paradigm[0][1].form_a, SETTINGS.paradigm[0][1].form_b = 'fotelbakat', 'fotelbeket'
+    SETTINGS.paradigm[1][0].form_a, SETTINGS.paradigm[1][0].form_b = 'fotelekbe', 'fotelekbá'
+    SETTINGS.paradigm.prominence[:] = np.linspace(0.1, 0.9, 28)
+    try:
+        for model in SETTINGS.LearningModel:
+            SETTINGS.sim_learning_model = model
+            agora = Agora()
+            agora.load_demo_agora(SETTINGS.DemoAgora.RAINBOW_9X9)
+            batched = agora.bind_population()
+            one_by_one = Population.fromspeakers([Speaker.fromspeaker(s) for s in agora.state.speakers])
+            rows, cells, form_a_used = np.arange(0, 80, 3), np.arange(27) % 16, np.arange(27) % 2 == 0
+            batched.hear_many(rows, cells, form_a_used)
+            # one event at a time goes through the scalar kernel instead
+            for row, cell_id, form_a in zip(rows.tolist(), cells.tolist(), form_a_used.tolist()):
+                one_by_one.hear(row, cell_id, form_a)
+            assert np.array_equal(batched.bias_a, one_by_one.bias_a)
+            assert np.array_equal(batched.experience, one_by_one.experience)
+            assert np.allclose(batched.principal_biases(), one_by_one.principal_biases())
+        heard = []
+        def hear_nothing(bias_a, hearers, cells, form_a_used, experience, lexicon):
+            heard.extend(cells.tolist())
+            return np.zeros(len(cells))
+        register_learning_model('deaf', hear_nothing)
+        SETTINGS.sim_learning_model = 'deaf'
+        agora.simulate_batch(10)
+        assert 20 == len(heard)
+    finally:
+        LEARNING_MODELS.pop('deaf', None)
+        SETTINGS.reset()
+
+def test_propagation_targets():
+    noun_targets = propagation_targets(NounParadigm.SHAPE)
+    assert [14] + list(range(1, 14)) == noun_targets[CellIndex(0,0).cell_id()].tolist()
+    verb_targets = propagation_targets(VerbParadigm.SHAPE)
+    assert (VerbParadigm.NUM_CELLS, 2 + 1 + 1 + 1 + 2) == verb_targets.shape
+    noun_para = NounParadigm(0.5, 'tomahto', 'tomayto')
+    noun_para[1][0].form_a, noun_para[1][0].form_b = 'tomahtoes', 'tomaytoes'
+    noun_para[0][1].form_a = noun_para[0][1].form_b = 'tomato'
+    noun_para.propagate(0.25, CellIndex(0,0))
+    assert 0.75 == noun_para[1][0].bias_a and 0.5 == noun_para[0][1].bias_a == noun_para[0][0].bias_a
+
+def test_paradigm_and_kernel_propagate_alike():
+    for paradigm_class, index in ((NounParadigm, CellIndex(0,0)), (VerbParadigm, VerbCellIndex(0,0,0,0,0))):
+        para = paradigm_class()
+        # the cell and a neighbour along each of the first dimensions
+        for cell in (index,) + tuple(type(index)(*(1 if i == dim else 0 for i in range(len(index)))) for dim in range(2)):
+            para[cell].form_a, para[cell].form_b = 'ab%d' % cell.cell_id(), 'ba%d' % cell.cell_id()
+        lexicon = Lexicon.fromparadigm(para)
+        bias_a = para.bias_a[np.newaxis].copy()
+        # form B heard by someone with experience 3: a change of -1/4
+        LEARNING_MODELS[SETTINGS.LearningModel.HARMONIC](bias_a, (np.array([0]),), np.array([index.cell_id()]),
+                                                          np.array([False]), np.array([3]), lexicon)
+        para.nudge(-0.25, index)
+        para.propagate(-0.25, index)
+        assert np.array_equal(bias_a[0], para.bias_a)
+        assert 3 == (para.bias_a == 0.25).sum()
+
+def test_verb_paradigm_agora(tmp_path):
+    verb_para = VerbParadigm(0.5, 'tesz', 'teszi')
+    verb_para[VerbCellIndex(0,1,1,1,2)].form_a, verb_para[VerbCellIndex(0,1,1,1,2)].form_b = 'tennénk', 'tennők'
+    assert VerbParadigm.from_dict(loads(dumps(verb_para, default=lambda x: x.to_dict()))).form_b.tolist() == verb_para.form_b.tolist()
+    for cell_id in range(VerbParadigm.NUM_CELLS):
+        assert cell_id == VerbCellIndex.fromid(cell_id).cell_id()
+    SETTINGS.sim_single_cell = False
+    SETTINGS.sim_max_iteration = 2000
+    try:
+        for model in SETTINGS.LearningModel:
+            SETTINGS.sim_learning_model = model
+            agora = Agora()
+            agora.load_demo_agora(SETTINGS.DemoAgora.BALANCE)
+            agora.set_paradigm(verb_para)
+            agora.save_starting_state()
+            population = agora.bind_population()
+            assert (len(agora.state.speakers), VerbParadigm.NUM_CELLS) == population.bias_a.shape
+            assert isinstance(agora.state.speakers[0].para, VerbParadigm)
+            agora.simulate_batch(500)
+            assert isinstance(agora.history[-1].cell, VerbCellIndex)
+            assert {0, VerbCellIndex(0,1,1,1,2).cell_id()} >= set(cell.cell_id() for cell in
+                                                                  (item.cell for item in agora.history))
+            assert (population.bias_a[:, ~population.lexicon.alternates] == 0.5).all()
+            filepath = str(tmp_path / 'agora.json')
+            agora.save_to_file(filepath)
+            restored = Agora()
+            restored.load_from_file(filepath)
+            assert restored.bind_population().lexicon is population.lexicon
+            assert np.array_equal(restored.bind_population().bias_a, population.bias_a)
+            assert restored.history[-1] == agora.history[-1]
+            agora.quick_reset()
+            ensemble = Ensemble(agora, 3)
+            ensemble.run()
+            assert ((0 < ensemble.iterations) & (ensemble.iterations <= SETTINGS.sim_max_iteration)).all()
+    finally:
+        SETTINGS.reset()
+
+# the parameters of tunings that stay the same, all but our_bias and the number of repetitions
+_TUNING_FIXED = ((0.5, 0.5, 0), (1, 1, 0), (None, None, None))
+
+@fixture
+def tuning(tmp_path, monkeypatch):
+    """Quick tunings of a small demo in a scratch directory."""
+    monkeypatch.chdir(tmp_path)
+    SETTINGS.current_demo = SETTINGS.DemoAgora.NEWS_ANCHOR
+    SETTINGS.sim_max_iteration = 300
+    yield
+    SETTINGS.reset()
+
+def _csv_rows(filename: str) -> list[str]:
+    with open(filename, encoding='utf-8') as stream:
+        return stream.read().splitlines()
+
+def test_parallel_tuning_matches_serial(tuning):
+    # grid refinement keeps submitting more runs to the pool as results come in
+    serial = Tuner((0., 1., 1.), *_TUNING_FIXED, 2, output_filename='serial.csv', refine_depth=1)
+    serial.run()
+    parallel = Tuner((0., 1., 1.), *_TUNING_FIXED, 2, output_filename='parallel.csv', refine_depth=1)
+    parallel.run_parallel(2)
+    assert 3 == serial.num_total_setups == parallel.num_total_setups
+    assert _csv_rows('serial.csv') == _csv_rows('parallel.csv')
+
+def test_tuning_resumes_from_journal(tuning):
+    grid = ((0., 0.5, 0.5), *_TUNING_FIXED, 3)
+    complete = Tuner(*grid, output_filename='complete.csv')
+    complete.run()
+    header, *results = _csv_rows('complete.csv')
+    assert 'egyik_bias,masik_bias,kezdo_tapasztalat,belso_gyuru_sugara,A,B,egyik_sem,uniform_egyensuly' == header
+    assert ['0.0', '0.5'] == [row.split(',')[0] for row in results]
+    assert all(3 == sum(map(int, row.split(',')[4:7])) for row in results)
+    journal = _csv_rows('complete.journal')
+    assert 1 + 2 * 3 == len(journal)
+    # interrupted in the middle of the second setup, while writing a journal entry
+    with open('results.journal', 'w', encoding='utf-8') as stream:
+        stream.write('\n'.join(journal[:5]) + '\n' + journal[5][:10])
+    with open('results.csv', 'w', encoding='utf-8') as stream:
+        stream.write('garbage')
+    resumed = Tuner(*grid, resume=True)
+    assert 'results.csv' == resumed.output_filename and 1 == resumed.current_setup
+    resumed.run()
+    assert 2 == resumed.current_setup and 2 * 3 == resumed.num_total_reps
+    assert _csv_rows('complete.csv') == _csv_rows('results.csv')
+    assert 1 + 2 * 3 == sum(1 for line in _csv_rows('results.journal') if line.endswith('}'))
+    with raises(ValueError):
+        Tuner((0., 1., 0.5), *grid[1:], resume=True)
+
+def test_adaptive_tuning_stops_once_confident(tuning):
+    tuner = Tuner((0., 0.75, 0.75), *_TUNING_FIXED, 8, tolerance=0.5, min_repetitions=2)
+    tuner.run()
+    header, *results = _csv_rows(tuner.output_filename)
+    assert header.endswith(',ismetlesek_szama,A_intervallum,B_intervallum,egyik_sem_intervallum,uniform_egyensuly_intervallum')
+    repetitions = [int(row.split(',')[8]) for row in results]
+    # B wins every time at first: 2 runs give a 95% interval 0.66 wide, 4 runs 0.49,
+    # but the outcomes of the other setup are too mixed to tell before the maximum
+    assert [4, 8] == repetitions and 4 + 8 == tuner.num_total_reps
+    for row in results:
+        values = row.split(',')
+        assert int(values[8]) == sum(map(int, values[4:7]))
+    assert all(0.48 < float(width) <= 0.5 for width in results[0].split(',')[9:])
+    assert max(map(float, results[1].split(',')[9:])) > 0.5
+    with raises(ValueError):
+        Tuner((0.125, 0.75, 0.625), *_TUNING_FIXED, 8, output_filename='none.csv', tolerance=0.5, min_repetitions=0)
+    with raises(SystemExit):
+        main(['--tolerance', '0.5', '--min-repetitions', '0'])
+
+def test_refined_tuning_only_simulates_around_transitions(tuning):
+    uniform = Tuner((0., 1., 0.125), *_TUNING_FIXED, 3, output_filename='uniform.csv')
+    uniform.run()
+    refined = Tuner((0., 1., 0.5), *_TUNING_FIXED, 3, output_filename='refined.csv', refine_depth=2)
+    refined.run()
+    # B wins up to 0.125, A from 0.25 to 0.875, neither at 1: nothing to look into between 0.25 and 0.75
+    assert [0., 0.5, 1., 0.25, 0.75, 0.125, 0.875] == [demo_args.our_bias for demo_args in refined.grid]
+    assert 7 * 3 == refined.num_total_reps
+    header, *results = _csv_rows('refined.csv')
+    assert header.endswith(',uniform_egyensuly,melyseg')
+    assert [0, 0, 0, 1, 1, 2, 2] == [int(row.split(',')[-1]) for row in results]
+    uniform_results = _csv_rows('uniform.csv')[1:]
+    assert all(row.rsplit(',', 1)[0] in uniform_results for row in results)
+    # the refinement follows from the outcomes alone, so it can be resumed just the same
+    resumed = Tuner((0., 1., 0.5), *_TUNING_FIXED, 3, output_filename='refined.csv', refine_depth=2, resume=True)
+    assert 7 == resumed.current_setup == resumed.num_total_setups
+
+def test_batched_tuning_from_command_line(tuning, monkeypatch):
+    def perform_next_rep(self):
+        assert False, "repetitions should have been batched"
+    monkeypatch.setattr(Tuner, 'perform_next_rep', perform_next_rep)
+    main(['--demo', SETTINGS.DemoAgora.NEWS_ANCHOR, '--our-bias', '0', '1', '1', '--repetitions', '3',
+          '--batched', '--no-cache', '--output', 'batched.csv'])
+    header, *results = _csv_rows('batched.csv')
+    assert 2 == len(results)
+    assert all(3 == sum(map(int, row.split(',')[4:7])) for row in results)
+
+def test_tuning_reuses_cached_outcomes(tuning):
+    first = Tuner((0., 0.5, 0.5), *_TUNING_FIXED, 3, output_filename='first.csv', cache=ResultCache('cache'))
+    first.run()
+    assert 0 == first.num_cached_reps
+    # a wider sweep only simulates the new setup
+    wider = Tuner((0., 1., 0.5), *_TUNING_FIXED, 3, output_filename='wider.csv', cache=ResultCache('cache'))
+    wider.run()
+    assert 2 * 3 == wider.num_cached_reps and 3 * 3 == wider.num_total_reps
+    assert _csv_rows('wider.csv')[:3] == _csv_rows('first.csv')
+    # whatever the GUI's batch size or history mode
+    SETTINGS.sim_batch_size = 7
+    SETTINGS.sim_history_mode = SETTINGS.HistoryMode.OFF
+    again = Tuner((0., 1., 0.5), *_TUNING_FIXED, 3, output_filename='again.csv', cache=ResultCache('cache'))
+    again.run()
+    assert 3 * 3 == again.num_cached_reps
+    # but not under different settings
+    SETTINGS.bias_threshold = 0.9
+    other = Tuner((0., 1., 0.5), *_TUNING_FIXED, 3, output_filename='other.csv', cache=ResultCache('cache'))
+    other.run()
+    assert 0 == other.num_cached_reps
+    SETTINGS.bias_threshold = 0.8
+    uncached = Tuner((0., 1., 0.5), *_TUNING_FIXED, 3, output_filename='uncached.csv')
+    uncached.run()
+    assert _csv_rows('wider.csv') == _csv_rows('uncached.csv')